@@ -0,0 +1,51 @@
+"""add composite indexes for chat queries
+
+Revision ID: add_chat_query_indexes
+Revises: add_conversation_name
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_chat_query_indexes'
+down_revision = 'add_conversation_name'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    # CONCURRENTLY avoids locking out writes on large tables but cannot run inside a transaction
+    with op.get_context().autocommit_block():
+        # History and paging: WHERE conversation_id = ? ORDER BY created_at, id
+        op.create_index(
+            'ix_messages_conversation_id_created_at', 'messages',
+            ['conversation_id', 'created_at', 'id'],
+            postgresql_concurrently=True, if_not_exists=True
+        )
+        # Conversation list: WHERE user_id = ? ORDER BY created_at, id
+        op.create_index(
+            'ix_conversations_user_id_created_at', 'conversations',
+            ['user_id', 'created_at', 'id'],
+            postgresql_concurrently=True, if_not_exists=True
+        )
+        # Fine-tune jobs by status, e.g. the ones still running
+        op.create_index(
+            'ix_fine_tuned_models_status_created_at', 'fine_tuned_models',
+            ['status', 'created_at'],
+            postgresql_concurrently=True, if_not_exists=True
+        )
+        # Latest usable fine-tuned model
+        op.create_index(
+            'ix_fine_tuned_models_succeeded', 'fine_tuned_models',
+            ['created_at'],
+            postgresql_where=sa.text("status = 'succeeded' AND model_id IS NOT NULL"),
+            postgresql_concurrently=True, if_not_exists=True
+        )
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_fine_tuned_models_succeeded', table_name='fine_tuned_models', postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_fine_tuned_models_status_created_at', table_name='fine_tuned_models', postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_conversations_user_id_created_at', table_name='conversations', postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_messages_conversation_id_created_at', table_name='messages', postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,23 @@
+"""add rolling conversation summary columns
+
+Revision ID: add_conversation_summary
+Revises: add_chat_query_indexes
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_conversation_summary'
+down_revision = 'add_chat_query_indexes'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.add_column('conversations', sa.Column('summary', sa.Text(), nullable=True))
+    op.add_column('conversations', sa.Column('summary_message_id', sa.Integer(), nullable=True))
+
+def downgrade() -> None:
+    op.drop_column('conversations', 'summary_message_id')
+    op.drop_column('conversations', 'summary')
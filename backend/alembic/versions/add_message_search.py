@@ -0,0 +1,73 @@
+"""add full-text search vector, owner and GIN index on messages
+
+Revision ID: add_message_search
+Revises: add_rate_limit_tables
+Create Date: 2026-10-18 20:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_message_search'
+down_revision = 'add_rate_limit_tables'
+branch_labels = None
+depends_on = None
+
+BACKFILL_BATCH_SIZE = 50000
+
+# The content's lexemes plus an 'owner <user id>' lexeme (the parser never emits spaces, so no word
+# can collide with it), letting the GIN index intersect a user's messages with the query terms
+SEARCH_VECTOR = (
+    "to_tsvector('pg_catalog.english', coalesce({content}, '')) || "
+    "CASE WHEN {user_id} IS NULL THEN ''::tsvector ELSE array_to_tsvector(ARRAY['owner ' || {user_id}]) END"
+)
+
+def upgrade() -> None:
+    # Trigger-maintained columns rather than generated ones: adding a stored generated column
+    # rewrites the whole table under an exclusive lock, these are backfilled in batches
+    op.add_column('messages', sa.Column('user_id', sa.Integer(), nullable=True))
+    op.execute("ALTER TABLE messages ADD COLUMN content_tsv tsvector")
+    op.execute(f"""
+        CREATE FUNCTION messages_search_fields() RETURNS trigger AS $$
+        BEGIN
+            IF NEW.user_id IS NULL THEN
+                SELECT user_id INTO NEW.user_id FROM conversations WHERE id = NEW.conversation_id;
+            END IF;
+            NEW.content_tsv := {SEARCH_VECTOR.format(content="NEW.content", user_id="NEW.user_id")};
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER messages_search_fields
+        BEFORE INSERT OR UPDATE OF content, conversation_id ON messages
+        FOR EACH ROW EXECUTE FUNCTION messages_search_fields()
+    """)
+
+    with op.get_context().autocommit_block():
+        conn = op.get_bind()
+        max_id = conn.scalar(sa.text("SELECT max(id) FROM messages")) or 0
+        vector = SEARCH_VECTOR.format(content="messages.content", user_id="conversations.user_id")
+        for start in range(0, max_id, BACKFILL_BATCH_SIZE):
+            # One short transaction per batch; rows written meanwhile are covered by the trigger
+            conn.execute(
+                sa.text(
+                    f"UPDATE messages SET user_id = conversations.user_id, content_tsv = {vector} "
+                    "FROM conversations WHERE conversations.id = messages.conversation_id "
+                    "AND messages.id > :start AND messages.id <= :end AND messages.content_tsv IS NULL"
+                ),
+                {"start": start, "end": start + BACKFILL_BATCH_SIZE}
+            )
+        op.create_index(
+            'ix_messages_content_tsv', 'messages', ['content_tsv'],
+            postgresql_using='gin', postgresql_concurrently=True, if_not_exists=True
+        )
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_messages_content_tsv', table_name='messages', postgresql_concurrently=True, if_exists=True)
+    op.execute("DROP TRIGGER IF EXISTS messages_search_fields ON messages")
+    op.execute("DROP FUNCTION IF EXISTS messages_search_fields()")
+    op.execute("ALTER TABLE messages DROP COLUMN IF EXISTS content_tsv")
+    op.drop_column('messages', 'user_id')
@@ -0,0 +1,38 @@
+"""add training exports table holding export watermarks
+
+Revision ID: add_training_exports_table
+Revises: add_uploaded_files_table
+Create Date: 2026-10-18 17:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_training_exports_table'
+down_revision = 'add_uploaded_files_table'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.create_table(
+        'training_exports',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(), nullable=False),
+        sa.Column('since_message_id', sa.BigInteger(), nullable=False),
+        sa.Column('until_message_id', sa.BigInteger(), nullable=False),
+        sa.Column('filters', sa.JSON(), nullable=False),
+        sa.Column('examples', sa.BigInteger(), nullable=False),
+        sa.Column('path', sa.String(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(
+        'ix_training_exports_name_until_message_id',
+        'training_exports',
+        ['name', 'until_message_id']
+    )
+
+def downgrade() -> None:
+    op.drop_index('ix_training_exports_name_until_message_id', table_name='training_exports')
+    op.drop_table('training_exports')
@@ -0,0 +1,37 @@
+"""add uploaded files table keyed by content hash
+
+Revision ID: add_uploaded_files_table
+Revises: add_jobs_table
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_uploaded_files_table'
+down_revision = 'add_jobs_table'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.create_table(
+        'uploaded_files',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('content_hash', sa.String(), nullable=False),
+        sa.Column('purpose', sa.String(), nullable=False),
+        sa.Column('file_id', sa.String(), nullable=False),
+        sa.Column('bytes', sa.BigInteger(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(
+        'ix_uploaded_files_content_hash_purpose',
+        'uploaded_files',
+        ['content_hash', 'purpose'],
+        unique=True
+    )
+
+def downgrade() -> None:
+    op.drop_index('ix_uploaded_files_content_hash_purpose', table_name='uploaded_files')
+    op.drop_table('uploaded_files')
@@ -0,0 +1,60 @@
+"""always take a message's search owner from its conversation
+
+Revision ID: fix_message_search_owner
+Revises: add_idempotency_keys
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'fix_message_search_owner'
+down_revision = 'add_idempotency_keys'
+branch_labels = None
+depends_on = None
+
+# Same vector as add_message_search
+SEARCH_VECTOR = (
+    "to_tsvector('pg_catalog.english', coalesce(NEW.content, '')) || "
+    "CASE WHEN NEW.user_id IS NULL THEN ''::tsvector ELSE array_to_tsvector(ARRAY['owner ' || NEW.user_id]) END"
+)
+
+def _replace_trigger(owner_lookup: str, columns: str) -> None:
+    op.execute(f"""
+        CREATE OR REPLACE FUNCTION messages_search_fields() RETURNS trigger AS $$
+        BEGIN
+            {owner_lookup}
+            NEW.content_tsv := {SEARCH_VECTOR};
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    # Dropping and creating it on the partitioned parent does the same on every partition
+    op.execute("DROP TRIGGER messages_search_fields ON messages")
+    op.execute(f"""
+        CREATE TRIGGER messages_search_fields
+        BEFORE INSERT OR UPDATE OF {columns} ON messages
+        FOR EACH ROW EXECUTE FUNCTION messages_search_fields()
+    """)
+
+def upgrade() -> None:
+    # A message moved to another conversation, or written with a stale user_id, kept its old
+    # owner and stayed searchable by them; the owner now always comes from the conversation
+    _replace_trigger(
+        "SELECT user_id INTO NEW.user_id FROM conversations WHERE id = NEW.conversation_id;",
+        "content, conversation_id, user_id",
+    )
+    # Rows that were already wrong; the trigger recomputes their search vector
+    op.execute(
+        "UPDATE messages SET user_id = conversations.user_id FROM conversations "
+        "WHERE conversations.id = messages.conversation_id "
+        "AND messages.user_id IS DISTINCT FROM conversations.user_id"
+    )
+
+def downgrade() -> None:
+    _replace_trigger(
+        """IF NEW.user_id IS NULL THEN
+                SELECT user_id INTO NEW.user_id FROM conversations WHERE id = NEW.conversation_id;
+            END IF;""",
+        "content, conversation_id",
+    )
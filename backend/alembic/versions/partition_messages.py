@@ -0,0 +1,167 @@
+"""partition messages by month of created_at and add the message archive tables
+
+Revision ID: partition_messages
+Revises: add_message_search
+Create Date: 2026-10-18 21:00:00.000000
+
+"""
+from datetime import datetime, timezone
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'partition_messages'
+down_revision = 'add_message_search'
+branch_labels = None
+depends_on = None
+
+# Monthly partitions created past the current one; python -m app.partitions keeps this many ahead
+PREMAKE_MONTHS = 3
+
+# Secondary indexes of messages, recreated as partitioned indexes on the new parent
+INDEXES = {
+    'ix_messages_id': "(id)",
+    'ix_messages_conversation_id_created_at': "(conversation_id, created_at, id)",
+    'ix_messages_content_tsv': "USING gin (content_tsv)",
+}
+
+SEARCH_TRIGGER = """
+    CREATE TRIGGER messages_search_fields
+    BEFORE INSERT OR UPDATE OF content, conversation_id ON messages
+    FOR EACH ROW EXECUTE FUNCTION messages_search_fields()
+"""
+
+def _add_months(moment: datetime, months: int) -> datetime:
+    month = moment.month - 1 + months
+    return moment.replace(year=moment.year + month // 12, month=month % 12 + 1, day=1)
+
+def upgrade() -> None:
+    # The existing table is not copied: it becomes the first partition, covering everything before
+    # next month, and the new monthly partitions take over from there. Only brief locks are taken.
+    with op.get_context().autocommit_block():
+        conn = op.get_bind()
+        # Past next month if rows with later timestamps (imported, clock skew) already exist
+        newest = conn.scalar(sa.text("SELECT max(created_at) FROM messages"))
+        newest = max(newest or datetime.now(timezone.utc), datetime.now(timezone.utc))
+        cutoff = _add_months(newest.astimezone(timezone.utc).replace(day=1, hour=0, minute=0, second=0, microsecond=0), 1)
+        # created_at becomes part of the primary key; default rows never had it NULL, but be sure
+        conn.execute(sa.text(
+            "UPDATE messages SET created_at = coalesce(conversations.created_at, now()) "
+            "FROM conversations WHERE conversations.id = messages.conversation_id AND messages.created_at IS NULL"
+        ))
+        conn.execute(sa.text("UPDATE messages SET created_at = now() WHERE created_at IS NULL"))
+        # Validated CHECKs let SET NOT NULL and ATTACH PARTITION skip their full-table scans under
+        # an exclusive lock; validating only takes a lock that lets reads and writes continue
+        # Re-runnable after a failure further down, which leaves these behind
+        conn.execute(sa.text("ALTER TABLE messages DROP CONSTRAINT IF EXISTS messages_created_at_not_null"))
+        conn.execute(sa.text("ALTER TABLE messages DROP CONSTRAINT IF EXISTS messages_legacy_range"))
+        conn.execute(sa.text(
+            "ALTER TABLE messages ADD CONSTRAINT messages_created_at_not_null CHECK (created_at IS NOT NULL) NOT VALID"
+        ))
+        conn.execute(sa.text("ALTER TABLE messages VALIDATE CONSTRAINT messages_created_at_not_null"))
+        conn.execute(sa.text(
+            f"ALTER TABLE messages ADD CONSTRAINT messages_legacy_range CHECK (created_at < '{cutoff.isoformat()}') NOT VALID"
+        ))
+        conn.execute(sa.text("ALTER TABLE messages VALIDATE CONSTRAINT messages_legacy_range"))
+        # Becomes the legacy partition's primary key, part of the new (id, created_at) one
+        op.create_index(
+            'messages_legacy_id_created_at_key', 'messages', ['id', 'created_at'],
+            unique=True, postgresql_concurrently=True, if_not_exists=True
+        )
+
+    op.execute("ALTER TABLE messages ALTER COLUMN created_at SET NOT NULL")
+    op.execute("ALTER TABLE messages DROP CONSTRAINT messages_created_at_not_null")
+    op.execute("DROP TRIGGER messages_search_fields ON messages")
+    op.execute("ALTER TABLE messages RENAME TO messages_legacy")
+    # A partition's primary key has to match the parent's (id, created_at)
+    op.execute(
+        "ALTER TABLE messages_legacy DROP CONSTRAINT messages_pkey, "
+        "ADD CONSTRAINT messages_legacy_pkey PRIMARY KEY USING INDEX messages_legacy_id_created_at_key"
+    )
+    for name in INDEXES:
+        op.execute(f"ALTER INDEX {name} RENAME TO {name.replace('ix_messages', 'messages_legacy')}")
+
+    op.execute("CREATE TABLE messages (LIKE messages_legacy INCLUDING DEFAULTS) PARTITION BY RANGE (created_at)")
+    op.execute("ALTER SEQUENCE messages_id_seq OWNED BY messages.id")
+    op.execute("ALTER TABLE messages ADD CONSTRAINT messages_pkey PRIMARY KEY (id, created_at)")
+    op.execute(
+        "ALTER TABLE messages ADD CONSTRAINT messages_conversation_id_fkey "
+        "FOREIGN KEY (conversation_id) REFERENCES conversations (id)"
+    )
+    # Created on the empty parent; attaching reuses the legacy table's matching indexes instead of building them
+    for name, definition in INDEXES.items():
+        op.execute(f"CREATE INDEX {name} ON messages {definition}")
+    op.execute(
+        f"ALTER TABLE messages ATTACH PARTITION messages_legacy FOR VALUES FROM (MINVALUE) TO ('{cutoff.isoformat()}')"
+    )
+    op.execute("ALTER TABLE messages_legacy DROP CONSTRAINT messages_legacy_range")
+    # Cloned onto every partition, present and future
+    op.execute(SEARCH_TRIGGER)
+
+    for month in range(PREMAKE_MONTHS + 1):
+        start, end = _add_months(cutoff, month), _add_months(cutoff, month + 1)
+        op.execute(
+            f"CREATE TABLE messages_p{start:%Y_%m} PARTITION OF messages "
+            f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+        )
+    # Catches rows no monthly partition covers if maintenance has not run in a while
+    op.execute("CREATE TABLE messages_default PARTITION OF messages DEFAULT")
+
+    op.create_table(
+        'message_archives',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('partition', sa.String(), nullable=False),
+        sa.Column('range_start', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('range_end', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('path', sa.String(), nullable=False),
+        sa.Column('messages', sa.BigInteger(), nullable=False),
+        sa.Column('bytes', sa.BigInteger(), nullable=False),
+        sa.Column('sha256', sa.String(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('partition')
+    )
+    op.create_table(
+        'message_archive_segments',
+        sa.Column('archive_id', sa.Integer(), nullable=False),
+        sa.Column('conversation_id', sa.Integer(), nullable=False),
+        sa.Column('byte_offset', sa.BigInteger(), nullable=False),
+        sa.Column('byte_length', sa.Integer(), nullable=False),
+        sa.Column('messages', sa.Integer(), nullable=False),
+        sa.Column('first_created_at', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('last_created_at', sa.DateTime(timezone=True), nullable=False),
+        sa.ForeignKeyConstraint(['archive_id'], ['message_archives.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['conversation_id'], ['conversations.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('conversation_id', 'archive_id')
+    )
+    op.create_index('ix_message_archive_segments_archive_id', 'message_archive_segments', ['archive_id'])
+    # Metadata-only on Postgres 11+; lets get_messages skip the archive lookup for most conversations
+    op.add_column(
+        'conversations', sa.Column('archived_messages', sa.Integer(), server_default='0', nullable=False)
+    )
+
+def downgrade() -> None:
+    # Copies every attached partition back into one plain table; archived partitions are not restored
+    op.drop_column('conversations', 'archived_messages')
+    op.drop_index('ix_message_archive_segments_archive_id', table_name='message_archive_segments')
+    op.drop_table('message_archive_segments')
+    op.drop_table('message_archives')
+
+    op.execute("ALTER TABLE messages RENAME TO messages_partitioned")
+    op.execute("ALTER TABLE messages_partitioned RENAME CONSTRAINT messages_pkey TO messages_partitioned_pkey")
+    for name in INDEXES:
+        op.execute(f"ALTER INDEX {name} RENAME TO {name.replace('ix_messages', 'messages_partitioned')}")
+    op.execute("CREATE TABLE messages (LIKE messages_partitioned INCLUDING DEFAULTS)")
+    op.execute("ALTER TABLE messages ALTER COLUMN created_at DROP NOT NULL")
+    op.execute("ALTER SEQUENCE messages_id_seq OWNED BY messages.id")
+    op.execute("INSERT INTO messages SELECT * FROM messages_partitioned")
+    op.execute("DROP TABLE messages_partitioned")
+    op.execute("ALTER TABLE messages ADD CONSTRAINT messages_pkey PRIMARY KEY (id)")
+    op.execute(
+        "ALTER TABLE messages ADD CONSTRAINT messages_conversation_id_fkey "
+        "FOREIGN KEY (conversation_id) REFERENCES conversations (id)"
+    )
+    for name, definition in INDEXES.items():
+        op.execute(f"CREATE INDEX {name} ON messages {definition}")
+    op.execute(SEARCH_TRIGGER)
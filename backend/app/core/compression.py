@@ -0,0 +1,120 @@
+import gzip
+from typing import List, Optional
+
+import anyio
+
+try:
+    import brotli
+except ImportError:  # Optional; responses are gzipped without it
+    brotli = None
+
+# Streamed bodies (SSE) pass through untouched: compressing them would hold events back in the encoder
+SKIPPED_CONTENT_TYPES = ("text/event-stream",)
+
+# Larger bodies are compressed in a worker thread; a full conversation history takes tens of milliseconds
+THREAD_MIN_BYTES = 64 * 1024
+
+def accepted_encodings(accept_encoding: str) -> List[str]:
+    """Codings from an ``Accept-Encoding`` header the client allows (q > 0), lower-cased."""
+    codings = []
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if coding and q > 0:
+            codings.append(coding.strip().lower())
+    return codings
+
+class CompressionMiddleware:
+    """ASGI middleware compressing response bodies with brotli or gzip.
+
+    Only complete (single-message) bodies of at least ``minimum_size`` bytes
+    are compressed, picking brotli when the client accepts it and the package
+    is installed. Strong ETags are weakened on compressed responses, since
+    the bytes differ from the representation they were computed for.
+    """
+
+    def __init__(self, app, minimum_size: int = 1024, gzip_level: int = 5, brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    def choose_encoding(self, accept_encoding: str) -> Optional[str]:
+        codings = accepted_encodings(accept_encoding)
+        if brotli is not None and "br" in codings:
+            return "br"
+        if "gzip" in codings or "*" in codings:
+            return "gzip"
+        return None
+
+    def compress(self, encoding: str, body: bytes) -> bytes:
+        if encoding == "br":
+            return brotli.compress(body, quality=self.brotli_quality)
+        return gzip.compress(body, compresslevel=self.gzip_level, mtime=0)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope["headers"])
+        encoding = self.choose_encoding(headers.get(b"accept-encoding", b"").decode("latin-1"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = None
+
+        async def send_wrapper(message):
+            nonlocal start
+            if message["type"] == "http.response.start":
+                # Held back until the body shows whether it is worth compressing
+                start = message
+                return
+            if message["type"] != "http.response.body" or start is None:
+                await send(message)
+                return
+
+            response_start, start = start, None
+            body = message.get("body", b"")
+            response_headers = [(name.lower(), value) for name, value in response_start.get("headers", [])]
+            names = {name for name, _ in response_headers}
+            content_type = dict(response_headers).get(b"content-type", b"").decode("latin-1")
+            if (
+                message.get("more_body", False)
+                or len(body) < self.minimum_size
+                or b"content-encoding" in names
+                or content_type.startswith(SKIPPED_CONTENT_TYPES)
+            ):
+                await send(response_start)
+                await send(message)
+                return
+
+            if len(body) >= THREAD_MIN_BYTES:
+                compressed = await anyio.to_thread.run_sync(self.compress, encoding, body)
+            else:
+                compressed = self.compress(encoding, body)
+            new_headers = []
+            for name, value in response_headers:
+                if name == b"content-length":
+                    continue
+                if name == b"etag" and not value.startswith(b"W/"):
+                    value = b"W/" + value
+                if name == b"vary":
+                    value = value + b", Accept-Encoding"
+                new_headers.append((name, value))
+            new_headers.append((b"content-encoding", encoding.encode()))
+            new_headers.append((b"content-length", str(len(compressed)).encode()))
+            if b"vary" not in names:
+                new_headers.append((b"vary", b"Accept-Encoding"))
+            response_start["headers"] = new_headers
+            await send(response_start)
+            await send({"type": "http.response.body", "body": compressed, "more_body": False})
+
+        await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,12 @@
+import logging
+
+from .config import settings
+
+LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+def configure_logging(level: str = None):
+    """Set up the root logger once per process; called by each entrypoint, not by library modules."""
+    root = logging.getLogger()
+    if root.handlers:
+        return
+    logging.basicConfig(level=(level or settings.LOG_LEVEL).upper(), format=LOG_FORMAT)
@@ -0,0 +1,196 @@
+import os
+import time
+
+from prometheus_client import REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, multiprocess
+from sqlalchemy import event
+
+# Exported by GET /metrics. Under gunicorn, PROMETHEUS_MULTIPROC_DIR (set by gunicorn.conf.py) makes every
+# worker write its values to files there, and the scrape merges them whichever worker answers it.
+# Gauges say how: livesum adds up the running workers, livemax reports the highest of them.
+
+# Seconds; spans fast cached responses through long LLM completions
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds",
+    "Time from receiving a request to the end of its response body",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+HTTP_REQUESTS_IN_FLIGHT = Gauge("http_requests_in_flight", "Requests being handled", ["method"], multiprocess_mode="livesum")
+
+CHAT_STAGE_SECONDS = Histogram(
+    "chat_stage_duration_seconds",
+    "Time spent in each stage of a chat turn",
+    ["endpoint", "stage"],
+    buckets=LATENCY_BUCKETS,
+)
+CHAT_TURNS_IN_FLIGHT = Gauge(
+    "chat_turns_in_flight",
+    "Chat turns between receiving the message and saving the reply",
+    ["endpoint"],
+    multiprocess_mode="livesum",
+)
+
+LLM_REQUEST_SECONDS = Histogram(
+    "llm_request_duration_seconds",
+    "Provider completion time, retries and queueing for a concurrency slot included",
+    ["model", "mode"],
+    buckets=LATENCY_BUCKETS,
+)
+LLM_FIRST_TOKEN_SECONDS = Histogram(
+    "llm_time_to_first_token_seconds",
+    "Time from requesting a streamed completion to its first content chunk",
+    ["model"],
+    buckets=LATENCY_BUCKETS,
+)
+LLM_TOKENS = Counter("llm_tokens_total", "Tokens billed by the provider", ["model", "type"])
+LLM_RETRIES = Counter("llm_retries_total", "Provider calls retried after a transient error", ["error"])
+LLM_REQUESTS_IN_FLIGHT = Gauge(
+    "llm_requests_in_flight", "Provider calls waiting for or holding a concurrency slot", multiprocess_mode="livesum"
+)
+
+MODEL_ROUTER_ATTEMPTS = Counter(
+    "model_router_attempts_total",
+    "Completion attempts per candidate model by outcome (success, error, timeout, circuit_open)",
+    ["model", "outcome"],
+)
+MODEL_ROUTER_SERVED = Counter(
+    "model_router_served_total",
+    "Chat completions by the model a turn was routed to and the model that answered (none if every candidate failed)",
+    ["routed", "served"],
+)
+MODEL_ROUTER_HEDGES = Counter(
+    "model_router_hedges_total",
+    "Hedged second requests by which one answered first (primary, hedge, or none)",
+    ["model", "winner"],
+)
+# Each worker keeps its own breakers; the most open of them is reported
+MODEL_CIRCUIT_STATE = Gauge(
+    "model_circuit_state",
+    "Circuit breaker state per model: 0 closed, 1 half-open, 2 open",
+    ["model"],
+    multiprocess_mode="livemax",
+)
+MODEL_CIRCUIT_OPENED = Counter("model_circuit_opened_total", "Times a model's circuit opened", ["model"])
+
+RATE_LIMITED = Counter("rate_limited_total", "Chat requests refused with a 429", ["reason"])
+
+IDEMPOTENT_SENDS = Counter(
+    "idempotent_sends_total",
+    "Chat sends carrying an Idempotency-Key by outcome (new, coalesced, replayed, in_progress, mismatch)",
+    ["outcome"],
+)
+
+def record_usage(model: str, usage):
+    """Count the ``usage`` block of a completion (or of the last chunk of a stream)."""
+    if usage is None:
+        return
+    LLM_TOKENS.labels(model, "prompt").inc(usage.prompt_tokens or 0)
+    LLM_TOKENS.labels(model, "completion").inc(usage.completion_tokens or 0)
+
+class MetricsMiddleware:
+    """ASGI middleware timing every HTTP request by method, route template and status.
+
+    Pure ASGI rather than ``BaseHTTPMiddleware`` so streamed responses pass
+    through untouched; the duration covers the full body, so for SSE it is the
+    length of the stream.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_code = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        HTTP_REQUESTS_IN_FLIGHT.labels(method).inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_REQUESTS_IN_FLIGHT.labels(method).dec()
+            # Set by the router once matched; templated paths keep the label set small
+            route = scope.get("route")
+            HTTP_REQUEST_SECONDS.labels(
+                method, route.path if route is not None else "unmatched", str(status_code)
+            ).observe(time.perf_counter() - started)
+
+DB_POOL_CHECKOUT_SECONDS = Histogram(
+    "db_pool_checkout_seconds",
+    "Time spent waiting for a pooled database connection",
+    ["pool"],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+DB_POOL_CHECKOUT_TIMEOUTS = Counter(
+    "db_pool_checkout_timeouts_total",
+    "Checkouts that gave up after the pool timeout",
+    ["pool"],
+)
+
+DB_POOL_SIZE = Gauge("db_pool_size", "Persistent connections the pools keep", ["pool"], multiprocess_mode="livesum")
+DB_POOL_CAPACITY = Gauge(
+    "db_pool_capacity", "Most connections the pools open, overflow included", ["pool"], multiprocess_mode="livesum"
+)
+DB_POOL_CHECKED_OUT = Gauge("db_pool_checked_out", "Connections currently in use", ["pool"], multiprocess_mode="livesum")
+DB_POOL_UTILIZATION = Gauge(
+    "db_pool_utilization",
+    "Checked out connections as a fraction of capacity, in the busiest worker",
+    ["pool"],
+    multiprocess_mode="livemax",
+)
+
+class PoolMetrics:
+    """Keeps the occupancy gauges of one engine's pool current from its checkout and checkin events.
+
+    Updated as connections move rather than read at scrape time, so the
+    values of workers that do not answer the scrape are current as well.
+    """
+
+    def __init__(self, name: str, engine):
+        self.name = name
+        self.size = engine.pool.size()
+        self.capacity = self.size + max(engine.pool._max_overflow, 0)
+        self.checked_out = 0
+        self._update()
+        # Pool events registered on the engine carry over to the pool it recreates on dispose
+        event.listen(engine.sync_engine, "checkout", self._checkout)
+        event.listen(engine.sync_engine, "checkin", self._checkin)
+
+    def _checkout(self, dbapi_connection, connection_record, connection_proxy):
+        self.checked_out += 1
+        self._update()
+
+    def _checkin(self, dbapi_connection, connection_record):
+        self.checked_out = max(0, self.checked_out - 1)
+        self._update()
+
+    def _update(self):
+        # All four each time: set in a preloading gunicorn master, they would not reach the workers' files
+        DB_POOL_SIZE.labels(self.name).set(self.size)
+        DB_POOL_CAPACITY.labels(self.name).set(self.capacity)
+        DB_POOL_CHECKED_OUT.labels(self.name).set(self.checked_out)
+        DB_POOL_UTILIZATION.labels(self.name).set(self.checked_out / self.capacity if self.capacity else 0)
+
+def instrument_pool(name: str, engine):
+    """Export the occupancy of ``engine``'s pool; engines without a queue pool (``NullPool``) have none."""
+    if hasattr(engine.pool, "checkedout"):
+        PoolMetrics(name, engine)
+
+def metrics_registry():
+    """The registry GET /metrics exports: this process's, or every worker's merged under gunicorn."""
+    if "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
@@ -1,24 +1,82 @@
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from jose import JWTError, jwt
+from typing import Optional
+import time
 from .core.config import settings
-from .models.database import SessionLocal
+from .models.database import AsyncReadSessionLocal, AsyncSessionLocal
 from .models.models import User
+from .services.context import ContextBuilder
+from .services.fine_tune_status import FineTuneStatusCache
+from .services.idempotency import IdempotentSends
+from .services.llm import LLMClient
+from .services.message_archive import MessageArchiveReader
+from .services.messages import MessageWriter
+from .services.model_registry import ModelRegistry
+from .services.model_router import ModelRouter
+from .services.passwords import PasswordHasher
+from .services.principals import PrincipalCache
+from .services.rate_limit import RateLimited, RateLimiter, retry_after_header
+from .services.semantic_cache import SemanticCache
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/auth/token")
 
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+async def get_read_db():
+    # The read replica if READ_REPLICA_DATABASE_URL is set, otherwise the primary
+    async with AsyncReadSessionLocal() as db:
         yield db
-    finally:
-        db.close()
+
+def get_llm_client(request: Request) -> LLMClient:
+    return request.app.state.llm_client
+
+def get_model_registry(request: Request) -> ModelRegistry:
+    return request.app.state.model_registry
+
+def get_model_router(request: Request) -> ModelRouter:
+    return request.app.state.model_router
+
+def get_context_builder(request: Request) -> ContextBuilder:
+    return request.app.state.context_builder
+
+def get_semantic_cache(request: Request) -> Optional[SemanticCache]:
+    # None unless SEMANTIC_CACHE_ENABLED
+    return request.app.state.semantic_cache
+
+def get_message_writer(request: Request) -> MessageWriter:
+    return request.app.state.message_writer
+
+def get_idempotent_sends(request: Request) -> IdempotentSends:
+    return request.app.state.idempotent_sends
+
+def get_message_archive(request: Request) -> MessageArchiveReader:
+    return request.app.state.message_archive
+
+def get_rate_limiter(request: Request) -> Optional[RateLimiter]:
+    # None unless RATE_LIMIT_ENABLED
+    return request.app.state.rate_limiter
+
+def get_fine_tune_status_cache(request: Request) -> FineTuneStatusCache:
+    return request.app.state.fine_tune_status_cache
+
+def get_password_hasher(request: Request) -> PasswordHasher:
+    return request.app.state.password_hasher
+
+def get_principal_cache(request: Request) -> PrincipalCache:
+    return request.app.state.principal_cache
 
 async def get_current_user(
+    request: Request,
     token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    principal_cache: PrincipalCache = Depends(get_principal_cache)
 ) -> User:
+    started = time.perf_counter()
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -27,12 +85,47 @@ async def get_current_user(
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=["HS256"])
         email: str = payload.get("sub")
+        user_id: Optional[int] = payload.get("uid")
         if email is None:
             raise credentials_exception
     except JWTError:
         raise credentials_exception
     
-    user = db.query(User).filter(User.email == email).first()
-    if user is None:
+    if user_id is None:
+        # Token issued before the uid claim existed
+        user = await db.scalar(select(User).filter(User.email == email))
+    else:
+        user = principal_cache.get_user(user_id)
+        if user is None:
+            user = await db.get(User, user_id)
+            if user is not None:
+                # Cached instances are shared between requests, so detach them from this session
+                db.expunge(user)
+                principal_cache.set_user(user)
+
+    # A token minted for a previous email address is no longer valid
+    if user is None or user.email != email:
         raise credentials_exception
+    # Reported by the chat endpoints as their "auth" stage
+    request.state.auth_seconds = time.perf_counter() - started
     return user
+
+async def check_rate_limit(
+    current_user: User = Depends(get_current_user),
+    rate_limiter: Optional[RateLimiter] = Depends(get_rate_limiter)
+):
+    """Refuse a chat message with 429 while the user is over their request rate or daily token quota."""
+    await enforce_rate_limit(rate_limiter, current_user.id)
+
+async def enforce_rate_limit(rate_limiter: Optional[RateLimiter], user_id: int):
+    """``check_rate_limit`` for routes that take the request from the user's bucket only once they run a turn."""
+    if rate_limiter is None:
+        return
+    try:
+        await rate_limiter.check(user_id)
+    except RateLimited as e:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=e.reason,
+            headers=retry_after_header(e.retry_after),
+        )
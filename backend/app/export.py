@@ -0,0 +1,63 @@
+"""Export chat turns as fine-tuning JSONL: ``python -m app.export --name advisor``.
+
+Runs are incremental by name: each continues after the last message the
+previous run of that name exported. Pass ``--full`` to start from the
+beginning. The output directory (one ``part-*.jsonl`` per shard plus a
+``manifest.json``) is printed when done.
+"""
+import argparse
+from datetime import datetime
+
+from .core.config import settings
+from .core.logging_config import configure_logging
+from .models.database import SessionLocal
+from .services.exports import ExportFilters, TrainingExporter
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--name", default="default", help="Export stream; the watermark is kept per name")
+    parser.add_argument("--full", action="store_true", help="Ignore the watermark and export everything")
+    parser.add_argument("--created-after", type=datetime.fromisoformat, help="ISO date or datetime of the reply")
+    parser.add_argument("--created-before", type=datetime.fromisoformat)
+    parser.add_argument("--user-id", type=int, action="append", default=[], help="Repeat for several users")
+    parser.add_argument("--min-chars", type=int, default=1)
+    parser.add_argument("--max-chars", type=int)
+    parser.add_argument("--shards", type=int, default=settings.EXPORT_SHARDS)
+    parser.add_argument("--batch-size", type=int, default=settings.EXPORT_BATCH_SIZE)
+    parser.add_argument("--output-dir", help=f"Defaults to {settings.EXPORT_DIR}/<name>/<first id>-<last id>")
+    parser.add_argument("--no-system-prompt", action="store_true", help="Leave the advisor system prompt out of examples")
+    args = parser.parse_args()
+
+    system_prompt = None
+    if not args.no_system_prompt:
+        from .routers.chat import SYSTEM_PROMPT
+        system_prompt = SYSTEM_PROMPT
+
+    exporter = TrainingExporter(
+        SessionLocal,
+        export_dir=settings.EXPORT_DIR,
+        shards=args.shards,
+        batch_size=args.batch_size,
+        system_prompt=system_prompt,
+        settle_seconds=settings.EXPORT_SETTLE_SECONDS,
+    )
+    result = exporter.export(
+        args.name,
+        ExportFilters(
+            created_after=args.created_after,
+            created_before=args.created_before,
+            user_ids=args.user_id,
+            min_chars=args.min_chars,
+            max_chars=args.max_chars,
+        ),
+        incremental=not args.full,
+        output_dir=args.output_dir,
+    )
+    if result.path is None:
+        print(f"Nothing to export after message {result.since_message_id}")
+    else:
+        print(f"{result.examples} examples from messages {result.since_message_id + 1}..{result.until_message_id}: {result.path}")
+
+if __name__ == "__main__":
+    configure_logging()
+    main()
@@ -1,10 +1,72 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from .routers import auth, chat, user, fine_tuning
 from .core.config import settings
-import logging
+from .core.logging_config import configure_logging
+from .core.compression import CompressionMiddleware
+from .core.metrics import MetricsMiddleware, metrics_registry
+from .server import preload
+from .models.database import AsyncSessionLocal, direct_async_engine, dispose_engines
+from .services.context import ContextBuilder
+from .services.fine_tune_status import FINE_TUNE_STATUS_CHANNEL, FineTuneStatusCache
+from .services.idempotency import IdempotentSends
+from .services.llm import LLMClient
+from .services.message_archive import MessageArchiveReader
+from .services.messages import MessageWriter
+from .services.model_registry import ACTIVE_MODEL_CHANNEL, ModelRegistry
+from .services.model_router import ModelRouter
+from .services.notifications import PostgresListener
+from .services.pagination import NEXT_CURSOR_HEADER
+from .services.passwords import PasswordHasher
+from .services.principals import PRINCIPAL_CHANNEL, PrincipalCache
+from .services.rate_limit import RateLimiter
+from .services.semantic_cache import SemanticCache
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+import anyio
 
-app = FastAPI(title="AI Companion API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One pooled LLM client per worker process, shared by every request
+    app.state.llm_client = LLMClient.from_settings(settings)
+    app.state.model_registry = ModelRegistry.from_settings(settings)
+    app.state.model_router = ModelRouter.from_settings(settings, app.state.llm_client)
+    app.state.principal_cache = PrincipalCache.from_settings(settings)
+    app.state.password_hasher = PasswordHasher.from_settings(settings)
+    app.state.fine_tune_status_cache = FineTuneStatusCache.from_settings(settings, AsyncSessionLocal)
+    app.state.context_builder = ContextBuilder.from_settings(settings, chat.SYSTEM_PROMPT)
+    app.state.message_writer = MessageWriter.from_settings(settings, AsyncSessionLocal)
+    app.state.idempotent_sends = IdempotentSends.from_settings(settings, AsyncSessionLocal)
+    app.state.message_archive = MessageArchiveReader.from_settings(settings)
+    app.state.rate_limiter = None
+    if settings.RATE_LIMIT_ENABLED:
+        app.state.rate_limiter = RateLimiter.from_settings(settings, AsyncSessionLocal)
+    # Import the lazily loaded libraries up front instead of on the first chat and login; a no-op
+    # in workers forked from a gunicorn master that preloaded them
+    await anyio.to_thread.run_sync(preload)
+    # Load the tokenizer encoding up front instead of on the first chat request
+    await anyio.to_thread.run_sync(app.state.context_builder.tokenizer.load)
+    app.state.semantic_cache = None
+    if settings.SEMANTIC_CACHE_ENABLED:
+        app.state.semantic_cache = SemanticCache.from_settings(settings)
+        await anyio.to_thread.run_sync(app.state.semantic_cache.load)
+    # Cross-worker cache invalidation over Postgres LISTEN/NOTIFY
+    app.state.listener = PostgresListener(direct_async_engine)
+    app.state.listener.subscribe(ACTIVE_MODEL_CHANNEL, app.state.model_registry.invalidate)
+    app.state.listener.subscribe(PRINCIPAL_CHANNEL, app.state.principal_cache.invalidate)
+    app.state.listener.subscribe(FINE_TUNE_STATUS_CHANNEL, app.state.fine_tune_status_cache.invalidate)
+    app.state.listener.start()
+    yield
+    await app.state.listener.stop()
+    await app.state.message_writer.close()
+    await chat.wait_for_follow_ups()
+    if app.state.semantic_cache is not None:
+        await anyio.to_thread.run_sync(app.state.semantic_cache.save)
+    app.state.password_hasher.shutdown()
+    await app.state.llm_client.aclose()
+    await dispose_engines()
+
+app = FastAPI(title="AI Companion API", lifespan=lifespan)
 
 # CORS middleware configuration
 app.add_middleware(
@@ -13,14 +75,22 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, "ETag"],
 )
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=settings.RESPONSE_COMPRESSION_MIN_BYTES,
+    gzip_level=settings.RESPONSE_GZIP_LEVEL,
+    brotli_quality=settings.RESPONSE_BROTLI_QUALITY,
 )
 
+# Added last so it is outermost and times everything below it
+app.add_middleware(MetricsMiddleware)
+
+# Once per process: under gunicorn this runs in the master and the forked workers inherit it
+configure_logging()
+
 # Include routers
 app.include_router(auth.router, prefix="/api/auth", tags=["Authentication"])
 app.include_router(chat.router, prefix="/api/chat", tags=["Chat"])
@@ -28,5 +98,13 @@ app.include_router(user.router, prefix="/api/users", tags=["Users"])
 app.include_router(fine_tuning.router, prefix="/api", tags=["Fine Tuning"])
 
 @app.get("/api/health")
-async def health_check():
-    return {"status": "healthy"}
+async def health_check(request: Request):
+    health = {"status": "healthy"}
+    if request.app.state.semantic_cache is not None:
+        health["semantic_cache"] = request.app.state.semantic_cache.stats()
+    return health
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    # Under gunicorn every worker's values, merged, whichever worker answers
+    return Response(generate_latest(metrics_registry()), media_type=CONTENT_TYPE_LATEST)
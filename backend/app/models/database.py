@@ -1,8 +1,112 @@
-from sqlalchemy import create_engine
+import time
+import uuid
+
+from sqlalchemy import create_engine, exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-from ..core.config import settings
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool
+from ..core.config import Settings, settings
+from ..core.metrics import DB_POOL_CHECKOUT_SECONDS, DB_POOL_CHECKOUT_TIMEOUTS, instrument_pool
+
+# Async drivers used by the request path for each sync DATABASE_URL dialect
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+def get_async_database_url(database_url: str) -> str:
+    """Derive the async driver URL from the sync DATABASE_URL used by alembic and scripts."""
+    url = make_url(database_url)
+    drivername = ASYNC_DRIVERS.get(url.drivername, url.drivername)
+    return url.set(drivername=drivername).render_as_string(hide_password=False)
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """Records how long each checkout waits for a connection, labelled by the pool's ``logging_name``.
+
+    SQLAlchemy passes ``logging_name`` on when it recreates the pool on dispose,
+    so the label sticks. Logs still go to the ``sqlalchemy.pool`` loggers.
+    """
+    _sqla_logger_namespace = "sqlalchemy.pool.impl.AsyncAdaptedQueuePool"
+
+    def _do_get(self):
+        pool_name = self.logging_name or "primary"
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            DB_POOL_CHECKOUT_TIMEOUTS.labels(pool_name).inc()
+            raise
+        finally:
+            DB_POOL_CHECKOUT_SECONDS.labels(pool_name).observe(time.perf_counter() - started)
+
+def create_api_engine(async_url: str, pool_name: str, settings: Settings, pooled: bool = True) -> AsyncEngine:
+    """Async engine with the configured pool, timeouts and PgBouncer compatibility.
+
+    With ``DB_PGBOUNCER`` (transaction pooling) PgBouncer does the pooling, so
+    the engine opens a connection per session and prepared statements get
+    unique names, since consecutive statements may reach different servers.
+    """
+    is_postgres = make_url(async_url).get_backend_name() == "postgresql"
+    connect_args = {}
+    options = {"pool_pre_ping": settings.DB_POOL_PRE_PING}
 
-engine = create_engine(settings.DATABASE_URL)
+    if settings.DB_PGBOUNCER and pooled and is_postgres:
+        options["poolclass"] = NullPool
+        connect_args["statement_cache_size"] = 0
+        connect_args["prepared_statement_name_func"] = lambda: f"__asyncpg_{uuid.uuid4()}__"
+    elif pooled:
+        options["poolclass"] = InstrumentedPool
+        options.update(
+            pool_logging_name=pool_name,
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT_SECONDS,
+            pool_recycle=settings.DB_POOL_RECYCLE_SECONDS,
+        )
+    else:
+        options["poolclass"] = NullPool
+
+    # PgBouncer rejects unknown startup parameters; set the timeout on the database role there instead
+    if is_postgres and settings.DB_STATEMENT_TIMEOUT_MS and not settings.DB_PGBOUNCER:
+        connect_args["server_settings"] = {"statement_timeout": str(settings.DB_STATEMENT_TIMEOUT_MS)}
+
+    engine = create_async_engine(async_url, connect_args=connect_args, **options)
+    instrument_pool(pool_name, engine)
+    return engine
+
+# Sync engine for alembic, maintenance scripts and other code running outside the event loop
+engine = create_engine(settings.DATABASE_URL, pool_pre_ping=settings.DB_POOL_PRE_PING)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# Async engine used by the API request handlers
+async_engine = create_api_engine(
+    settings.ASYNC_DATABASE_URL or get_async_database_url(settings.DATABASE_URL), "primary", settings
+)
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
+
+# Read-only endpoints use the replica when one is configured; it may lag the primary slightly
+read_async_engine: AsyncEngine = async_engine
+if settings.READ_REPLICA_DATABASE_URL:
+    read_async_engine = create_api_engine(get_async_database_url(settings.READ_REPLICA_DATABASE_URL), "replica", settings)
+AsyncReadSessionLocal = async_sessionmaker(
+    read_async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
+
+# LISTEN/NOTIFY and session advisory locks need a session that keeps its server connection,
+# which PgBouncer in transaction mode does not give; DIRECT_DATABASE_URL goes around it
+direct_async_engine: AsyncEngine = async_engine
+if settings.DIRECT_DATABASE_URL:
+    direct_async_engine = create_api_engine(
+        get_async_database_url(settings.DIRECT_DATABASE_URL), "direct", settings, pooled=False
+    )
+
+async def dispose_engines():
+    for api_engine in {async_engine, read_async_engine, direct_async_engine}:
+        await api_engine.dispose()
+
 Base = declarative_base()
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, BigInteger, String, Text, Date, DateTime, Float, ForeignKey, Boolean, Index, JSON, text
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from .database import Base
@@ -20,10 +20,20 @@ class Conversation(Base):
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
     name = Column(String, nullable=True)
+    summary = Column(Text, nullable=True)  # Rolling summary of turns that no longer fit the prompt
+    summary_message_id = Column(Integer, nullable=True)  # Last message folded into the summary
+    archived_messages = Column(Integer, nullable=False, server_default="0", default=0)  # Moved to the message archive
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     user = relationship("User", back_populates="conversations")
     messages = relationship("Message", back_populates="conversation")
 
+    __table_args__ = (
+        Index("ix_conversations_user_id_created_at", "user_id", "created_at", "id"),
+    )
+
+    # Fetch server defaults such as created_at on INSERT; async sessions cannot lazy-load them later
+    __mapper_args__ = {"eager_defaults": True}
+
 class Message(Base):
     __tablename__ = "messages"
 
@@ -32,8 +42,20 @@ class Message(Base):
     content = Column(Text)
     is_ai = Column(Boolean, default=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Owner of the conversation, copied by a trigger on Postgres, which also maintains the
+    # content_tsv search column (not mapped, so chat reads and writes never carry it)
+    user_id = Column(Integer, nullable=True)
     conversation = relationship("Conversation", back_populates="messages")
 
+    # On Postgres the table is partitioned by month of created_at, with (id, created_at) as its
+    # primary key (see the partition_messages migration); ids still come from one sequence
+
+    __table_args__ = (
+        Index("ix_messages_conversation_id_created_at", "conversation_id", "created_at", "id"),
+    )
+
+    __mapper_args__ = {"eager_defaults": True}
+
 class FineTunedModel(Base):
     __tablename__ = "fine_tuned_models"
 
@@ -45,3 +67,141 @@ class FineTunedModel(Base):
     validation_file = Column(String, nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     finished_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        Index("ix_fine_tuned_models_status_created_at", "status", "created_at"),
+        Index(
+            "ix_fine_tuned_models_succeeded",
+            "created_at",
+            postgresql_where=text("status = 'succeeded' AND model_id IS NOT NULL"),
+            sqlite_where=text("status = 'succeeded' AND model_id IS NOT NULL"),
+        ),
+    )
+
+class Job(Base):
+    """Durable background work, claimed by ``python -m app.worker`` processes."""
+    __tablename__ = "jobs"
+    __mapper_args__ = {"eager_defaults": True}
+
+    id = Column(Integer, primary_key=True)
+    kind = Column(String, nullable=False)
+    idempotency_key = Column(String, unique=True, nullable=True)
+    payload = Column(JSON, nullable=False)
+    status = Column(String, nullable=False)  # queued, running, succeeded or failed
+    progress = Column(String, nullable=True)  # Last step the handler checkpointed
+    result = Column(JSON, nullable=True)  # Checkpointed state; kept across retries so finished steps are skipped
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False)
+    last_error = Column(Text, nullable=True)
+    run_at = Column(DateTime(timezone=True), nullable=False)  # Not claimable before this (retry backoff)
+    locked_by = Column(String, nullable=True)
+    locked_at = Column(DateTime(timezone=True), nullable=True)  # Refreshed by every checkpoint
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        # Only unfinished jobs are ever scanned by the workers
+        Index(
+            "ix_jobs_claimable",
+            "run_at",
+            postgresql_where=text("status IN ('queued', 'running')"),
+            sqlite_where=text("status IN ('queued', 'running')"),
+        ),
+    )
+
+class UploadedFile(Base):
+    """Provider file ids by content hash, so an unchanged dataset is never uploaded twice."""
+    __tablename__ = "uploaded_files"
+
+    id = Column(Integer, primary_key=True)
+    content_hash = Column(String, nullable=False)  # sha256 of the uploaded bytes
+    purpose = Column(String, nullable=False)
+    file_id = Column(String, nullable=False)
+    bytes = Column(BigInteger, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    __table_args__ = (
+        Index("ix_uploaded_files_content_hash_purpose", "content_hash", "purpose", unique=True),
+    )
+
+class TrainingExport(Base):
+    """One run of ``python -m app.export``; the highest ``until_message_id`` per name is the watermark."""
+    __tablename__ = "training_exports"
+    __mapper_args__ = {"eager_defaults": True}
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String, nullable=False)
+    since_message_id = Column(BigInteger, nullable=False)  # Exclusive
+    until_message_id = Column(BigInteger, nullable=False)  # Inclusive
+    filters = Column(JSON, nullable=False)
+    examples = Column(BigInteger, nullable=False)
+    path = Column(String, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    __table_args__ = (
+        Index("ix_training_exports_name_until_message_id", "name", "until_message_id"),
+    )
+
+class RateLimitBucket(Base):
+    """Token bucket of a user's chat requests, for the shared (``RATE_LIMIT_STORE=postgres``) rate limiter."""
+    __tablename__ = "rate_limit_buckets"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    tokens = Column(Float, nullable=False)  # Requests available as of updated_at
+    updated_at = Column(DateTime(timezone=True), nullable=False)
+
+class TokenUsage(Base):
+    """LLM tokens charged to a user per UTC day, checked against ``DAILY_TOKEN_QUOTA``."""
+    __tablename__ = "token_usage"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    tokens = Column(BigInteger, nullable=False)
+
+class IdempotencyKey(Base):
+    """A user's ``Idempotency-Key`` for sending a chat message and, once the turn is stored, the reply it got."""
+    __tablename__ = "idempotency_keys"
+    __mapper_args__ = {"eager_defaults": True}
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    key = Column(String, nullable=False)
+    fingerprint = Column(String, nullable=False)  # Hash of the conversation and content first sent with the key
+    response = Column(JSON, nullable=True)  # The MessageResponse of the AI reply; set together with completed_at
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    completed_at = Column(DateTime(timezone=True), nullable=True)  # None while the turn is running
+
+    __table_args__ = (
+        Index("ix_idempotency_keys_user_id_key", "user_id", "key", unique=True),
+        Index("ix_idempotency_keys_created_at", "created_at"),
+    )
+
+class MessageArchive(Base):
+    """A detached ``messages`` partition, written by ``python -m app.partitions`` to a gzip JSONL file."""
+    __tablename__ = "message_archives"
+
+    id = Column(Integer, primary_key=True)
+    partition = Column(String, unique=True, nullable=False)
+    range_start = Column(DateTime(timezone=True), nullable=True)  # None for the partition of pre-partitioning history
+    range_end = Column(DateTime(timezone=True), nullable=False)
+    path = Column(String, nullable=False)  # Relative to MESSAGE_ARCHIVE_DIR
+    messages = Column(BigInteger, nullable=False)
+    bytes = Column(BigInteger, nullable=False)
+    sha256 = Column(String, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+class MessageArchiveSegment(Base):
+    """Where one conversation's messages sit in an archive file: a gzip member of their own."""
+    __tablename__ = "message_archive_segments"
+
+    conversation_id = Column(Integer, ForeignKey("conversations.id", ondelete="CASCADE"), primary_key=True)
+    archive_id = Column(Integer, ForeignKey("message_archives.id", ondelete="CASCADE"), primary_key=True)
+    byte_offset = Column(BigInteger, nullable=False)
+    byte_length = Column(Integer, nullable=False)
+    messages = Column(Integer, nullable=False)
+    first_created_at = Column(DateTime(timezone=True), nullable=False)
+    last_created_at = Column(DateTime(timezone=True), nullable=False)
+
+    __table_args__ = (
+        Index("ix_message_archive_segments_archive_id", "archive_id"),
+    )
@@ -0,0 +1,46 @@
+"""Maintain the monthly message partitions: ``python -m app.partitions``.
+
+Creates the partitions for the current month and the next
+``MESSAGE_PARTITION_PREMAKE_MONTHS``, then archives every partition older
+than ``MESSAGE_ARCHIVE_AFTER_MONTHS`` to ``MESSAGE_ARCHIVE_DIR`` and drops
+it, and purges deleted conversations from the archive files. Meant to run daily from cron; re-running is harmless, and a run that
+stopped halfway is completed by the next one. Postgres only.
+"""
+import argparse
+
+from .core.config import settings
+from .core.logging_config import configure_logging
+from .models.database import engine
+from .services.partitions import MessagePartitions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--premake-months", type=int, default=settings.MESSAGE_PARTITION_PREMAKE_MONTHS)
+    parser.add_argument(
+        "--archive-after-months", type=int, default=settings.MESSAGE_ARCHIVE_AFTER_MONTHS,
+        help="0 skips archiving"
+    )
+    parser.add_argument("--dry-run", action="store_true", help="Only print what would be created and archived")
+    args = parser.parse_args()
+
+    if engine.dialect.name != "postgresql":
+        parser.error("message partitioning needs PostgreSQL")
+
+    partitions = MessagePartitions(
+        engine,
+        archive_dir=settings.MESSAGE_ARCHIVE_DIR,
+        premake_months=args.premake_months,
+        archive_after_months=args.archive_after_months,
+        batch_size=settings.MESSAGE_ARCHIVE_BATCH_SIZE,
+    )
+    verb = "Would" if args.dry_run else "Did"
+    created = partitions.ensure(dry_run=args.dry_run)
+    print(f"{verb} create: {', '.join(created) or 'nothing'}")
+    archived = partitions.archive(dry_run=args.dry_run)
+    print(f"{verb} archive: {', '.join(archived) or 'nothing'}")
+    compacted = partitions.compact(dry_run=args.dry_run)
+    print(f"{verb} compact: {', '.join(compacted) or 'nothing'}")
+
+if __name__ == "__main__":
+    configure_logging()
+    main()
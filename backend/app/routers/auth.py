@@ -1,21 +1,19 @@
 from fastapi import APIRouter, Depends, HTTPException
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime, timedelta
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 import logging
 from ..core.config import settings
 from ..models.models import User
-from ..dependencies import get_db
+from ..dependencies import get_db, get_password_hasher
 from ..schemas.auth import Token, UserCreate, UserResponse
+from ..services.passwords import PasswordHasher, PasswordHasherBusy
 
-# Set up logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
 def create_access_token(data: dict):
@@ -25,19 +23,31 @@ def create_access_token(data: dict):
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm="HS256")
     return encoded_jwt
 
+def _busy() -> HTTPException:
+    logger.warning("Password hashing queue is full")
+    return HTTPException(
+        status_code=503,
+        detail="Too many authentication requests, please retry shortly",
+        headers={"Retry-After": "1"},
+    )
+
 @router.post("/register", response_model=UserResponse)
-async def register(user: UserCreate, db: Session = Depends(get_db)):
+async def register(
+    user: UserCreate,
+    db: AsyncSession = Depends(get_db),
+    password_hasher: PasswordHasher = Depends(get_password_hasher)
+):
     try:
         logger.info(f"Attempting to register user with email: {user.email}")
         
         # Check if user exists
-        db_user = db.query(User).filter(User.email == user.email).first()
+        db_user = await db.scalar(select(User).filter(User.email == user.email))
         if db_user:
             logger.warning(f"Registration failed: Email {user.email} already exists")
             raise HTTPException(status_code=400, detail="Email already registered")
         
         # Create new user
-        hashed_password = pwd_context.hash(user.password)
+        hashed_password = await password_hasher.hash(user.password)
         db_user = User(
             email=user.email,
             hashed_password=hashed_password,
@@ -47,11 +57,14 @@ async def register(user: UserCreate, db: Session = Depends(get_db)):
         # Add to database
         logger.info("Adding user to database")
         db.add(db_user)
-        db.commit()
-        db.refresh(db_user)
+        await db.commit()
         
         logger.info(f"Successfully registered user: {user.email}")
         return db_user
+    except HTTPException:
+        raise
+    except PasswordHasherBusy:
+        raise _busy()
     except Exception as e:
         logger.error(f"Registration error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -59,22 +72,37 @@ async def register(user: UserCreate, db: Session = Depends(get_db)):
 @router.post("/token", response_model=Token)
 async def login(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    password_hasher: PasswordHasher = Depends(get_password_hasher)
 ):
     try:
         logger.info(f"Login attempt for user: {form_data.username}")
-        user = db.query(User).filter(User.email == form_data.username).first()
-        if not user or not pwd_context.verify(form_data.password, user.hashed_password):
+        user = await db.scalar(select(User).filter(User.email == form_data.username))
+        valid, new_hash = await password_hasher.verify_and_update(
+            form_data.password, user.hashed_password if user else None
+        )
+        if not valid:
             logger.warning(f"Login failed for user: {form_data.username}")
             raise HTTPException(
                 status_code=401,
                 detail="Incorrect email or password",
                 headers={"WWW-Authenticate": "Bearer"},
             )
+
+        if new_hash:
+            # The bcrypt cost changed since this password was stored
+            user.hashed_password = new_hash
+            await db.commit()
+            logger.info(f"Rehashed password for user: {form_data.username}")
         
-        access_token = create_access_token(data={"sub": user.email})
+        # uid lets get_current_user resolve the user by primary key (and its principal cache)
+        access_token = create_access_token(data={"sub": user.email, "uid": user.id})
         logger.info(f"Login successful for user: {form_data.username}")
         return {"access_token": access_token, "token_type": "bearer"}
+    except HTTPException:
+        raise
+    except PasswordHasherBusy:
+        raise _busy()
     except Exception as e:
         logger.error(f"Login error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
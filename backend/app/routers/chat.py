@@ -1,191 +1,458 @@
-from fastapi import APIRouter, Depends, HTTPException, Body
-from sqlalchemy.orm import Session
-from typing import List, Optional
-from openai import OpenAI
-from ..core.config import settings
-from ..models.models import User, Conversation, Message, FineTunedModel
-from ..dependencies import get_db, get_current_user
-from ..schemas.chat import MessageCreate, MessageResponse, ConversationResponse
+from fastapi import APIRouter, Depends, HTTPException, Body, Header, Query, Request, Response
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from starlette.background import BackgroundTask
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import noload
+from typing import List, Optional, Tuple
+from ..core.metrics import CHAT_STAGE_SECONDS, CHAT_TURNS_IN_FLIGHT
+from ..models.models import User, Conversation, Message
+from ..models.database import AsyncSessionLocal
+from ..dependencies import (
+    get_db, get_read_db, get_current_user, get_llm_client, get_model_registry, get_model_router,
+    get_context_builder, get_semantic_cache, get_message_writer, get_message_archive, get_rate_limiter,
+    get_idempotent_sends, check_rate_limit, enforce_rate_limit
+)
+from ..schemas.chat import MessageCreate, MessageResponse, MessageSearchResult, ConversationResponse, ConversationSummary
+from ..services.conditional import PRIVATE_REVALIDATE, etag_matches, weak_etag
+from ..services.context import ContextBuilder, PromptContext
+from ..services.idempotency import IdempotencyKeyInUse, IdempotencyKeyMismatch, IdempotentSends, request_fingerprint
+from ..services.llm import LLMClient
+from ..services.message_archive import MessageArchiveReader
+from ..services.messages import MessageWriter
+from ..services.model_registry import ModelRegistry
+from ..services.model_router import ModelRouter, ModelUnavailable
+from ..services.pagination import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor, keyset_page
+from ..services.rate_limit import RateLimiter
+from ..services.search import search_messages
+from ..services.semantic_cache import SemanticCache
+import anyio
+import asyncio
+import json
 import logging
+import time
 
 # Configure logger
 logger = logging.getLogger(__name__)
 
-router = APIRouter()
+# orjson encodes the validated response bodies; about 40% less time than the stdlib encoder for a long history
+router = APIRouter(default_response_class=ORJSONResponse)
+
+# Kept free of indentation: every prompt token is paid for on every turn
+SYSTEM_PROMPT = """You are a knowledgeable financial advisor AI system.
+Your role is to provide well-researched financial recommendations and insights in the following areas:
+1. Stock Investment Analysis: Evaluate market trends, company performance, and provide investment recommendations
+2. Stock Trading Advice: Offer buy/sell suggestions based on technical and fundamental analysis
+3. Cryptocurrency Analysis: Assess crypto markets, provide insights on different cryptocurrencies, and suggest investment strategies
+
+Important Guidelines:
+- Always provide data-driven recommendations
+- Include relevant market indicators and metrics when applicable
+- Clearly state the risks associated with any investment advice
+- Remind users that all recommendations are for informational purposes and they should do their own research
+- Suggest diversification strategies when appropriate
+- Stay updated on market trends and economic factors
+
+Disclaimer: Make it clear that you're providing general financial information and not personalized financial advice that would require a licensed professional."""
 
 @router.post("/conversations", response_model=ConversationResponse)
-async def create_conversation(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    conversation = Conversation(user_id=current_user.id)
+async def create_conversation(db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_user)):
+    conversation = Conversation(user_id=current_user.id, messages=[])
     db.add(conversation)
-    db.commit()
-    db.refresh(conversation)
+    await db.commit()
+    return conversation
+
+async def _get_user_conversation(db: AsyncSession, conversation_id: int, user: User) -> Conversation:
+    conversation = await db.scalar(
+        select(Conversation).filter(
+            Conversation.id == conversation_id,
+            Conversation.user_id == user.id
+        )
+    )
+    if not conversation:
+        raise HTTPException(status_code=404, detail="Conversation not found")
     return conversation
 
+async def _build_completion_request(
+    db: AsyncSession,
+    model_registry: ModelRegistry,
+    context_builder: ContextBuilder,
+    conversation: Conversation,
+    user_id: int,
+    content: str,
+    endpoint: str
+) -> Tuple[dict, PromptContext]:
+    """Resolve the model and assemble the prompt for the next AI turn, ending with ``content``."""
+    # Summary plus as much recent history as fits the token budget, as proper chat turns
+    with CHAT_STAGE_SECONDS.labels(endpoint, "history").time():
+        context = await context_builder.build(db, conversation, content)
+
+    # Resolved from the in-process registry; no query unless the cache expired
+    with CHAT_STAGE_SECONDS.labels(endpoint, "model").time():
+        active_model = await model_registry.resolve(db, user_id)
+    logger.debug(
+        f"Routing conversation {conversation.id} to {active_model.model_id} ({active_model.reason}), "
+        f"{context.prompt_tokens} prompt tokens"
+    )
+
+    completion_request = {
+        "model": active_model.model_id,  # Fine-tuned model if available
+        "messages": context.messages,
+        "temperature": 0.7,
+        "max_tokens": 500
+    }
+    return completion_request, context
+
+async def _refresh_summary(
+    context_builder: ContextBuilder,
+    llm_client: LLMClient,
+    conversation_id: int,
+    summary: Optional[str],
+    summary_message_id: Optional[int],
+    context: PromptContext
+):
+    """Runs after the reply is stored, so summarizing never delays it."""
+    try:
+        async with AsyncSessionLocal() as db:
+            await context_builder.update_summary(
+                db, llm_client, conversation_id, summary, summary_message_id, context.first_included_id
+            )
+    except Exception as e:
+        logger.error(f"Error summarizing conversation {conversation_id}: {str(e)}")
+
+# Work a send starts once its turn is stored (quota charge, summary refresh), awaited at shutdown
+_follow_ups = set()
+
+def _after_turn(coro):
+    task = asyncio.create_task(coro)
+    _follow_ups.add(task)
+    task.add_done_callback(_follow_ups.discard)
+
+async def wait_for_follow_ups():
+    if _follow_ups:
+        await asyncio.gather(*_follow_ups, return_exceptions=True)
+
+def _total_tokens(usage, context: PromptContext) -> int:
+    # Providers that send no usage are charged at least the prompt
+    return usage.total_tokens if usage is not None else context.prompt_tokens
+
+def _observe_auth(request: Request, endpoint: str):
+    # Measured in get_current_user, which runs before the endpoint body
+    CHAT_STAGE_SECONDS.labels(endpoint, "auth").observe(getattr(request.state, "auth_seconds", 0.0))
+
+def _sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
 @router.post("/{conversation_id}/messages", response_model=MessageResponse)
 async def send_message(
     conversation_id: int,
     message: MessageCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    request: Request,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=255),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    llm_client: LLMClient = Depends(get_llm_client),
+    model_registry: ModelRegistry = Depends(get_model_registry),
+    model_router: ModelRouter = Depends(get_model_router),
+    context_builder: ContextBuilder = Depends(get_context_builder),
+    semantic_cache: Optional[SemanticCache] = Depends(get_semantic_cache),
+    message_writer: MessageWriter = Depends(get_message_writer),
+    rate_limiter: Optional[RateLimiter] = Depends(get_rate_limiter),
+    idempotent_sends: IdempotentSends = Depends(get_idempotent_sends)
 ):
+    """Send a message and wait for the reply.
+
+    With an ``Idempotency-Key`` header, retries of the same message (a double
+    click, a client timing out) share the first request's turn: one reply is
+    stored and every request gets it, replayed from the database for
+    ``IDEMPOTENCY_KEY_RETENTION_HOURS``. Reusing a key for another message is
+    refused with 422; a retry reaching another worker process while the first
+    request is still running gets 409. Only requests that run a turn count
+    against the rate limit, so retries answered this way cost nothing.
+    """
+    _observe_auth(request, "send")
     # Verify conversation belongs to user
-    conversation = db.query(Conversation).filter(
-        Conversation.id == conversation_id,
-        Conversation.user_id == current_user.id
-    ).first()
-    if not conversation:
-        raise HTTPException(status_code=404, detail="Conversation not found")
+    await _get_user_conversation(db, conversation_id, current_user)
+    # The turn opens its own session: with an Idempotency-Key it is shared and can outlive this request
+    await db.close()
+    user_id = current_user.id
+    content = message.content
 
-    # Save user message
-    user_message = Message(
-        conversation_id=conversation_id,
-        content=message.content,
-        is_ai=False
-    )
-    db.add(user_message)
-    db.commit()
+    async def send(idempotency_key_id: Optional[int] = None) -> Message:
+        await enforce_rate_limit(rate_limiter, user_id)
+        with CHAT_TURNS_IN_FLIGHT.labels("send").track_inprogress():
+            # Closed before the completion, so no pooled connection is held while waiting for it
+            async with AsyncSessionLocal() as turn_db:
+                conversation = await turn_db.get(Conversation, conversation_id)
+                if conversation is None:
+                    raise HTTPException(status_code=404, detail="Conversation not found")
+                completion_request, context = await _build_completion_request(
+                    turn_db, model_registry, context_builder, conversation, user_id, content, "send"
+                )
 
-    # Get conversation history for context
-    history = db.query(Message).filter(
-        Message.conversation_id == conversation_id
-    ).order_by(Message.created_at.desc()).limit(5).all()
-    
-    history_text = "\n".join([
-        f"{'AI' if msg.is_ai else 'User'}: {msg.content}"
-        for msg in reversed(history)
-    ])
+            # Opening questions are matched against earlier answers before paying for a completion
+            cache_lookup = None
+            if semantic_cache is not None:
+                with CHAT_STAGE_SECONDS.labels("send", "cache").time():
+                    cache_lookup = await semantic_cache.lookup(completion_request["model"], completion_request["messages"])
 
-    try:
-        # Get the latest successful fine-tuned model
-        fine_tuned_model = db.query(FineTunedModel).filter(
-            FineTunedModel.status == 'succeeded',
-            FineTunedModel.model_id.isnot(None)
-        ).order_by(FineTunedModel.created_at.desc()).first()
-
-        # Determine which model to use
-        model_id = fine_tuned_model.model_id if fine_tuned_model else "gpt-3.5-turbo"
-        
-        # Log detailed information about the model being used
-        if fine_tuned_model:
-            logger.info(
-                f"Using fine-tuned model for conversation {conversation_id}:\n"
-                f"  - Model ID: {model_id}\n"
-                f"  - Fine-tune ID: {fine_tuned_model.fine_tune_id}\n"
-                f"  - Created at: {fine_tuned_model.created_at}\n"
-                f"  - Training file: {fine_tuned_model.training_file}\n"
-                f"  - Validation file: {fine_tuned_model.validation_file}"
-            )
-        else:
-            logger.info(f"Using base model {model_id} for conversation {conversation_id} (no fine-tuned model available)")
-        
-        client = OpenAI(api_key=settings.OPENAI_API_KEY)
-        response = client.chat.completions.create(
-            model=model_id,  # Use fine-tuned model if available
-            messages=[
-                {"role": "system", "content": """You are a knowledgeable financial advisor AI system. 
-                Your role is to provide well-researched financial recommendations and insights in the following areas:
-                1. Stock Investment Analysis: Evaluate market trends, company performance, and provide investment recommendations
-                2. Stock Trading Advice: Offer buy/sell suggestions based on technical and fundamental analysis
-                3. Cryptocurrency Analysis: Assess crypto markets, provide insights on different cryptocurrencies, and suggest investment strategies
-                
-                Important Guidelines:
-                - Always provide data-driven recommendations
-                - Include relevant market indicators and metrics when applicable
-                - Clearly state the risks associated with any investment advice
-                - Remind users that all recommendations are for informational purposes and they should do their own research
-                - Suggest diversification strategies when appropriate
-                - Stay updated on market trends and economic factors
-                
-                Disclaimer: Make it clear that you're providing general financial information and not personalized financial advice that would require a licensed professional."""},
-                {"role": "user", "content": f"Previous conversation:\n{history_text}\n\nUser: {message.content}"}
-            ],
-            temperature=0.7,
-            max_tokens=500
-        )
+            response = None
+            if cache_lookup is not None and cache_lookup.response is not None:
+                ai_response = cache_lookup.response
+            else:
+                with CHAT_STAGE_SECONDS.labels("send", "llm").time():
+                    response = await model_router.chat_completion(**completion_request)
+                ai_response = response.choices[0].message.content
+                if cache_lookup is not None:
+                    semantic_cache.store(cache_lookup, ai_response)
+
+            # Both sides of the turn in one INSERT, once the reply is in
+            with CHAT_STAGE_SECONDS.labels("send", "persist").time():
+                _, ai_message = await message_writer.write_turn(
+                    conversation_id, content, ai_response, idempotency_key_id
+                )
 
-        ai_response = response.choices[0].message.content
+            # Started by the turn rather than tied to one request's response: with an Idempotency-Key
+            # the turn is shared, and the request that started it may be gone by now
+            if rate_limiter is not None and response is not None:
+                # A cached answer costs nothing
+                _after_turn(rate_limiter.charge(user_id, _total_tokens(response.usage, context)))
+            if context_builder.needs_summary(context):
+                _after_turn(_refresh_summary(
+                    context_builder, llm_client, conversation_id,
+                    conversation.summary, conversation.summary_message_id, context
+                ))
+            return ai_message
 
-        # Save AI response
-        ai_message = Message(
-            conversation_id=conversation_id,
-            content=ai_response,
-            is_ai=True
+    try:
+        if idempotency_key is None:
+            return await send()
+        return await idempotent_sends.run(
+            user_id, idempotency_key, request_fingerprint(conversation_id, content), send
         )
-        db.add(ai_message)
-        db.commit()
-        db.refresh(ai_message)
+    except IdempotencyKeyMismatch as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except IdempotencyKeyInUse as e:
+        raise HTTPException(status_code=409, detail=str(e), headers={"Retry-After": "1"})
+    except HTTPException:
+        raise
+    except ModelUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/{conversation_id}/messages/stream", dependencies=[Depends(check_rate_limit)])
+async def stream_message(
+    conversation_id: int,
+    message: MessageCreate,
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    llm_client: LLMClient = Depends(get_llm_client),
+    model_registry: ModelRegistry = Depends(get_model_registry),
+    model_router: ModelRouter = Depends(get_model_router),
+    context_builder: ContextBuilder = Depends(get_context_builder),
+    semantic_cache: Optional[SemanticCache] = Depends(get_semantic_cache),
+    message_writer: MessageWriter = Depends(get_message_writer),
+    rate_limiter: Optional[RateLimiter] = Depends(get_rate_limiter)
+):
+    """Server-sent events variant of send_message.
 
-        return ai_message
+    Emits a ``token`` event per completion chunk, then a ``done`` event carrying
+    the saved AI message. If the client disconnects, the upstream completion is
+    closed and whatever was received so far is saved. A model that fails
+    before its first token is replaced by the next candidate; nothing is saved
+    if every candidate fails.
+    """
+    _observe_auth(request, "stream")
+    conversation = await _get_user_conversation(db, conversation_id, current_user)
 
+    try:
+        completion_request, context = await _build_completion_request(
+            db, model_registry, context_builder, conversation, current_user.id, message.content, "stream"
+        )
+        # Nothing is written until the reply is in, so no pooled connection is held during the completion
+        await db.close()
+        cache_lookup = None
+        if semantic_cache is not None:
+            with CHAT_STAGE_SECONDS.labels("stream", "cache").time():
+                cache_lookup = await semantic_cache.lookup(completion_request["model"], completion_request["messages"])
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    cached = cache_lookup is not None and cache_lookup.response is not None
+
+    async def event_stream():
+        chunks = []
+        ai_message = None
+        usage = None
+        with CHAT_TURNS_IN_FLIGHT.labels("stream").track_inprogress():
+            try:
+                if cached:
+                    # A cached answer goes out as a single token event
+                    chunks.append(cache_lookup.response)
+                    yield _sse_event("token", {"content": cache_lookup.response})
+                else:
+                    started = time.perf_counter()
+                    async with model_router.stream_chat_completion(**completion_request) as stream:
+                        async for chunk in stream:
+                            usage = chunk.usage or usage
+                            delta = chunk.choices[0].delta.content if chunk.choices else None
+                            if delta:
+                                if not chunks:
+                                    CHAT_STAGE_SECONDS.labels("stream", "llm_first_token").observe(time.perf_counter() - started)
+                                chunks.append(delta)
+                                yield _sse_event("token", {"content": delta})
+                    CHAT_STAGE_SECONDS.labels("stream", "llm").observe(time.perf_counter() - started)
+                    # Only complete replies are cached
+                    if cache_lookup is not None and chunks:
+                        semantic_cache.store(cache_lookup, "".join(chunks))
+            except Exception as e:
+                logger.error(f"Streaming error for conversation {conversation_id}: {str(e)}")
+                yield _sse_event("error", {"detail": str(e)})
+            finally:
+                # Shielded so the turn is still saved, with the partial reply, when a client disconnect cancels the stream
+                with anyio.CancelScope(shield=True):
+                    if chunks:
+                        with CHAT_STAGE_SECONDS.labels("stream", "persist").time():
+                            _, ai_message = await message_writer.write_turn(conversation_id, message.content, "".join(chunks))
+                    # A partial reply still cost its tokens; a cached one cost none
+                    if rate_limiter is not None and not cached and (chunks or usage is not None):
+                        await rate_limiter.charge(current_user.id, _total_tokens(usage, context))
+
+        if ai_message is not None:
+            yield _sse_event("done", MessageResponse.model_validate(ai_message).model_dump(mode="json"))
+
+    summary_task = None
+    if context_builder.needs_summary(context):
+        summary_task = BackgroundTask(
+            _refresh_summary, context_builder, llm_client, conversation_id,
+            conversation.summary, conversation.summary_message_id, context
+        )
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=summary_task
+    )
 
-@router.get("/conversations", response_model=List[ConversationResponse])
+@router.get("/conversations", response_model=List[ConversationSummary])
 async def get_conversations(
-    db: Session = Depends(get_db),
+    response: Response,
+    limit: int = Query(50, ge=1, le=200),
+    before: Optional[str] = Query(None, description=f"Cursor from {NEXT_CURSOR_HEADER} for the next page"),
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ):
-    return db.query(Conversation).filter(
-        Conversation.user_id == current_user.id
-    ).order_by(Conversation.created_at.desc()).all()
+    # Newest first; messages are fetched per conversation through get_messages
+    conversations, next_cursor = await keyset_page(
+        db,
+        select(Conversation).filter(
+            Conversation.user_id == current_user.id
+        ).options(noload(Conversation.messages)),
+        Conversation.created_at,
+        Conversation.id,
+        limit,
+        before
+    )
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return conversations
+
+@router.get("/search", response_model=List[MessageSearchResult])
+async def search(
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=200, description="Words, \"quoted phrases\", or and -excluded terms"),
+    limit: int = Query(20, ge=1, le=100),
+    before: Optional[str] = Query(None, description=f"Cursor from {NEXT_CURSOR_HEADER} for the next page"),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user)
+):
+    # Across all of the user's conversations, best match first
+    results, next_cursor = await search_messages(db, current_user.id, q, limit, before)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return results
 
 @router.get("/{conversation_id}/messages", response_model=List[MessageResponse])
 async def get_messages(
     conversation_id: int,
-    db: Session = Depends(get_db),
+    response: Response,
+    limit: int = Query(50, ge=1, le=200),
+    before: Optional[str] = Query(None, description=f"Cursor from {NEXT_CURSOR_HEADER} for older messages"),
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_read_db),
+    message_archive: MessageArchiveReader = Depends(get_message_archive),
     current_user: User = Depends(get_current_user)
 ):
-    conversation = db.query(Conversation).filter(
-        Conversation.id == conversation_id,
-        Conversation.user_id == current_user.id
-    ).first()
-    if not conversation:
-        raise HTTPException(status_code=404, detail="Conversation not found")
+    conversation = await _get_user_conversation(db, conversation_id, current_user)
+
+    # Messages are only ever appended, so the newest one versions every page of the history.
+    # One row from the end of the (conversation_id, created_at, id) index; nothing else is loaded
+    latest_id = await db.scalar(
+        select(Message.id)
+        .filter(Message.conversation_id == conversation_id)
+        .order_by(Message.created_at.desc(), Message.id.desc())
+        .limit(1)
+    )
+    etag = weak_etag(conversation_id, latest_id, limit, before)
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": PRIVATE_REVALIDATE})
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = PRIVATE_REVALIDATE
     
-    return db.query(Message).filter(
-        Message.conversation_id == conversation_id
-    ).order_by(Message.created_at.asc()).all()
+    # The most recent page, returned oldest first for display
+    messages, next_cursor = await keyset_page(
+        db,
+        select(Message).filter(Message.conversation_id == conversation_id),
+        Message.created_at,
+        Message.id,
+        limit,
+        before
+    )
+    # Older history whose partitions were archived continues where the table runs out
+    if next_cursor is None and conversation.archived_messages:
+        if messages:
+            older_than = (messages[-1].created_at, messages[-1].id)
+        else:
+            older_than = decode_cursor(before) if before else None
+        archived = await message_archive.page(db, conversation_id, limit - len(messages) + 1, older_than)
+        messages.extend(archived)
+        if len(messages) > limit:
+            messages = messages[:limit]
+            next_cursor = encode_cursor(messages[-1].created_at, messages[-1].id)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return list(reversed(messages))
 
 @router.delete("/conversations/{conversation_id}")
 async def delete_conversation(
     conversation_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     # First, verify the conversation belongs to the user
-    conversation = db.query(Conversation).filter(
-        Conversation.id == conversation_id,
-        Conversation.user_id == current_user.id
-    ).first()
-    
-    if not conversation:
-        raise HTTPException(status_code=404, detail="Conversation not found")
+    conversation = await _get_user_conversation(db, conversation_id, current_user)
     
-    # Delete all messages in the conversation
-    db.query(Message).filter(Message.conversation_id == conversation_id).delete()
+    # Delete all messages in the conversation. Archived ones lose their segment rows with it, and
+    # python -m app.partitions then rewrites the archive files without them
+    await db.execute(delete(Message).filter(Message.conversation_id == conversation_id))
     
     # Delete the conversation
-    db.delete(conversation)
-    db.commit()
+    await db.delete(conversation)
+    await db.commit()
     
     return {"message": "Conversation deleted successfully"}
 
-@router.patch("/conversations/{conversation_id}/name", response_model=ConversationResponse)
+@router.patch("/conversations/{conversation_id}/name", response_model=ConversationSummary)
 async def update_conversation_name(
     conversation_id: int,
     name: str = Body(..., embed=True),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    conversation = db.query(Conversation).filter(
-        Conversation.id == conversation_id,
-        Conversation.user_id == current_user.id
-    ).first()
-    
-    if not conversation:
-        raise HTTPException(status_code=404, detail="Conversation not found")
+    conversation = await _get_user_conversation(db, conversation_id, current_user)
     
     conversation.name = name
-    db.commit()
-    db.refresh(conversation)
+    await db.commit()
     return conversation
@@ -1,111 +1,107 @@
 import logging
-from fastapi import APIRouter, HTTPException, BackgroundTasks, Depends
-from openai import OpenAI
+from fastapi import APIRouter, HTTPException, Depends, Header, Query
+from fastapi.responses import StreamingResponse
 from ..core.config import settings
 import os
-from sqlalchemy.orm import Session
-from ..dependencies import get_db
-from ..models.models import FineTunedModel
-from datetime import datetime
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+from ..dependencies import get_current_user, get_db, get_fine_tune_status_cache
+from ..models.models import Job, User
+from ..schemas.fine_tuning import FineTuneStatus, JobResponse
+from ..services.fine_tune_status import TERMINAL_STATUSES, FineTuneStatusCache
+from ..services.fine_tuning import FINE_TUNE_JOB
+from ..services.jobs import enqueue
 
 router = APIRouter()
 
-# Set up logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 @router.post("/fine-tune")
 async def start_fine_tuning(
-    background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db)
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
 ):
     if not settings.OPENAI_API_KEY:
         raise HTTPException(status_code=500, detail="OpenAI API key not configured")
 
-    client = OpenAI(api_key=settings.OPENAI_API_KEY)
-
-    training_file_path = os.path.join(os.path.dirname(__file__), '../data/training_data.jsonl')
-    validation_file_path = os.path.join(os.path.dirname(__file__), '../data/validation_data.jsonl')
+    training_file_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '../data/training_data.jsonl'))
+    validation_file_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '../data/validation_data.jsonl'))
 
     if not os.path.exists(training_file_path) or not os.path.exists(validation_file_path):
         raise HTTPException(status_code=404, detail="Training or validation data not found")
 
-    def fine_tune():
-        try:
-            # Upload training file
-            logger.info("Uploading training file to OpenAI")
-            with open(training_file_path, 'rb') as training_file:
-                training_response = client.files.create(
-                    file=training_file,
-                    purpose='fine-tune'
-                )
-            logger.info(f"Training file uploaded: {training_response.id}")
-
-            # Upload validation file
-            logger.info("Uploading validation file to OpenAI")
-            with open(validation_file_path, 'rb') as validation_file:
-                validation_response = client.files.create(
-                    file=validation_file,
-                    purpose='fine-tune'
-                )
-            logger.info(f"Validation file uploaded: {validation_response.id}")
-
-            # Start fine-tuning
-            logger.info("Starting fine-tuning process")
-            fine_tune_response = client.fine_tuning.jobs.create(
-                training_file=training_response.id,
-                validation_file=validation_response.id,
-                model="gpt-3.5-turbo"
-            )
-            logger.info(f"Fine-tuning started: {fine_tune_response.id}")
-
-            # Save to database
-            db_model = FineTunedModel(
-                fine_tune_id=fine_tune_response.id,
-                status=fine_tune_response.status,
-                training_file=training_response.id,
-                validation_file=validation_response.id
-            )
-            db.add(db_model)
-            db.commit()
-            logger.info(f"Saved fine-tuning job to database with ID: {db_model.id}")
-
-        except Exception as e:
-            logger.error(f"Fine-tuning error: {str(e)}")
-            db.rollback()
+    # Uploads and job creation run in the worker process (python -m app.worker), not in the API
+    job = await enqueue(
+        db,
+        FINE_TUNE_JOB,
+        {
+            "training_file_path": training_file_path,
+            "validation_file_path": validation_file_path,
+            "model": "gpt-3.5-turbo",
+            "user_id": current_user.id
+        },
+        idempotency_key=f"{FINE_TUNE_JOB}:{current_user.id}:{idempotency_key}" if idempotency_key else None,
+        max_attempts=settings.JOB_MAX_ATTEMPTS
+    )
+    return {"message": "Fine-tuning started", "job_id": job.id, "status": job.status}
 
-    background_tasks.add_task(fine_tune)
-    return {"message": "Fine-tuning started"}
+@router.get("/fine-tune/jobs/{job_id}", response_model=JobResponse)
+async def get_fine_tune_job(
+    job_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    job = await db.get(Job, job_id)
+    # Only the user who queued a job sees it; others get the same 404 as for a missing one
+    if not job or job.kind != FINE_TUNE_JOB or job.payload.get("user_id") != current_user.id:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
 
-@router.get("/fine-tune/{fine_tune_id}/status")
+@router.get("/fine-tune/{fine_tune_id}/status", response_model=FineTuneStatus)
 async def get_fine_tune_status(
     fine_tune_id: str,
-    db: Session = Depends(get_db)
+    wait: float = Query(0, ge=0, le=settings.FINE_TUNE_STATUS_MAX_WAIT_SECONDS, description="Seconds to wait for a change"),
+    status: Optional[str] = Query(None, description="Status the client already has; with wait, respond once it changes"),
+    status_cache: FineTuneStatusCache = Depends(get_fine_tune_status_cache)
+):
+    # Served from the reconciler's last write; watching a job never calls the provider
+    if wait and status is not None:
+        snapshot = await status_cache.wait_for_change(fine_tune_id, status, wait)
+    else:
+        snapshot = await status_cache.get_status(fine_tune_id)
+    if snapshot is None:
+        raise HTTPException(status_code=404, detail="Fine-tuning job not found")
+    return snapshot
+
+@router.get("/fine-tune/{fine_tune_id}/events")
+async def stream_fine_tune_status(
+    fine_tune_id: str,
+    status_cache: FineTuneStatusCache = Depends(get_fine_tune_status_cache)
 ):
-    try:
-        client = OpenAI(api_key=settings.OPENAI_API_KEY)
-        response = client.fine_tuning.jobs.retrieve(fine_tune_id)
-        status = response.status
-        logger.info(f"Fine-tuning status for {fine_tune_id}: {status}")
+    """Server-sent ``status`` events, one per change, until the job finishes."""
+    snapshot = await status_cache.get_status(fine_tune_id)
+    if snapshot is None:
+        raise HTTPException(status_code=404, detail="Fine-tuning job not found")
 
-        # Update database record
-        db_model = db.query(FineTunedModel).filter(FineTunedModel.fine_tune_id == fine_tune_id).first()
-        if db_model:
-            db_model.status = status
-            db_model.model_id = response.fine_tuned_model if response.fine_tuned_model else None
-            if status in ['succeeded', 'failed', 'cancelled']:
-                db_model.finished_at = datetime.now()
-            db.commit()
+    async def event_stream():
+        current = snapshot
+        yield f"event: status\ndata: {current.model_dump_json()}\n\n"
+        while current.status not in TERMINAL_STATUSES:
+            changed = await status_cache.wait_for_change(
+                fine_tune_id, current.status, settings.FINE_TUNE_STATUS_MAX_WAIT_SECONDS
+            )
+            if changed is None:
+                break
+            if changed.status == current.status:
+                # Keeps proxies from closing an idle stream
+                yield ": keepalive\n\n"
+                continue
+            current = changed
+            yield f"event: status\ndata: {current.model_dump_json()}\n\n"
 
-        return {
-            "fine_tune_id": fine_tune_id,
-            "status": status,
-            "model": response.fine_tuned_model if response.fine_tuned_model else None,
-            "created_at": response.created_at,
-            "finished_at": response.finished_at,
-            "training_file": response.training_file,
-            "validation_file": response.validation_file
-        }
-    except Exception as e:
-        logger.error(f"Error retrieving fine-tuning status: {str(e)}")
-        raise HTTPException(status_code=500, detail="Error retrieving fine-tuning status") 
\ No newline at end of file
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -1,10 +1,13 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi.responses import ORJSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from ..models.models import User
-from ..dependencies import get_db, get_current_user
+from ..dependencies import get_db, get_current_user, get_principal_cache
 from ..schemas.user import UserUpdate, UserResponse
+from ..services.notifications import notify
+from ..services.principals import PRINCIPAL_CHANNEL, PrincipalCache
 
-router = APIRouter()
+router = APIRouter(default_response_class=ORJSONResponse)
 
 @router.get("/me", response_model=UserResponse)
 async def read_users_me(current_user: User = Depends(get_current_user)):
@@ -13,12 +16,17 @@ async def read_users_me(current_user: User = Depends(get_current_user)):
 @router.put("/me", response_model=UserResponse)
 async def update_user(
     user_update: UserUpdate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    principal_cache: PrincipalCache = Depends(get_principal_cache)
 ):
+    # current_user may be a shared cached instance, so modify a copy owned by this session
+    user = await db.get(User, current_user.id)
     for key, value in user_update.dict(exclude_unset=True).items():
-        setattr(current_user, key, value)
+        setattr(user, key, value)
     
-    db.commit()
-    db.refresh(current_user)
-    return current_user
+    # Other workers drop their cached principal once this commits
+    await notify(db, PRINCIPAL_CHANNEL, str(user.id))
+    await db.commit()
+    principal_cache.invalidate(str(user.id))
+    return user
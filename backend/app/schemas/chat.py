@@ -17,18 +17,31 @@ class MessageResponse(MessageBase):
     class Config:
         from_attributes = True
 
+class MessageSearchResult(BaseModel):
+    id: int
+    conversation_id: int
+    is_ai: bool
+    created_at: datetime
+    snippet: str  # HTML-escaped excerpt with matching terms wrapped in <mark>
+    rank: float
+
+    class Config:
+        from_attributes = True
+
 class ConversationBase(BaseModel):
     pass
 
 class ConversationCreate(ConversationBase):
     pass
 
-class ConversationResponse(ConversationBase):
+class ConversationSummary(ConversationBase):
     id: int
     user_id: int
     name: Optional[str] = None
     created_at: datetime
-    messages: List[MessageResponse] = []
 
     class Config:
         from_attributes = True
+
+class ConversationResponse(ConversationSummary):
+    messages: List[MessageResponse] = []
@@ -0,0 +1,48 @@
+"""gunicorn worker class and master hooks for the API; see ``gunicorn.conf.py``.
+
+Run from ``backend/`` after ``alembic upgrade head`` has run as its own step:
+
+    gunicorn app.main:app
+
+On SIGTERM (or a SIGHUP reload) each worker stops accepting connections and
+lets in-flight requests, streamed chat turns included, finish for up to
+``SERVER_GRACEFUL_TIMEOUT_SECONDS``. It then runs the lifespan shutdown, which
+flushes batched message writes, before the master would kill it.
+"""
+import logging
+
+from uvicorn.workers import UvicornWorker
+
+from .core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Left between uvicorn cancelling the requests still running and the master's SIGKILL, for the lifespan shutdown
+SHUTDOWN_MARGIN_SECONDS = 5
+
+class ChatWorker(UvicornWorker):
+    """``UvicornWorker`` that drains in-flight requests within gunicorn's graceful timeout."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Without this uvicorn waits for open requests indefinitely and the master's SIGKILL
+        # cuts them off mid-stream, skipping the lifespan shutdown too
+        self.config.timeout_graceful_shutdown = max(1, self.cfg.graceful_timeout - SHUTDOWN_MARGIN_SECONDS)
+
+def preload():
+    """Load what every worker uses but the app imports lazily.
+
+    Called in the gunicorn master before it forks, so workers share those
+    pages copy-on-write instead of each loading its own copy, and again from
+    each worker's lifespan, where it only does work when nothing was
+    preloaded. Either way no first chat or login pays for the import.
+    """
+    import openai  # noqa: F401
+    from passlib.handlers.bcrypt import bcrypt
+
+    from .services.context import Tokenizer
+
+    bcrypt.get_backend()
+    # tiktoken caches encodings per name, so the workers' tokenizers reuse this one
+    Tokenizer(settings.CONTEXT_TOKENIZER_ENCODING).load()
+    logger.debug("Preloaded openai, the bcrypt backend and the tokenizer")
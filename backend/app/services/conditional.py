@@ -0,0 +1,23 @@
+import hashlib
+from typing import Optional
+
+# Per-user representations: browsers keep them but must revalidate (If-None-Match) before reuse
+PRIVATE_REVALIDATE = "private, no-cache"
+
+def weak_etag(*parts) -> str:
+    """A weak ETag over ``parts``, which must change whenever the representation does."""
+    digest = hashlib.blake2b("|".join(str(part) for part in parts).encode(), digest_size=12).hexdigest()
+    return f'W/"{digest}"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison of ``etag`` with an ``If-None-Match`` header, as GET requests use."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if (tag[2:] if tag.startswith("W/") else tag) == opaque:
+            return True
+    return False
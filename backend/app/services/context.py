@@ -0,0 +1,233 @@
+import hashlib
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import List, Optional
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..core.config import Settings
+from ..models.models import Conversation, Message
+from .llm import LLMClient
+
+logger = logging.getLogger(__name__)
+
+# Chat-format overhead per message (role and separators), as counted by the OpenAI chat format
+TOKENS_PER_MESSAGE = 4
+
+SUMMARY_PROMPT = (
+    "You maintain a running summary of a conversation between a user and a financial advisor AI. "
+    "Merge the new messages into the existing summary. Keep the user's goals, risk tolerance, "
+    "holdings, constraints and the advice already given; drop pleasantries. "
+    "Reply with the updated summary only."
+)
+
+class Tokenizer:
+    """Counts tokens with tiktoken when its encoding is available locally.
+
+    Falls back to a ~4 characters per token estimate if tiktoken is missing or
+    the encoding cannot be loaded (it is downloaded on first use).
+
+    The counts of the last ``cache_size`` texts are kept, keyed by a digest
+    rather than the text, since chat history is recounted on every turn.
+    Not thread-safe with a cache; pass ``cache_size=0`` where texts never
+    repeat or several threads count.
+    """
+
+    def __init__(self, encoding_name: str, cache_size: int = 8192):
+        self.encoding_name = encoding_name
+        self.cache_size = cache_size
+        self._encoding = None
+        self._loaded = False
+        self._counts: "OrderedDict[bytes, int]" = OrderedDict()
+
+    def load(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        try:
+            import tiktoken
+            self._encoding = tiktoken.get_encoding(self.encoding_name)
+        except Exception as e:
+            logger.warning(f"Tokenizer {self.encoding_name} unavailable, estimating token counts: {str(e)}")
+
+    def count(self, text: str) -> int:
+        if self.cache_size <= 0:
+            return self._count(text)
+        key = hashlib.blake2b(text.encode(), digest_size=16).digest()
+        tokens = self._counts.pop(key, None)
+        if tokens is None:
+            tokens = self._count(text)
+        self._counts[key] = tokens
+        while len(self._counts) > self.cache_size:
+            self._counts.popitem(last=False)
+        return tokens
+
+    def _count(self, text: str) -> int:
+        self.load()
+        if self._encoding is not None:
+            return len(self._encoding.encode(text, disallowed_special=()))
+        return max(1, (len(text) + 3) // 4)
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """Keep the end of ``text`` within ``max_tokens``; the latest words matter most."""
+        self.load()
+        if self._encoding is not None:
+            tokens = self._encoding.encode(text, disallowed_special=())
+            return self._encoding.decode(tokens[-max_tokens:]) if len(tokens) > max_tokens else text
+        return text[-max_tokens * 4:]
+
+@dataclass
+class PromptContext:
+    messages: List[dict]
+    prompt_tokens: int
+    # Oldest history message that made it into the window; unsummarized turns before it get summarized
+    first_included_id: Optional[int] = None
+    # Fetched messages that did not fit the budget
+    dropped_messages: int = 0
+    # More unsummarized messages exist beyond the fetch limit
+    has_older: bool = False
+
+class ContextBuilder:
+    """Packs a conversation into a multi-turn prompt that fits a token budget.
+
+    Recent messages are added newest first until the budget is spent. Turns
+    that no longer fit are folded into a per-conversation rolling summary
+    (``Conversation.summary``) which is sent as a second system message, so
+    long conversations keep their context without growing the prompt.
+    """
+
+    def __init__(
+        self,
+        system_prompt: str,
+        tokenizer: Tokenizer,
+        max_prompt_tokens: int = 3000,
+        history_fetch_limit: int = 50,
+        summary_batch_messages: int = 6,
+        summary_max_tokens: int = 300,
+        summary_model: str = "gpt-3.5-turbo",
+    ):
+        self.system_prompt = system_prompt
+        self.tokenizer = tokenizer
+        self.max_prompt_tokens = max_prompt_tokens
+        self.history_fetch_limit = history_fetch_limit
+        self.summary_batch_messages = summary_batch_messages
+        self.summary_max_tokens = summary_max_tokens
+        self.summary_model = summary_model
+
+    @classmethod
+    def from_settings(cls, settings: Settings, system_prompt: str) -> "ContextBuilder":
+        return cls(
+            system_prompt=system_prompt,
+            tokenizer=Tokenizer(settings.CONTEXT_TOKENIZER_ENCODING),
+            max_prompt_tokens=settings.CONTEXT_MAX_PROMPT_TOKENS,
+            history_fetch_limit=settings.CONTEXT_HISTORY_FETCH_LIMIT,
+            summary_batch_messages=settings.CONTEXT_SUMMARY_BATCH_MESSAGES,
+            summary_max_tokens=settings.CONTEXT_SUMMARY_MAX_TOKENS,
+            summary_model=settings.CONTEXT_SUMMARY_MODEL or settings.BASE_MODEL,
+        )
+
+    def _message_tokens(self, content: str) -> int:
+        return self.tokenizer.count(content) + TOKENS_PER_MESSAGE
+
+    def pack(self, history: List[Message], summary: Optional[str]) -> PromptContext:
+        """Build the prompt from ``history`` (newest first, current user message included)."""
+        head = [{"role": "system", "content": self.system_prompt}]
+        if summary:
+            head.append({"role": "system", "content": f"Summary of the earlier conversation:\n{summary}"})
+        budget = self.max_prompt_tokens - sum(self._message_tokens(m["content"]) for m in head)
+
+        turns = []
+        for msg in history:
+            cost = self._message_tokens(msg.content)
+            if cost > budget:
+                if not turns:
+                    # The current message alone is over budget: keep as much of it as fits
+                    content = self.tokenizer.truncate(msg.content, max(budget - TOKENS_PER_MESSAGE, 1))
+                    turns.append((msg, content))
+                    budget -= self._message_tokens(content)
+                break
+            turns.append((msg, msg.content))
+            budget -= cost
+
+        messages = head + [
+            {"role": "assistant" if msg.is_ai else "user", "content": content}
+            for msg, content in reversed(turns)
+        ]
+        return PromptContext(
+            messages=messages,
+            prompt_tokens=self.max_prompt_tokens - budget,
+            first_included_id=turns[-1][0].id if turns else None,
+            dropped_messages=len(history) - len(turns),
+        )
+
+    async def build(self, db: AsyncSession, conversation: Conversation, pending_content: Optional[str] = None) -> PromptContext:
+        """``pending_content`` is the new user message, which is saved only once the reply is in."""
+        query = select(Message).filter(Message.conversation_id == conversation.id)
+        if conversation.summary_message_id is not None:
+            query = query.filter(Message.id > conversation.summary_message_id)
+        saved = (await db.scalars(
+            query.order_by(Message.created_at.desc(), Message.id.desc()).limit(self.history_fetch_limit)
+        )).all()
+        history = list(saved)
+        if pending_content is not None:
+            history.insert(0, Message(conversation_id=conversation.id, content=pending_content, is_ai=False))
+        context = self.pack(history, conversation.summary)
+        if context.first_included_id is None and saved:
+            # Only the unsaved message fit; every saved one is older than it
+            context.first_included_id = saved[0].id + 1
+        context.has_older = len(saved) == self.history_fetch_limit
+        return context
+
+    def needs_summary(self, context: PromptContext) -> bool:
+        # Batched so the summary is not regenerated on every turn of a long conversation
+        return context.first_included_id is not None and (
+            context.dropped_messages >= self.summary_batch_messages or context.has_older
+        )
+
+    async def update_summary(
+        self,
+        db: AsyncSession,
+        llm_client: LLMClient,
+        conversation_id: int,
+        previous_summary: Optional[str],
+        previous_message_id: Optional[int],
+        before_message_id: int
+    ):
+        """Fold unsummarized messages older than ``before_message_id`` into the rolling summary.
+
+        Optimistic: the write only lands if no other turn advanced the summary meanwhile.
+        """
+        query = select(Message).filter(
+            Message.conversation_id == conversation_id,
+            Message.id < before_message_id
+        )
+        if previous_message_id is not None:
+            query = query.filter(Message.id > previous_message_id)
+        pending = (await db.scalars(query.order_by(Message.id).limit(self.history_fetch_limit))).all()
+        if not pending:
+            return
+
+        transcript = "\n".join(f"{'AI' if msg.is_ai else 'User'}: {msg.content}" for msg in pending)
+        response = await llm_client.chat_completion(
+            model=self.summary_model,
+            messages=[
+                {"role": "system", "content": SUMMARY_PROMPT},
+                {"role": "user", "content": f"Existing summary:\n{previous_summary or '(none)'}\n\nNew messages:\n{transcript}"}
+            ],
+            temperature=0.2,
+            max_tokens=self.summary_max_tokens
+        )
+        summary = response.choices[0].message.content
+
+        result = await db.execute(
+            update(Conversation).filter(
+                Conversation.id == conversation_id,
+                Conversation.summary_message_id.is_(None) if previous_message_id is None
+                else Conversation.summary_message_id == previous_message_id
+            ).values(summary=summary, summary_message_id=pending[-1].id)
+        )
+        await db.commit()
+        if result.rowcount:
+            logger.info(f"Summarized {len(pending)} messages of conversation {conversation_id}")
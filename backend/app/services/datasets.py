@@ -0,0 +1,199 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Awaitable, Callable, List, Optional
+
+from ..core.config import Settings
+from .context import TOKENS_PER_MESSAGE, Tokenizer
+from .llm import LLMClient
+
+logger = logging.getLogger(__name__)
+
+VALID_ROLES = ("system", "user", "assistant")
+
+# Tokens the chat format adds to every example to prime the reply
+TOKENS_PER_EXAMPLE = 3
+
+@dataclass
+class DatasetReport:
+    lines: int = 0
+    examples: int = 0  # Valid, unique examples written to the prepared file
+    invalid: int = 0
+    too_long: int = 0
+    duplicates: int = 0
+    tokens: int = 0
+    max_example_tokens: int = 0
+    bytes: int = 0
+    content_hash: str = ""  # sha256 of the prepared file
+    errors: List[str] = field(default_factory=list)
+
+    @property
+    def rejected(self) -> int:
+        return self.invalid + self.too_long
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+def validate_example(record) -> Optional[str]:
+    """Checks one chat fine-tuning example; returns what is wrong with it, or None."""
+    if not isinstance(record, dict) or not isinstance(record.get("messages"), list) or not record["messages"]:
+        return "expected an object with a non-empty messages list"
+    for index, message in enumerate(record["messages"]):
+        if not isinstance(message, dict):
+            return f"message {index} is not an object"
+        if message.get("role") not in VALID_ROLES:
+            return f"message {index} has invalid role {message.get('role')!r}"
+        if not isinstance(message.get("content"), str) or not message["content"].strip():
+            return f"message {index} has no text content"
+    if not any(message["role"] == "assistant" for message in record["messages"]):
+        return "no assistant message to learn from"
+    return None
+
+class DatasetPreparer:
+    """Validates fine-tuning JSONL one line at a time and uploads the result.
+
+    ``prepare`` streams the source, so memory does not grow with line count
+    apart from an 8-byte hash per unique example used for deduplication. Valid
+    examples are re-serialized canonically, which lets formatting-only
+    duplicates collapse and gives byte-identical output (and content hash) for
+    the same data. Large prepared files are sent with the multipart Uploads
+    API, recording each part so an interrupted upload resumes.
+    """
+
+    def __init__(
+        self,
+        tokenizer: Tokenizer,
+        work_dir: Optional[str] = None,
+        max_tokens_per_example: int = 16385,
+        max_invalid_examples: int = 0,
+        upload_part_bytes: int = 64 * 1024 * 1024,
+        chunked_upload_min_bytes: int = 64 * 1024 * 1024,
+        max_reported_errors: int = 20,
+    ):
+        self.tokenizer = tokenizer
+        self.work_dir = work_dir or os.path.join(tempfile.gettempdir(), "ai-companion-datasets")
+        self.max_tokens_per_example = max_tokens_per_example
+        self.max_invalid_examples = max_invalid_examples
+        self.upload_part_bytes = upload_part_bytes
+        self.chunked_upload_min_bytes = chunked_upload_min_bytes
+        self.max_reported_errors = max_reported_errors
+
+    @classmethod
+    def from_settings(cls, settings: Settings) -> "DatasetPreparer":
+        return cls(
+            tokenizer=Tokenizer(settings.CONTEXT_TOKENIZER_ENCODING, cache_size=0),  # Examples rarely repeat; memory stays flat
+            work_dir=settings.DATASET_WORK_DIR,
+            max_tokens_per_example=settings.DATASET_MAX_TOKENS_PER_EXAMPLE,
+            max_invalid_examples=settings.DATASET_MAX_INVALID_EXAMPLES,
+            upload_part_bytes=settings.DATASET_UPLOAD_PART_BYTES,
+            chunked_upload_min_bytes=settings.DATASET_CHUNKED_UPLOAD_MIN_BYTES,
+        )
+
+    def example_tokens(self, record: dict) -> int:
+        return TOKENS_PER_EXAMPLE + sum(
+            self.tokenizer.count(message["content"]) + TOKENS_PER_MESSAGE for message in record["messages"]
+        )
+
+    def prepare(self, source_path: str, output_path: str) -> DatasetReport:
+        """Write the valid, deduplicated examples of ``source_path`` to ``output_path``.
+
+        Blocking; run it in a worker thread.
+        """
+        report = DatasetReport()
+        seen = set()
+        digest = hashlib.sha256()
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+
+        def reject(line_number: int, reason: str):
+            if len(report.errors) < self.max_reported_errors:
+                report.errors.append(f"line {line_number}: {reason}")
+
+        with open(source_path, "rb") as source, open(output_path, "wb") as output:
+            for line_number, line in enumerate(source, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                report.lines += 1
+                try:
+                    record = json.loads(line)
+                except ValueError as e:
+                    report.invalid += 1
+                    reject(line_number, f"invalid JSON ({str(e)})")
+                    continue
+                error = validate_example(record)
+                if error:
+                    report.invalid += 1
+                    reject(line_number, error)
+                    continue
+
+                canonical = json.dumps(record, ensure_ascii=False, separators=(",", ":"), sort_keys=True).encode()
+                key = int.from_bytes(hashlib.blake2b(canonical, digest_size=8).digest(), "big")
+                if key in seen:
+                    report.duplicates += 1
+                    continue
+                seen.add(key)
+
+                tokens = self.example_tokens(record)
+                if tokens > self.max_tokens_per_example:
+                    report.too_long += 1
+                    reject(line_number, f"{tokens} tokens, over the {self.max_tokens_per_example} token limit")
+                    continue
+
+                canonical += b"\n"
+                output.write(canonical)
+                digest.update(canonical)
+                report.bytes += len(canonical)
+                report.examples += 1
+                report.tokens += tokens
+                report.max_example_tokens = max(report.max_example_tokens, tokens)
+
+        report.content_hash = digest.hexdigest()
+        return report
+
+    async def upload(
+        self,
+        llm_client: LLMClient,
+        path: str,
+        purpose: str,
+        upload_state: Optional[dict],
+        save_upload_state: Callable[[dict], Awaitable[None]],
+    ) -> str:
+        """Upload ``path`` and return the provider file id.
+
+        For multipart uploads ``save_upload_state`` is awaited after every part;
+        passing that state back as ``upload_state`` continues where it stopped.
+        """
+        size = os.path.getsize(path)
+        if size < self.chunked_upload_min_bytes:
+            with open(path, 'rb') as f:
+                return (await llm_client.upload_file(file=f, purpose=purpose)).id
+
+        # Uploads expire after an hour; an expired one has to start over
+        if upload_state is None or upload_state["expires_at"] < time.time() + 60:
+            upload = await llm_client.create_upload(
+                bytes=size,
+                filename=os.path.basename(path),
+                mime_type="text/jsonl",
+                purpose=purpose
+            )
+            upload_state = {"upload_id": upload.id, "expires_at": upload.expires_at, "part_ids": []}
+            await save_upload_state(upload_state)
+        elif upload_state["part_ids"]:
+            logger.info(f"Resuming upload {upload_state['upload_id']} after {len(upload_state['part_ids'])} parts")
+
+        with open(path, 'rb') as f:
+            f.seek(len(upload_state["part_ids"]) * self.upload_part_bytes)
+            while True:
+                chunk = f.read(self.upload_part_bytes)
+                if not chunk:
+                    break
+                part = await llm_client.add_upload_part(upload_state["upload_id"], chunk)
+                upload_state["part_ids"].append(part.id)
+                await save_upload_state(upload_state)
+
+        upload = await llm_client.complete_upload(upload_state["upload_id"], upload_state["part_ids"])
+        return upload.file.id
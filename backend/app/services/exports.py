@@ -0,0 +1,262 @@
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import queue
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+
+from sqlalchemy import func, select, tuple_
+from sqlalchemy.orm import Session, aliased, sessionmaker
+
+from ..core.config import Settings
+from ..models.models import Conversation, Message, TrainingExport
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class ExportFilters:
+    created_after: Optional[datetime] = None  # Of the assistant reply
+    created_before: Optional[datetime] = None
+    user_ids: List[int] = field(default_factory=list)
+    min_chars: int = 1  # Applied to both sides of a turn
+    max_chars: Optional[int] = None
+
+    def as_dict(self) -> dict:
+        return {
+            "created_after": self.created_after.isoformat() if self.created_after else None,
+            "created_before": self.created_before.isoformat() if self.created_before else None,
+            "user_ids": self.user_ids,
+            "min_chars": self.min_chars,
+            "max_chars": self.max_chars,
+        }
+
+@dataclass
+class ExportResult:
+    name: str
+    since_message_id: int
+    until_message_id: int
+    examples: int
+    path: Optional[str]
+    shards: List[dict] = field(default_factory=list)
+
+def _write_shard(path: str, system_prompt: Optional[str], batches, results):
+    """Writer process: turns batches of (question, answer) pairs into chat JSONL lines."""
+    examples = size = 0
+    digest = hashlib.sha256()
+    system = [{"role": "system", "content": system_prompt}] if system_prompt else []
+    try:
+        with open(path + ".partial", "wb") as f:
+            while True:
+                batch = batches.get()
+                if batch is None:
+                    break
+                lines = b"".join(
+                    json.dumps({"messages": system + [
+                        {"role": "user", "content": question},
+                        {"role": "assistant", "content": answer},
+                    ]}, ensure_ascii=False).encode() + b"\n"
+                    for question, answer in batch
+                )
+                f.write(lines)
+                digest.update(lines)
+                size += len(lines)
+                examples += len(batch)
+        os.replace(path + ".partial", path)
+        results.put({"path": path, "examples": examples, "bytes": size, "sha256": digest.hexdigest()})
+    except Exception as e:
+        results.put({"path": path, "error": str(e)})
+
+class TrainingExporter:
+    """Streams user/assistant turn pairs out of ``messages`` into sharded chat JSONL.
+
+    Replies are read in ``messages.id`` order through a server-side cursor
+    (``yield_per``), each joined to the message before it in its conversation
+    through the conversation index, so nothing is held in memory beyond one
+    fetch batch plus a few batches queued per writer. ``shards`` writer
+    processes serialize and write in parallel, one file each, batches being
+    dealt round-robin.
+
+    Exports are named streams: an incremental run starts after the highest
+    reply id a previous run of the same name covered. Its own upper bound is
+    the newest message created at least ``settle_seconds`` before it starts:
+    ids are drawn from the sequence before their transaction commits, so a
+    newer message can still be joined by one with a lower id, which the next
+    run would otherwise skip for good. The watermark row is committed only
+    after every shard is complete.
+    """
+
+    def __init__(
+        self,
+        session_factory: sessionmaker,
+        export_dir: str = "exports",
+        shards: int = 4,
+        batch_size: int = 5000,
+        system_prompt: Optional[str] = None,
+        settle_seconds: float = 300,
+    ):
+        self.session_factory = session_factory
+        self.export_dir = export_dir
+        self.shards = shards
+        self.batch_size = batch_size
+        self.system_prompt = system_prompt
+        self.settle_seconds = settle_seconds
+
+    @classmethod
+    def from_settings(cls, settings: Settings, session_factory: sessionmaker, system_prompt: Optional[str] = None) -> "TrainingExporter":
+        return cls(
+            session_factory,
+            export_dir=settings.EXPORT_DIR,
+            shards=settings.EXPORT_SHARDS,
+            batch_size=settings.EXPORT_BATCH_SIZE,
+            system_prompt=system_prompt,
+            settle_seconds=settings.EXPORT_SETTLE_SECONDS,
+        )
+
+    def watermark(self, db: Session, name: str) -> int:
+        return db.scalar(select(func.max(TrainingExport.until_message_id)).filter(TrainingExport.name == name)) or 0
+
+    def pairs_query(self, since_message_id: int, until_message_id: int, filters: ExportFilters):
+        """(question, answer) rows for replies with ids in (since, until], in id order."""
+        previous = aliased(Message)
+        previous_id = (
+            select(previous.id)
+            .filter(
+                previous.conversation_id == Message.conversation_id,
+                tuple_(previous.created_at, previous.id) < tuple_(Message.created_at, Message.id)
+            )
+            .order_by(previous.created_at.desc(), previous.id.desc())
+            .limit(1)
+            .correlate(Message)
+            .scalar_subquery()
+        )
+        replies = select(
+            Message.id.label("id"),
+            Message.content.label("content"),
+            previous_id.label("previous_id")
+        ).filter(
+            Message.is_ai.is_(True),
+            Message.id > since_message_id,
+            Message.id <= until_message_id,
+            func.length(Message.content) >= filters.min_chars
+        )
+        if filters.max_chars is not None:
+            replies = replies.filter(func.length(Message.content) <= filters.max_chars)
+        if filters.created_after is not None:
+            replies = replies.filter(Message.created_at >= filters.created_after)
+        if filters.created_before is not None:
+            replies = replies.filter(Message.created_at < filters.created_before)
+        if filters.user_ids:
+            replies = replies.join(Conversation, Conversation.id == Message.conversation_id).filter(
+                Conversation.user_id.in_(filters.user_ids)
+            )
+        replies = replies.subquery()
+
+        question = aliased(Message)
+        query = select(question.content, replies.c.content).join(
+            question, question.id == replies.c.previous_id
+        ).filter(
+            question.is_ai.is_(False),
+            func.length(question.content) >= filters.min_chars
+        )
+        if filters.max_chars is not None:
+            query = query.filter(func.length(question.content) <= filters.max_chars)
+        return query.order_by(replies.c.id)
+
+    def export(
+        self,
+        name: str,
+        filters: Optional[ExportFilters] = None,
+        incremental: bool = True,
+        output_dir: Optional[str] = None,
+    ) -> ExportResult:
+        filters = filters or ExportFilters()
+        with self.session_factory() as db:
+            since_message_id = self.watermark(db, name) if incremental else 0
+            # Messages this recent may still have lower-id neighbours in transactions yet to commit
+            settled = datetime.now(timezone.utc) - timedelta(seconds=self.settle_seconds)
+            until_message_id = db.scalar(select(func.max(Message.id)).filter(Message.created_at < settled)) or 0
+            if until_message_id <= since_message_id:
+                logger.info(f"Export {name}: no messages after {since_message_id}")
+                return ExportResult(name, since_message_id, until_message_id, 0, None)
+
+            output_dir = output_dir or os.path.join(self.export_dir, name, f"{since_message_id + 1}-{until_message_id}")
+            os.makedirs(output_dir, exist_ok=True)
+            logger.info(f"Export {name}: messages {since_message_id + 1}..{until_message_id} to {output_dir}")
+
+            started = time.perf_counter()
+            shards = self._stream(db, self.pairs_query(since_message_id, until_message_id, filters), output_dir)
+            examples = sum(shard["examples"] for shard in shards)
+            result = ExportResult(name, since_message_id, until_message_id, examples, output_dir, shards)
+
+            with open(os.path.join(output_dir, "manifest.json"), "w") as f:
+                json.dump({**result.__dict__, "filters": filters.as_dict()}, f, indent=2)
+            db.add(TrainingExport(
+                name=name,
+                since_message_id=since_message_id,
+                until_message_id=until_message_id,
+                filters=filters.as_dict(),
+                examples=examples,
+                path=output_dir
+            ))
+            db.commit()
+
+        elapsed = time.perf_counter() - started
+        logger.info(f"Export {name}: {examples} examples in {elapsed:.1f}s ({examples / max(elapsed, 1e-9):.0f}/s)")
+        return result
+
+    def _stream(self, db: Session, query, output_dir: str) -> List[dict]:
+        # Spawned, not forked, so writers never inherit the open database connection
+        context = multiprocessing.get_context("spawn")
+        results = context.Queue()
+        writers = []
+        for shard in range(self.shards):
+            batches = context.Queue(maxsize=4)
+            path = os.path.join(output_dir, f"part-{shard:05d}.jsonl")
+            process = context.Process(target=_write_shard, args=(path, self.system_prompt, batches, results), daemon=True)
+            process.start()
+            writers.append((process, batches))
+
+        try:
+            rows = db.execute(query.execution_options(yield_per=self.batch_size))
+            for index, partition in enumerate(rows.partitions()):
+                process, batches = writers[index % self.shards]
+                self._put(process, batches, [tuple(row) for row in partition])
+            for process, batches in writers:
+                self._put(process, batches, None)
+            shards = self._collect(writers, results)
+        finally:
+            for process, batches in writers:
+                process.join(timeout=5)
+                if process.is_alive():
+                    process.terminate()
+                # Batches a dead writer never read must not keep this process from exiting
+                batches.cancel_join_thread()
+
+        failed = [shard for shard in shards if "error" in shard]
+        if failed:
+            raise RuntimeError(f"Export shard {failed[0]['path']} failed: {failed[0]['error']}")
+        return sorted(shards, key=lambda shard: shard["path"])
+
+    def _collect(self, writers, results) -> List[dict]:
+        shards = []
+        while len(shards) < len(writers):
+            try:
+                shards.append(results.get(timeout=1))
+            except queue.Empty:
+                if not any(process.is_alive() for process, _ in writers) and results.empty():
+                    raise RuntimeError("Export writers exited without reporting")
+        return shards
+
+    def _put(self, process, batches, item):
+        # Blocks while the writer is behind (bounding memory), but not on a dead writer
+        while True:
+            try:
+                batches.put(item, timeout=1)
+                return
+            except queue.Full:
+                if not process.is_alive():
+                    raise RuntimeError(f"Export writer {process.pid} exited with code {process.exitcode}")
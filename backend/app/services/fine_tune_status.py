@@ -0,0 +1,87 @@
+import asyncio
+import logging
+import time
+from typing import Dict, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from ..core.config import Settings
+from ..models.models import FineTunedModel
+from ..schemas.fine_tuning import FineTuneStatus
+from .cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# NOTIFY channel carrying the fine_tune_id whose status the reconciler just changed
+FINE_TUNE_STATUS_CHANNEL = "fine_tune_status_changed"
+
+TERMINAL_STATUSES = ("succeeded", "failed", "cancelled")
+
+def status_from_row(row: FineTunedModel) -> FineTuneStatus:
+    return FineTuneStatus(
+        fine_tune_id=row.fine_tune_id,
+        status=row.status,
+        model=row.model_id,
+        created_at=row.created_at,
+        finished_at=row.finished_at,
+        training_file=row.training_file,
+        validation_file=row.validation_file,
+    )
+
+class FineTuneStatusCache(TTLCache):
+    """Fine-tune statuses as last written by the reconciler, shared by every watcher in the process.
+
+    The provider is never called from here: statuses are read from the database
+    at most once per ``ttl_seconds`` per job, and NOTIFY on
+    ``FINE_TUNE_STATUS_CHANNEL`` drops an entry (and wakes its long-pollers)
+    as soon as the reconciler records a change.
+    """
+
+    def __init__(self, session_factory: async_sessionmaker, max_size: int = 1000, ttl_seconds: float = 5.0):
+        super().__init__(max_size, ttl_seconds)
+        self.session_factory = session_factory
+        self._waiters: Dict[str, asyncio.Event] = {}
+
+    @classmethod
+    def from_settings(cls, settings: Settings, session_factory: async_sessionmaker) -> "FineTuneStatusCache":
+        return cls(session_factory, ttl_seconds=settings.FINE_TUNE_STATUS_CACHE_TTL_SECONDS)
+
+    async def get_status(self, fine_tune_id: str) -> Optional[FineTuneStatus]:
+        status = self.get(fine_tune_id)
+        if status is None:
+            async with self.session_factory() as db:
+                row = await db.scalar(select(FineTunedModel).filter(FineTunedModel.fine_tune_id == fine_tune_id))
+            if row is None:
+                return None
+            status = status_from_row(row)
+            self.set(fine_tune_id, status)
+        return status
+
+    async def wait_for_change(self, fine_tune_id: str, known_status: str, timeout: float) -> Optional[FineTuneStatus]:
+        """Return as soon as the status differs from ``known_status``, or the current one after ``timeout``."""
+        deadline = time.monotonic() + timeout
+        while True:
+            status = await self.get_status(fine_tune_id)
+            remaining = deadline - time.monotonic()
+            if status is None or status.status != known_status or remaining <= 0:
+                return status
+            event = self._waiters.setdefault(fine_tune_id, asyncio.Event())
+            try:
+                # Bounded by the TTL so changes are still seen without NOTIFY (SQLite)
+                await asyncio.wait_for(event.wait(), min(remaining, self.ttl_seconds))
+            except asyncio.TimeoutError:
+                pass
+
+    def invalidate(self, payload: Optional[str] = None):
+        """Notification handler: drop one job's status, or everything after a missed notification."""
+        if payload:
+            self.pop(payload)
+            event = self._waiters.pop(payload, None)
+            if event is not None:
+                event.set()
+        else:
+            self.clear()
+            for event in self._waiters.values():
+                event.set()
+            self._waiters.clear()
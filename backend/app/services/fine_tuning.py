@@ -0,0 +1,303 @@
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Dict, Tuple
+
+import anyio
+from sqlalchemy import select, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker
+
+from ..core.config import Settings
+from ..models.models import FineTunedModel, Job, UploadedFile
+from .datasets import DatasetPreparer
+from .fine_tune_status import FINE_TUNE_STATUS_CHANNEL, TERMINAL_STATUSES
+from .jobs import JobQueue, PermanentJobError
+from .llm import LLMClient
+from .model_registry import ACTIVE_MODEL_CHANNEL
+from .notifications import notify
+
+logger = logging.getLogger(__name__)
+
+FINE_TUNE_JOB = "fine_tune"
+FINE_TUNE_PURPOSE = "fine-tune"
+
+# Postgres advisory lock key held by the one process that reconciles fine-tune statuses
+RECONCILER_LOCK_KEY = 7310001
+
+async def _prepare_and_upload(job: Job, queue: JobQueue, llm_client: LLMClient, preparer: DatasetPreparer, name: str):
+    """Validate one dataset, then upload it unless identical content is already on the provider."""
+    prepared = (job.result or {}).get(f"{name}_prepared")
+    # The prepared file is local to the worker that made it; another worker has to redo it
+    if prepared is None or not os.path.exists(prepared["path"]):
+        path = job.payload[f"{name}_path"]
+        if not os.path.exists(path):
+            raise PermanentJobError(f"{path} not found")
+        logger.info(f"Validating {name.replace('_', ' ')} {path}")
+        output_path = os.path.join(preparer.work_dir, f"job-{job.id}-{name}.jsonl")
+        report = await anyio.to_thread.run_sync(preparer.prepare, path, output_path)
+        if report.rejected > preparer.max_invalid_examples or not report.examples:
+            os.remove(output_path)
+            raise PermanentJobError(
+                f"{name.replace('_', ' ')} has {report.examples} usable examples, {report.invalid} invalid "
+                f"and {report.too_long} too long: {'; '.join(report.errors)}"
+            )
+        prepared = {"path": output_path, **report.as_dict()}
+        # A new prepared file invalidates any half-finished upload of the previous one
+        await queue.checkpoint(job, f"{name}_validated", {f"{name}_prepared": prepared, f"{name}_upload": None})
+
+    async with queue.session_factory() as db:
+        uploaded = await db.scalar(select(UploadedFile).filter(
+            UploadedFile.content_hash == prepared["content_hash"],
+            UploadedFile.purpose == FINE_TUNE_PURPOSE
+        ))
+        if uploaded is not None:
+            from openai import NotFoundError
+
+            try:
+                await llm_client.retrieve_file(uploaded.file_id)
+            except NotFoundError:
+                logger.info(f"Cached upload {uploaded.file_id} is gone from the provider, uploading again")
+                await db.delete(uploaded)
+                await db.commit()
+                uploaded = None
+    if uploaded is not None:
+        await queue.checkpoint(job, f"{name}_reused", {name: uploaded.file_id})
+        return
+
+    async def save_upload_state(upload_state: dict):
+        await queue.checkpoint(job, f"{name}_uploading", {f"{name}_upload": upload_state})
+
+    logger.info(f"Uploading {name.replace('_', ' ')} to OpenAI ({prepared['bytes']} bytes)")
+    file_id = await preparer.upload(
+        llm_client,
+        prepared["path"],
+        FINE_TUNE_PURPOSE,
+        (job.result or {}).get(f"{name}_upload"),
+        save_upload_state
+    )
+    async with queue.session_factory() as db:
+        db.add(UploadedFile(
+            content_hash=prepared["content_hash"],
+            purpose=FINE_TUNE_PURPOSE,
+            file_id=file_id,
+            bytes=prepared["bytes"]
+        ))
+        try:
+            await queue.checkpoint(job, f"{name}_uploaded", {name: file_id}, db=db)
+            return
+        except IntegrityError:
+            # A concurrent job uploaded the same content first; its row stays the cached one
+            await db.rollback()
+    await queue.checkpoint(job, f"{name}_uploaded", {name: file_id})
+
+async def _find_created_fine_tune(llm_client: LLMClient, state: dict):
+    """The provider job an earlier attempt created for these files, if its response never came back."""
+    # A minute of slack for the provider's clock
+    since = state["fine_tune_requested_at"] - 60
+    for fine_tune in await llm_client.list_fine_tuning_jobs():
+        if (
+            fine_tune.training_file == state["training_file"]
+            and fine_tune.validation_file == state["validation_file"]
+            and fine_tune.created_at >= since
+        ):
+            return fine_tune
+    return None
+
+async def run_fine_tune_job(job: Job, queue: JobQueue, llm_client: LLMClient, preparer: DatasetPreparer):
+    """Validate and upload the training and validation files, then create the fine-tuning job.
+
+    Every step is checkpointed into ``job.result``, so a retry resumes after the
+    last finished step (or uploaded part) instead of starting over. A dataset
+    whose prepared content was uploaded before reuses that file. Creating the
+    fine-tuning job is not retried blindly: a retry first looks for the job an
+    earlier attempt may have created before it failed.
+    """
+    payload = job.payload
+
+    for name in ("training_file", "validation_file"):
+        if name not in (job.result or {}):
+            await _prepare_and_upload(job, queue, llm_client, preparer, name)
+    state = job.result
+
+    if "fine_tune_id" in state:
+        return
+
+    fine_tune_response = None
+    if "fine_tune_requested_at" in state:
+        fine_tune_response = await _find_created_fine_tune(llm_client, state)
+    if fine_tune_response is None:
+        await queue.checkpoint(job, "fine_tune_requested", {"fine_tune_requested_at": int(time.time())})
+        logger.info("Starting fine-tuning process")
+        fine_tune_response = await llm_client.create_fine_tuning_job(
+            training_file=state["training_file"],
+            validation_file=state["validation_file"],
+            model=payload["model"]
+        )
+        logger.info(f"Fine-tuning started: {fine_tune_response.id}")
+    else:
+        logger.info(f"Fine-tuning {fine_tune_response.id} was created by an earlier attempt, recording it")
+
+    # Saved in the same transaction as the checkpoint, so a retry never records it twice
+    async with queue.session_factory() as db:
+        db.add(FineTunedModel(
+            fine_tune_id=fine_tune_response.id,
+            status=fine_tune_response.status,
+            training_file=state["training_file"],
+            validation_file=state["validation_file"]
+        ))
+        await queue.checkpoint(job, "fine_tune_created", {"fine_tune_id": fine_tune_response.id}, db=db)
+
+    for name in ("training_file", "validation_file"):
+        prepared = state.get(f"{name}_prepared")
+        if prepared and os.path.exists(prepared["path"]):
+            os.remove(prepared["path"])
+
+class FineTuneReconciler:
+    """Polls the provider for every unfinished fine-tune and records status changes.
+
+    The only code that calls ``retrieve_fine_tuning_job``: provider calls per job
+    depend on its schedule, not on how many clients watch the status. Each job
+    is checked after ``min_interval``; the interval grows by ``backoff_factor``
+    while nothing changes (and doubles on provider errors) up to ``max_interval``,
+    and resets once the status moves. Due jobs are fetched ``batch_size`` at a time.
+
+    Changes are committed together with a NOTIFY on ``FINE_TUNE_STATUS_CHANNEL``
+    (and ``ACTIVE_MODEL_CHANNEL`` for newly succeeded models). On Postgres only
+    the worker holding an advisory lock polls, however many workers run.
+    """
+
+    def __init__(
+        self,
+        engine: AsyncEngine,
+        session_factory: async_sessionmaker,
+        llm_client: LLMClient,
+        min_interval: float = 15.0,
+        max_interval: float = 300.0,
+        backoff_factor: float = 1.5,
+        batch_size: int = 20,
+    ):
+        self.engine = engine
+        self.session_factory = session_factory
+        self.llm_client = llm_client
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff_factor = backoff_factor
+        self.batch_size = batch_size
+        # fine_tune_id -> (current interval, next check on the monotonic clock)
+        self._schedule: Dict[str, Tuple[float, float]] = {}
+        self._stopped = asyncio.Event()
+
+    @classmethod
+    def from_settings(
+        cls, settings: Settings, engine: AsyncEngine, session_factory: async_sessionmaker, llm_client: LLMClient
+    ) -> "FineTuneReconciler":
+        return cls(
+            engine,
+            session_factory,
+            llm_client,
+            min_interval=settings.FINE_TUNE_POLL_MIN_SECONDS,
+            max_interval=settings.FINE_TUNE_POLL_MAX_SECONDS,
+            backoff_factor=settings.FINE_TUNE_POLL_BACKOFF_FACTOR,
+            batch_size=settings.FINE_TUNE_POLL_BATCH_SIZE,
+        )
+
+    def stop(self):
+        self._stopped.set()
+
+    async def _sleep(self, seconds: float):
+        try:
+            await asyncio.wait_for(self._stopped.wait(), seconds)
+        except asyncio.TimeoutError:
+            pass
+
+    async def run(self):
+        while not self._stopped.is_set():
+            try:
+                if self.engine.dialect.name == "postgresql":
+                    async with self.engine.connect() as conn:
+                        # Session-level lock: released when this connection closes
+                        if await conn.scalar(text("SELECT pg_try_advisory_lock(:key)"), {"key": RECONCILER_LOCK_KEY}):
+                            logger.info("Reconciling fine-tune statuses in this worker")
+                            try:
+                                await self._poll_until_stopped()
+                            finally:
+                                # Returning the connection to the pool would not release it
+                                await conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": RECONCILER_LOCK_KEY})
+                else:
+                    await self._poll_until_stopped()
+            except Exception as e:
+                logger.error(f"Fine-tune reconciler error: {str(e)}")
+            # Standby: try to take over if the reconciling worker goes away
+            await self._sleep(self.min_interval)
+
+    async def _poll_until_stopped(self):
+        while not self._stopped.is_set():
+            try:
+                delay = await self.reconcile_once()
+            except Exception as e:
+                logger.error(f"Error reconciling fine-tune statuses: {str(e)}")
+                delay = self.min_interval
+            await self._sleep(delay)
+
+    async def reconcile_once(self) -> float:
+        """Check the due jobs; returns the seconds until the next one is due."""
+        async with self.session_factory() as db:
+            rows = (await db.scalars(
+                select(FineTunedModel).filter(
+                    FineTunedModel.status.notin_(TERMINAL_STATUSES)
+                ).order_by(FineTunedModel.created_at)
+            )).all()
+
+        now = time.monotonic()
+        pending = {row.fine_tune_id for row in rows}
+        # Jobs that finished (or were removed) no longer need a schedule
+        for fine_tune_id in list(self._schedule):
+            if fine_tune_id not in pending:
+                del self._schedule[fine_tune_id]
+
+        due = [row for row in rows if self._schedule.get(row.fine_tune_id, (0, 0))[1] <= now][:self.batch_size]
+        responses = await asyncio.gather(
+            *(self.llm_client.retrieve_fine_tuning_job(row.fine_tune_id) for row in due),
+            return_exceptions=True
+        )
+
+        changed = []
+        for row, response in zip(due, responses):
+            # New jobs start one step below min_interval, so an unchanged first check lands on it
+            interval = self._schedule.get(row.fine_tune_id, (self.min_interval / self.backoff_factor, 0))[0]
+            if isinstance(response, Exception):
+                logger.warning(f"Error retrieving fine-tune {row.fine_tune_id}: {str(response)}")
+                interval = min(self.max_interval, interval * 2)
+            elif response.status != row.status or response.fine_tuned_model != row.model_id:
+                changed.append((row, response))
+                interval = self.min_interval
+            else:
+                interval = min(self.max_interval, interval * self.backoff_factor)
+            self._schedule[row.fine_tune_id] = (interval, now + interval)
+
+        if changed:
+            await self._record(changed)
+
+        if not self._schedule:
+            return self.min_interval
+        return max(0.0, min(next_check for _, next_check in self._schedule.values()) - time.monotonic())
+
+    async def _record(self, changed):
+        async with self.session_factory() as db:
+            for row, response in changed:
+                db_model = await db.get(FineTunedModel, row.id)
+                newly_succeeded = response.status == 'succeeded' and db_model.status != 'succeeded'
+                logger.info(f"Fine-tuning status for {row.fine_tune_id}: {db_model.status} -> {response.status}")
+                db_model.status = response.status
+                db_model.model_id = response.fine_tuned_model if response.fine_tuned_model else None
+                if response.status in TERMINAL_STATUSES:
+                    db_model.finished_at = datetime.now()
+                # Delivered to the API workers when the transaction commits
+                await notify(db, FINE_TUNE_STATUS_CHANNEL, row.fine_tune_id)
+                if newly_succeeded:
+                    logger.info(f"Fine-tuned model {db_model.model_id} is now available, refreshing active model")
+                    await notify(db, ACTIVE_MODEL_CHANNEL, row.fine_tune_id)
+            await db.commit()
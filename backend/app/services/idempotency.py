@@ -0,0 +1,179 @@
+import asyncio
+import hashlib
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, Optional, Tuple, Union
+
+from sqlalchemy import and_, delete, func, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from ..core.config import Settings
+from ..core.metrics import IDEMPOTENT_SENDS
+from ..models.models import IdempotencyKey, Message
+from ..schemas.chat import MessageResponse
+
+logger = logging.getLogger(__name__)
+
+class IdempotencyKeyInUse(Exception):
+    """The key's first request is still running in another worker process."""
+
+class IdempotencyKeyMismatch(Exception):
+    """The key was first used to send a different message or to another conversation."""
+
+def request_fingerprint(conversation_id: int, content: str) -> str:
+    return hashlib.blake2b(f"{conversation_id}\n{content}".encode(), digest_size=16).hexdigest()
+
+async def complete_key(db: AsyncSession, key_id: int, ai_message: Message):
+    """Store the reply under its key; run in the transaction that inserts the turn."""
+    await db.execute(
+        update(IdempotencyKey)
+        .filter(IdempotencyKey.id == key_id)
+        .values(response=MessageResponse.model_validate(ai_message).model_dump(mode="json"), completed_at=func.now())
+    )
+
+class IdempotentSends:
+    """Runs a chat send at most once per user and ``Idempotency-Key``.
+
+    Requests with the same key in this worker share one run (single-flight),
+    so a double click or a client retry costs one completion and every one of
+    them gets the same reply. The first of them claims the key in the
+    ``idempotency_keys`` table. The ``MessageWriter`` then stores the reply
+    under it in the turn's own transaction, and later requests with the key
+    are answered from there for ``retention_seconds``. A request that reaches
+    another worker while the turn is still running is refused with
+    ``IdempotencyKeyInUse``. A failed turn frees its key so it can be retried.
+    """
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker,
+        retention_seconds: float = 86400,
+        pending_timeout_seconds: float = 300,
+        purge_interval_seconds: float = 600
+    ):
+        self.session_factory = session_factory
+        self.retention_seconds = retention_seconds
+        self.pending_timeout_seconds = pending_timeout_seconds
+        self.purge_interval_seconds = purge_interval_seconds
+        self._in_flight: Dict[Tuple[int, str], Tuple[str, asyncio.Task]] = {}  # (user, key) -> (fingerprint, run)
+        self._last_purge = 0.0
+        self._purges = set()
+
+    @classmethod
+    def from_settings(cls, settings: Settings, session_factory: async_sessionmaker) -> "IdempotentSends":
+        return cls(
+            session_factory,
+            retention_seconds=settings.IDEMPOTENCY_KEY_RETENTION_HOURS * 3600,
+            pending_timeout_seconds=settings.IDEMPOTENCY_KEY_PENDING_TIMEOUT_SECONDS,
+        )
+
+    async def run(
+        self,
+        user_id: int,
+        key: str,
+        fingerprint: str,
+        send: Callable[[int], Awaitable[Message]]
+    ) -> Union[Message, dict]:
+        """The AI reply of ``send(key_id)``, or of the earlier send with this key as a stored ``MessageResponse``."""
+        flight_key = (user_id, key)
+        flight = self._in_flight.get(flight_key)
+        if flight is None:
+            task = asyncio.create_task(self._run(user_id, key, fingerprint, send))
+            flight = self._in_flight[flight_key] = (fingerprint, task)
+            task.add_done_callback(lambda _: self._in_flight.pop(flight_key, None))
+        elif flight[0] != fingerprint:
+            IDEMPOTENT_SENDS.labels("mismatch").inc()
+            raise IdempotencyKeyMismatch("Idempotency-Key was already used for a different message")
+        else:
+            IDEMPOTENT_SENDS.labels("coalesced").inc()
+        # Shielded: one waiter going away must not cancel the turn the others are waiting for
+        return await asyncio.shield(flight[1])
+
+    async def _run(self, user_id: int, key: str, fingerprint: str, send: Callable[[int], Awaitable[Message]]):
+        key_id, response = await self._claim(user_id, key, fingerprint)
+        if response is not None:
+            IDEMPOTENT_SENDS.labels("replayed").inc()
+            return response
+        IDEMPOTENT_SENDS.labels("new").inc()
+        try:
+            return await send(key_id)
+        except Exception:
+            # Nothing was stored, so a retry with the same key runs the turn again
+            await self._release(key_id)
+            raise
+
+    async def _claim(self, user_id: int, key: str, fingerprint: str) -> Tuple[int, Optional[dict]]:
+        """The key's row id and stored response, inserting the row (with no response yet) if the key is new."""
+        self._schedule_purge()
+        now = datetime.now(timezone.utc)
+        async with self.session_factory() as db:
+            for _ in range(2):
+                # A key past retention, or held by a turn that died with its worker, is free again
+                await db.execute(
+                    delete(IdempotencyKey).filter(
+                        IdempotencyKey.user_id == user_id,
+                        IdempotencyKey.key == key,
+                        or_(
+                            IdempotencyKey.created_at < now - timedelta(seconds=self.retention_seconds),
+                            and_(
+                                IdempotencyKey.completed_at.is_(None),
+                                IdempotencyKey.created_at < now - timedelta(seconds=self.pending_timeout_seconds),
+                            ),
+                        ),
+                    )
+                )
+                row = await db.scalar(
+                    select(IdempotencyKey).filter(IdempotencyKey.user_id == user_id, IdempotencyKey.key == key)
+                )
+                if row is None:
+                    row = IdempotencyKey(user_id=user_id, key=key, fingerprint=fingerprint)
+                    db.add(row)
+                    try:
+                        await db.commit()
+                        return row.id, None
+                    except IntegrityError:
+                        # A request to another worker claimed the key first; look at its row instead
+                        await db.rollback()
+                        continue
+                await db.commit()
+                if row.fingerprint != fingerprint:
+                    IDEMPOTENT_SENDS.labels("mismatch").inc()
+                    raise IdempotencyKeyMismatch("Idempotency-Key was already used for a different message")
+                if row.completed_at is not None:
+                    return row.id, row.response
+                break
+        IDEMPOTENT_SENDS.labels("in_progress").inc()
+        raise IdempotencyKeyInUse("A request with this Idempotency-Key is still being processed")
+
+    async def _release(self, key_id: int):
+        try:
+            async with self.session_factory() as db:
+                await db.execute(
+                    delete(IdempotencyKey).filter(IdempotencyKey.id == key_id, IdempotencyKey.completed_at.is_(None))
+                )
+                await db.commit()
+        except Exception as e:
+            # The key stays claimed until the pending timeout frees it
+            logger.warning(f"Could not release idempotency key {key_id}: {str(e)}")
+
+    def _schedule_purge(self):
+        # Expired keys are deleted in the background, at most once per purge interval per worker
+        if time.monotonic() - self._last_purge < self.purge_interval_seconds:
+            return
+        self._last_purge = time.monotonic()
+        task = asyncio.create_task(self._purge())
+        self._purges.add(task)
+        task.add_done_callback(self._purges.discard)
+
+    async def _purge(self):
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=max(self.retention_seconds, self.pending_timeout_seconds))
+        try:
+            async with self.session_factory() as db:
+                result = await db.execute(delete(IdempotencyKey).filter(IdempotencyKey.created_at < cutoff))
+                await db.commit()
+            if result.rowcount:
+                logger.info(f"Purged {result.rowcount} expired idempotency keys")
+        except Exception as e:
+            logger.warning(f"Purging expired idempotency keys failed: {str(e)}")
@@ -0,0 +1,256 @@
+import asyncio
+import logging
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from sqlalchemy import and_, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from ..core.config import Settings
+from ..models.models import Job
+from .notifications import notify
+
+logger = logging.getLogger(__name__)
+
+# NOTIFY channel that wakes idle workers when a job is enqueued; the payload is the job kind
+JOBS_CHANNEL = "jobs_available"
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+class PermanentJobError(Exception):
+    """Raised by a handler when retrying cannot help; the job fails immediately."""
+
+class JobLost(Exception):
+    """The job's lock expired and another worker reclaimed it."""
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+async def enqueue(
+    db: AsyncSession,
+    kind: str,
+    payload: dict,
+    idempotency_key: Optional[str] = None,
+    max_attempts: int = 5
+) -> Job:
+    """Persist a job for the workers and commit.
+
+    With an ``idempotency_key``, enqueueing the same key again returns the
+    existing job instead of creating a second one.
+    """
+    if idempotency_key is not None:
+        existing = await db.scalar(select(Job).filter(Job.idempotency_key == idempotency_key))
+        if existing:
+            return existing
+
+    job = Job(
+        kind=kind,
+        payload=payload,
+        idempotency_key=idempotency_key,
+        status=QUEUED,
+        attempts=0,
+        max_attempts=max_attempts,
+        run_at=utcnow()
+    )
+    db.add(job)
+    await notify(db, JOBS_CHANNEL, kind)
+    try:
+        await db.commit()
+    except IntegrityError:
+        # A concurrent request enqueued the same key first
+        await db.rollback()
+        if idempotency_key is None:
+            raise
+        return await db.scalar(select(Job).filter(Job.idempotency_key == idempotency_key))
+    logger.info(f"Enqueued {kind} job {job.id}")
+    return job
+
+class JobQueue:
+    """Claims and settles jobs for one worker process, each step in its own short transaction.
+
+    Jobs are claimed with ``SELECT ... FOR UPDATE SKIP LOCKED``, so any number of
+    workers can drain the table without blocking on each other. A running job
+    whose lock has not been refreshed by a checkpoint within ``lock_timeout_seconds``
+    is assumed to belong to a dead worker and is claimed again.
+    """
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker,
+        worker_id: Optional[str] = None,
+        lock_timeout_seconds: float = 900,
+        retry_backoff_seconds: float = 30,
+        retry_backoff_max_seconds: float = 3600,
+    ):
+        self.session_factory = session_factory
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.lock_timeout_seconds = lock_timeout_seconds
+        self.retry_backoff_seconds = retry_backoff_seconds
+        self.retry_backoff_max_seconds = retry_backoff_max_seconds
+
+    @classmethod
+    def from_settings(cls, settings: Settings, session_factory: async_sessionmaker) -> "JobQueue":
+        return cls(
+            session_factory,
+            lock_timeout_seconds=settings.JOB_LOCK_TIMEOUT_SECONDS,
+            retry_backoff_seconds=settings.JOB_RETRY_BACKOFF_SECONDS,
+            retry_backoff_max_seconds=settings.JOB_RETRY_BACKOFF_MAX_SECONDS,
+        )
+
+    async def claim(self, kinds: List[str]) -> Optional[Job]:
+        now = utcnow()
+        async with self.session_factory() as db:
+            job = await db.scalar(
+                select(Job).filter(
+                    Job.kind.in_(kinds),
+                    or_(
+                        and_(Job.status == QUEUED, Job.run_at <= now),
+                        and_(Job.status == RUNNING, Job.locked_at < now - timedelta(seconds=self.lock_timeout_seconds))
+                    )
+                ).order_by(Job.run_at).limit(1).with_for_update(skip_locked=True)
+            )
+            if job is None:
+                return None
+            if job.status == RUNNING:
+                logger.warning(f"Reclaiming job {job.id} from {job.locked_by}, its lock expired")
+            job.attempts += 1
+            if job.attempts > job.max_attempts:
+                # Its workers keep dying mid-run
+                job.status = FAILED
+                job.last_error = f"Gave up after {job.max_attempts} attempts; last worker {job.locked_by} was lost"
+                job.finished_at = now
+                job.locked_by = None
+                job.locked_at = None
+                await db.commit()
+                return None
+            job.status = RUNNING
+            job.locked_by = self.worker_id
+            job.locked_at = now
+            await db.commit()
+            return job
+
+    async def checkpoint(self, job: Job, progress: str, result: Optional[dict] = None, db: Optional[AsyncSession] = None):
+        """Record a finished step and refresh the lock.
+
+        Pass ``db`` to commit the checkpoint atomically with the handler's own
+        writes. Raises ``JobLost`` (and rolls back ``db``) if the job was reclaimed.
+        """
+        job.progress = progress
+        job.result = {**(job.result or {}), **(result or {})}
+        statement = update(Job).filter(
+            Job.id == job.id,
+            Job.status == RUNNING,
+            Job.locked_by == self.worker_id
+        ).values(progress=job.progress, result=job.result, locked_at=utcnow())
+
+        if db is None:
+            async with self.session_factory() as own_db:
+                await self._execute_owned(own_db, job, statement)
+        else:
+            await self._execute_owned(db, job, statement)
+        logger.info(f"Job {job.id}: {progress}")
+
+    async def _execute_owned(self, db: AsyncSession, job: Job, statement):
+        result = await db.execute(statement)
+        if not result.rowcount:
+            await db.rollback()
+            raise JobLost(f"Job {job.id} is no longer locked by {self.worker_id}")
+        await db.commit()
+
+    async def complete(self, job: Job):
+        async with self.session_factory() as db:
+            await db.execute(
+                update(Job).filter(Job.id == job.id, Job.locked_by == self.worker_id).values(
+                    status=SUCCEEDED, finished_at=utcnow(), locked_by=None, locked_at=None
+                )
+            )
+            await db.commit()
+
+    async def fail(self, job: Job, error: str, retry: bool = True):
+        """Requeue with exponential backoff, or fail for good once attempts run out."""
+        values = {"last_error": error, "locked_by": None, "locked_at": None}
+        if retry and job.attempts < job.max_attempts:
+            delay = min(self.retry_backoff_max_seconds, self.retry_backoff_seconds * 2 ** (job.attempts - 1))
+            values.update(status=QUEUED, run_at=utcnow() + timedelta(seconds=delay))
+            logger.warning(f"Job {job.id} attempt {job.attempts} failed, retrying in {delay:.0f}s: {error}")
+        else:
+            values.update(status=FAILED, finished_at=utcnow())
+            logger.error(f"Job {job.id} failed after {job.attempts} attempts: {error}")
+        async with self.session_factory() as db:
+            await db.execute(update(Job).filter(Job.id == job.id, Job.locked_by == self.worker_id).values(**values))
+            await db.commit()
+
+# Handlers get the claimed job and the queue to checkpoint through
+JobHandler = Callable[[Job, JobQueue], Awaitable[None]]
+
+class JobWorker:
+    """Runs ``concurrency`` claim loops over the registered job kinds.
+
+    Idle loops sleep until ``wake`` is called (wired to NOTIFY on ``JOBS_CHANNEL``)
+    or ``poll_interval`` passes, which also picks up retries whose backoff ended.
+    ``stop`` lets every loop finish its current job before ``run`` returns.
+    """
+
+    def __init__(self, queue: JobQueue, handlers: Dict[str, JobHandler], concurrency: int = 2, poll_interval: float = 5.0):
+        self.queue = queue
+        self.handlers = handlers
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+
+    def wake(self, payload: Optional[str] = None):
+        self._wakeup.set()
+
+    def stop(self):
+        logger.info("Stopping job worker after the running jobs finish")
+        self._stopping = True
+        self._wakeup.set()
+
+    async def run(self):
+        logger.info(f"Job worker {self.queue.worker_id} handling {', '.join(self.handlers)} with concurrency {self.concurrency}")
+        await asyncio.gather(*(self._loop() for _ in range(self.concurrency)))
+
+    async def _loop(self):
+        while not self._stopping:
+            # Cleared before claiming so a NOTIFY arriving mid-claim is not lost
+            self._wakeup.clear()
+            try:
+                job = await self.queue.claim(list(self.handlers))
+            except Exception as e:
+                logger.error(f"Error claiming a job: {str(e)}")
+                job = None
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            try:
+                await self._execute(job)
+            except Exception as e:
+                # Settling failed (e.g. the database went away); the lock expires and the job is retried
+                logger.error(f"Error settling job {job.id}: {str(e)}")
+
+    async def _execute(self, job: Job):
+        logger.info(f"Running {job.kind} job {job.id} (attempt {job.attempts}/{job.max_attempts})")
+        try:
+            await self.handlers[job.kind](job, self.queue)
+        except JobLost as e:
+            logger.warning(str(e))
+            return
+        except PermanentJobError as e:
+            await self.queue.fail(job, str(e), retry=False)
+            return
+        except Exception as e:
+            await self.queue.fail(job, str(e))
+            return
+        await self.queue.complete(job)
+        logger.info(f"Job {job.id} succeeded")
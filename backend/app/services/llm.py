@@ -0,0 +1,241 @@
+import asyncio
+import contextlib
+import functools
+import logging
+import random
+import time
+from typing import TYPE_CHECKING, AsyncIterator, List, Optional
+
+import anyio
+import httpx
+
+from ..core.config import Settings
+from ..core.metrics import (
+    LLM_FIRST_TOKEN_SECONDS, LLM_REQUEST_SECONDS, LLM_REQUESTS_IN_FLIGHT, LLM_RETRIES, record_usage
+)
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
+
+logger = logging.getLogger(__name__)
+
+@functools.lru_cache(maxsize=None)
+def retryable_errors() -> tuple:
+    """Transient failures worth retrying: rate limits, provider 5xx, timeouts and dropped connections.
+
+    openai is the slowest import of the app, so it is only imported once a
+    client is built or an error is matched; the gunicorn master imports it
+    before forking so workers share it.
+    """
+    import openai
+
+    return (
+        openai.RateLimitError,
+        openai.InternalServerError,
+        openai.APITimeoutError,
+        openai.APIConnectionError,
+    )
+
+def may_have_reached_provider(error: Exception) -> bool:
+    """A timeout or dropped connection after the request went out, as opposed to failing to connect at all."""
+    import openai
+
+    return isinstance(error, openai.APIConnectionError) and not isinstance(
+        error.__cause__, (httpx.ConnectError, httpx.ConnectTimeout)
+    )
+
+class LLMClient:
+    """Application-scoped LLM client.
+
+    Wraps a single ``AsyncOpenAI`` instance over one pooled ``httpx.AsyncClient``
+    so connections (and TLS sessions) are reused across requests. Calls are
+    bounded by a semaphore, so a burst of chats queues here instead of
+    stampeding the provider, and transient errors are retried with jittered
+    exponential backoff. Calls that create something on the provider (files,
+    uploads, fine-tuning jobs) are not retried once the request may have
+    reached it, since a second one would create a duplicate.
+    """
+
+    def __init__(
+        self,
+        api_key: Optional[str],
+        base_url: Optional[str] = None,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        keepalive_expiry: float = 30.0,
+        timeout: float = 60.0,
+        connect_timeout: float = 5.0,
+        max_retries: int = 3,
+        backoff_base: float = 0.5,
+        backoff_max: float = 8.0,
+        max_concurrency: int = 50,
+    ):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self._http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+                keepalive_expiry=keepalive_expiry,
+            ),
+            timeout=self._timeout,
+        )
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._client: Optional["AsyncOpenAI"] = None
+
+    @classmethod
+    def from_settings(cls, settings: Settings) -> "LLMClient":
+        return cls(
+            api_key=settings.OPENAI_API_KEY,
+            base_url=settings.OPENAI_BASE_URL,
+            max_connections=settings.LLM_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.LLM_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.LLM_KEEPALIVE_EXPIRY_SECONDS,
+            timeout=settings.LLM_TIMEOUT_SECONDS,
+            connect_timeout=settings.LLM_CONNECT_TIMEOUT_SECONDS,
+            max_retries=settings.LLM_MAX_RETRIES,
+            backoff_base=settings.LLM_BACKOFF_BASE_SECONDS,
+            backoff_max=settings.LLM_BACKOFF_MAX_SECONDS,
+            max_concurrency=settings.LLM_MAX_CONCURRENCY,
+        )
+
+    @property
+    def client(self) -> "AsyncOpenAI":
+        # Built on first use so the app can start without an API key configured
+        if self._client is None:
+            from openai import AsyncOpenAI
+
+            self._client = AsyncOpenAI(
+                api_key=self.api_key,
+                base_url=self.base_url,
+                http_client=self._http_client,
+                timeout=self._timeout,
+                max_retries=0,  # Retries are handled by _call
+            )
+        return self._client
+
+    def _backoff_delay(self, attempt: int, error: Exception) -> float:
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        response = getattr(error, "response", None)
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        if retry_after:
+            try:
+                delay = max(delay, min(float(retry_after), self.backoff_max))
+            except ValueError:
+                pass
+        return delay
+
+    async def _call(self, fn, *args, idempotent: bool = True, **kwargs):
+        attempt = 0
+        while True:
+            try:
+                async with self._semaphore:
+                    return await fn(*args, **kwargs)
+            except retryable_errors() as e:
+                if attempt >= self.max_retries or (not idempotent and may_have_reached_provider(e)):
+                    raise
+                delay = self._backoff_delay(attempt, e)
+                attempt += 1
+                LLM_RETRIES.labels(type(e).__name__).inc()
+                logger.warning(f"LLM call failed ({type(e).__name__}), retry {attempt}/{self.max_retries} in {delay:.2f}s")
+                await asyncio.sleep(delay)
+
+    async def chat_completion(self, timeout: Optional[float] = None, **kwargs):
+        if timeout is not None:
+            kwargs["timeout"] = timeout
+        started = time.perf_counter()
+        with LLM_REQUESTS_IN_FLIGHT.track_inprogress():
+            response = await self._call(self.client.chat.completions.create, **kwargs)
+        LLM_REQUEST_SECONDS.labels(kwargs["model"], "complete").observe(time.perf_counter() - started)
+        record_usage(kwargs["model"], response.usage)
+        return response
+
+    @contextlib.asynccontextmanager
+    async def stream_chat_completion(self, timeout: Optional[float] = None, **kwargs) -> AsyncIterator:
+        """Open a streaming completion, holding a concurrency slot until the block exits.
+
+        Only establishing the stream is retried; once chunks have been forwarded
+        to a client a failure is surfaced to the caller. The chunks are passed
+        through an iterator that records time to first token and token usage.
+        """
+        if timeout is not None:
+            kwargs["timeout"] = timeout
+        # The last chunk then carries the token counts, with no choices
+        kwargs.setdefault("stream_options", {"include_usage": True})
+        model = kwargs["model"]
+        started = time.perf_counter()
+        attempt = 0
+        LLM_REQUESTS_IN_FLIGHT.inc()
+        try:
+            async with self._semaphore:
+                while True:
+                    try:
+                        stream = await self.client.chat.completions.create(stream=True, **kwargs)
+                        break
+                    except retryable_errors() as e:
+                        if attempt >= self.max_retries:
+                            raise
+                        delay = self._backoff_delay(attempt, e)
+                        attempt += 1
+                        LLM_RETRIES.labels(type(e).__name__).inc()
+                        logger.warning(f"LLM stream failed ({type(e).__name__}), retry {attempt}/{self.max_retries} in {delay:.2f}s")
+                        await asyncio.sleep(delay)
+                try:
+                    yield self._observe_stream(stream, model, started)
+                finally:
+                    # Close the upstream response even when the caller was cancelled (client disconnect)
+                    with anyio.CancelScope(shield=True):
+                        await stream.close()
+                    LLM_REQUEST_SECONDS.labels(model, "stream").observe(time.perf_counter() - started)
+        finally:
+            LLM_REQUESTS_IN_FLIGHT.dec()
+
+    async def _observe_stream(self, stream, model: str, started: float):
+        first_token = True
+        async for chunk in stream:
+            if first_token and chunk.choices and chunk.choices[0].delta.content:
+                LLM_FIRST_TOKEN_SECONDS.labels(model).observe(time.perf_counter() - started)
+                first_token = False
+            if chunk.usage is not None:
+                record_usage(model, chunk.usage)
+            yield chunk
+
+    async def upload_file(self, file, purpose: str, timeout: Optional[float] = None):
+        kwargs = {"timeout": timeout} if timeout is not None else {}
+
+        async def upload():
+            file.seek(0)  # A retried upload must resend the whole file
+            return await self.client.files.create(file=file, purpose=purpose, **kwargs)
+
+        return await self._call(upload, idempotent=False)
+
+    async def retrieve_file(self, file_id: str):
+        return await self._call(self.client.files.retrieve, file_id)
+
+    async def create_upload(self, **kwargs):
+        """Start a multipart upload (Uploads API) for files sent in parts."""
+        return await self._call(self.client.uploads.create, idempotent=False, **kwargs)
+
+    async def add_upload_part(self, upload_id: str, data: bytes):
+        return await self._call(self.client.uploads.parts.create, upload_id, data=data)
+
+    async def complete_upload(self, upload_id: str, part_ids: List[str], md5: Optional[str] = None):
+        kwargs = {"md5": md5} if md5 else {}
+        return await self._call(self.client.uploads.complete, upload_id, part_ids=part_ids, **kwargs)
+
+    async def create_fine_tuning_job(self, **kwargs):
+        return await self._call(self.client.fine_tuning.jobs.create, idempotent=False, **kwargs)
+
+    async def list_fine_tuning_jobs(self, limit: int = 100):
+        """The most recent fine-tuning jobs, newest first."""
+        return (await self._call(self.client.fine_tuning.jobs.list, limit=limit)).data
+
+    async def retrieve_fine_tuning_job(self, fine_tune_id: str):
+        return await self._call(self.client.fine_tuning.jobs.retrieve, fine_tune_id)
+
+    async def aclose(self):
+        await self._http_client.aclose()
@@ -0,0 +1,167 @@
+import gzip
+import hashlib
+import json
+import os
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Iterable, List, Optional, Tuple
+
+import anyio
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..core.config import Settings
+from ..models.models import Message, MessageArchive, MessageArchiveSegment
+
+# Columns of each archived message, one JSON object per line
+ARCHIVE_FIELDS = ("id", "conversation_id", "content", "is_ai", "created_at", "user_id")
+
+@dataclass
+class Segment:
+    conversation_id: int
+    byte_offset: int
+    byte_length: int
+    messages: int
+    first_created_at: datetime
+    last_created_at: datetime
+
+@dataclass
+class ArchiveFile:
+    segments: List[Segment]
+    messages: int
+    bytes: int
+    sha256: str
+
+@dataclass
+class CompactedFile:
+    offsets: List[int]  # New byte offset of each kept member, in the order given
+    bytes: int
+    sha256: str
+
+def write_archive(path: str, rows: Iterable[tuple]) -> ArchiveFile:
+    """Write ``rows`` (``ARCHIVE_FIELDS`` tuples ordered by conversation, created_at, id) as gzip JSONL.
+
+    Each conversation is compressed as a gzip member of its own. The members
+    concatenate into one ordinary ``.jsonl.gz`` file (``zcat`` reads it whole),
+    and a conversation's history can be read back by seeking to its member
+    without decompressing anything else.
+    """
+    segments: List[Segment] = []
+    digest = hashlib.sha256()
+    offset = 0
+    current: Optional[int] = None
+    lines: List[bytes] = []
+    first = last = None
+
+    with open(path + ".partial", "wb") as f:
+        def flush():
+            nonlocal offset
+            member = gzip.compress(b"".join(lines), compresslevel=6, mtime=0)
+            f.write(member)
+            digest.update(member)
+            segments.append(Segment(current, offset, len(member), len(lines), first, last))
+            offset += len(member)
+
+        for row in rows:
+            record = dict(zip(ARCHIVE_FIELDS, row))
+            if record["conversation_id"] != current:
+                if lines:
+                    flush()
+                current, lines, first = record["conversation_id"], [], record["created_at"]
+            last = record["created_at"]
+            record["created_at"] = record["created_at"].isoformat()
+            lines.append(json.dumps(record, ensure_ascii=False).encode() + b"\n")
+        if lines:
+            flush()
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(path + ".partial", path)
+    return ArchiveFile(segments, sum(segment.messages for segment in segments), offset, digest.hexdigest())
+
+def compact_archive(source: str, path: str, members: List[Tuple[int, int]]) -> CompactedFile:
+    """Copy the gzip members at ``members`` (byte offset, length) of ``source`` to a new archive at ``path``.
+
+    Everything else in ``source``, such as deleted conversations, is left behind.
+    The members are copied as they are, without recompressing.
+    """
+    offsets: List[int] = []
+    digest = hashlib.sha256()
+    offset = 0
+    with open(source, "rb") as src, open(path + ".partial", "wb") as f:
+        for byte_offset, byte_length in members:
+            src.seek(byte_offset)
+            member = src.read(byte_length)
+            f.write(member)
+            digest.update(member)
+            offsets.append(offset)
+            offset += len(member)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(path + ".partial", path)
+    return CompactedFile(offsets, offset, digest.hexdigest())
+
+def read_segment(path: str, byte_offset: int, byte_length: int) -> List[dict]:
+    """One conversation's archived messages, oldest first."""
+    with open(path, "rb") as f:
+        f.seek(byte_offset)
+        data = gzip.decompress(f.read(byte_length))
+    records = [json.loads(line) for line in data.splitlines()]
+    for record in records:
+        record["created_at"] = datetime.fromisoformat(record["created_at"])
+    return records
+
+class MessageArchiveReader:
+    """Reads archived conversation history back for ``get_messages``.
+
+    Archived partitions are always older than every attached one, so a
+    conversation's archived messages continue its history where the
+    database runs out. Segments are read on request, off the event loop.
+    """
+
+    def __init__(self, archive_dir: str = "archive"):
+        self.archive_dir = archive_dir
+
+    @classmethod
+    def from_settings(cls, settings: Settings) -> "MessageArchiveReader":
+        return cls(archive_dir=settings.MESSAGE_ARCHIVE_DIR)
+
+    async def page(
+        self,
+        db: AsyncSession,
+        conversation_id: int,
+        limit: int,
+        before: Optional[Tuple[datetime, int]] = None
+    ) -> List[Message]:
+        """Up to ``limit`` archived messages older than ``before`` (created_at, id), newest first."""
+        for attempt in range(2):
+            segments = await self._segments(db, conversation_id, before)
+            try:
+                return await self._read(segments, limit, before)
+            except FileNotFoundError:
+                # The archive was compacted into a new file since the segments were looked up
+                if attempt:
+                    raise
+
+    async def _segments(self, db: AsyncSession, conversation_id: int, before: Optional[Tuple[datetime, int]]):
+        query = select(
+            MessageArchiveSegment.byte_offset, MessageArchiveSegment.byte_length, MessageArchive.path
+        ).join(
+            MessageArchive, MessageArchive.id == MessageArchiveSegment.archive_id
+        ).filter(MessageArchiveSegment.conversation_id == conversation_id)
+        if before is not None:
+            query = query.filter(MessageArchiveSegment.first_created_at <= before[0])
+        return (await db.execute(query.order_by(MessageArchiveSegment.last_created_at.desc()))).all()
+
+    async def _read(self, segments, limit: int, before: Optional[Tuple[datetime, int]]) -> List[Message]:
+        messages: List[Message] = []
+        for segment in segments:
+            records = await anyio.to_thread.run_sync(
+                read_segment, os.path.join(self.archive_dir, segment.path), segment.byte_offset, segment.byte_length
+            )
+            for record in reversed(records):
+                if before is not None and (record["created_at"], record["id"]) >= before:
+                    continue
+                messages.append(Message(**record))
+                if len(messages) >= limit:
+                    return messages
+        return messages
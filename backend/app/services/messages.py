@@ -0,0 +1,115 @@
+import asyncio
+import logging
+from typing import List, Optional, Tuple
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from ..core.config import Settings
+from ..models.models import Message
+from .idempotency import complete_key
+
+logger = logging.getLogger(__name__)
+
+# A turn's two message rows and the id of its idempotency key, if it was sent with one
+Turn = Tuple[List[dict], Optional[int]]
+
+class MessageWriter:
+    """Persists a chat turn (user message plus AI reply) in one short transaction.
+
+    Both rows go out as a single ``INSERT ... RETURNING``, so ids and server
+    defaults come back without a refresh, and the connection is only checked
+    out for that statement and the commit.
+
+    With ``max_batch`` above 1 this becomes group commit: turns finishing
+    within ``max_delay`` of each other (or until ``max_batch`` are waiting)
+    share one INSERT and one commit. Callers still wait for the commit, so a
+    reply is never acknowledged before it is stored.
+
+    A turn sent with an ``Idempotency-Key`` passes the key's row id, and its
+    reply is stored under the key in the same transaction.
+    """
+
+    def __init__(self, session_factory: async_sessionmaker, max_batch: int = 1, max_delay: float = 0.005):
+        self.session_factory = session_factory
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._pending: List[Tuple[Turn, asyncio.Future]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._flushes = set()
+
+    @classmethod
+    def from_settings(cls, settings: Settings, session_factory: async_sessionmaker) -> "MessageWriter":
+        return cls(
+            session_factory,
+            max_batch=settings.CHAT_WRITE_BATCH_SIZE,
+            max_delay=settings.CHAT_WRITE_BATCH_DELAY_MS / 1000,
+        )
+
+    async def write_turn(
+        self,
+        conversation_id: int,
+        user_content: str,
+        ai_content: str,
+        idempotency_key_id: Optional[int] = None
+    ) -> Tuple[Message, Message]:
+        rows = [
+            {"conversation_id": conversation_id, "content": user_content, "is_ai": False},
+            {"conversation_id": conversation_id, "content": ai_content, "is_ai": True},
+        ]
+        turn = (rows, idempotency_key_id)
+        if self.max_batch <= 1:
+            user_message, ai_message = await self._insert([turn])
+            return user_message, ai_message
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((turn, future))
+        if len(self._pending) >= self.max_batch:
+            self._schedule_flush()
+        elif self._flush_handle is None:
+            self._flush_handle = asyncio.get_running_loop().call_later(self.max_delay, self._schedule_flush)
+        # Shielded: the batch is written either way, so a cancelled caller must not break it
+        return await asyncio.shield(future)
+
+    async def _insert(self, turns: List[Turn]) -> List[Message]:
+        async with self.session_factory() as db:
+            messages = (await db.scalars(
+                insert(Message).returning(Message, sort_by_parameter_order=True),
+                [row for rows, _ in turns for row in rows]
+            )).all()
+            for index, (_, idempotency_key_id) in enumerate(turns):
+                if idempotency_key_id is not None:
+                    # Committed with the turn, so a retry never finds the turn stored but its key unanswered
+                    await complete_key(db, idempotency_key_id, messages[2 * index + 1])
+            await db.commit()
+        return messages
+
+    def _schedule_flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.create_task(self._flush(batch))
+            self._flushes.add(task)
+            task.add_done_callback(self._flushes.discard)
+
+    async def _flush(self, batch: List[Tuple[Turn, asyncio.Future]]):
+        try:
+            messages = await self._insert([turn for turn, _ in batch])
+        except Exception as e:
+            if len(batch) == 1:
+                batch[0][1].set_exception(e)
+                return
+            # One bad turn (say, its conversation was just deleted) must not fail the others
+            logger.warning(f"Batch of {len(batch)} chat turns failed, writing them one by one: {str(e)}")
+            await asyncio.gather(*(self._flush([item]) for item in batch))
+            return
+        for index, (_, future) in enumerate(batch):
+            future.set_result((messages[2 * index], messages[2 * index + 1]))
+
+    async def close(self):
+        """Write whatever is still waiting for its batch."""
+        self._schedule_flush()
+        if self._flushes:
+            await asyncio.gather(*self._flushes, return_exceptions=True)
@@ -0,0 +1,115 @@
+import asyncio
+import hashlib
+import logging
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..core.config import Settings
+from ..models.models import FineTunedModel
+
+logger = logging.getLogger(__name__)
+
+# NOTIFY channel used to tell every worker that the active fine-tuned model changed
+ACTIVE_MODEL_CHANNEL = "active_model_changed"
+
+@dataclass(frozen=True)
+class ActiveModel:
+    model_id: str
+    fine_tune_id: Optional[str] = None
+    reason: str = "base"  # base, fine_tuned, pinned or experiment
+
+class ModelRegistry:
+    """In-process cache of the model chat turns are routed to.
+
+    The latest succeeded fine-tune is looked up at most once per TTL (or after
+    an explicit invalidation) instead of on every message. Per-user pins and an
+    optional A/B experiment are resolved in memory before falling back to it.
+    """
+
+    def __init__(
+        self,
+        base_model: str,
+        ttl_seconds: float = 300.0,
+        user_pins: Optional[Dict[int, str]] = None,
+        experiment_model: Optional[str] = None,
+        experiment_percent: int = 0,
+    ):
+        self.base_model = base_model
+        self.ttl_seconds = ttl_seconds
+        self.user_pins: Dict[int, str] = dict(user_pins or {})
+        self.experiment_model = experiment_model
+        self.experiment_percent = experiment_percent
+        self._active: Optional[ActiveModel] = None
+        self._expires_at = 0.0
+        self._generation = 0
+        self._lock = asyncio.Lock()
+
+    @classmethod
+    def from_settings(cls, settings: Settings) -> "ModelRegistry":
+        return cls(
+            base_model=settings.BASE_MODEL,
+            ttl_seconds=settings.ACTIVE_MODEL_CACHE_TTL_SECONDS,
+            user_pins=settings.MODEL_USER_PINS,
+            experiment_model=settings.MODEL_EXPERIMENT_MODEL,
+            experiment_percent=settings.MODEL_EXPERIMENT_PERCENT,
+        )
+
+    def pin_user(self, user_id: int, model_id: str):
+        self.user_pins[user_id] = model_id
+
+    def unpin_user(self, user_id: int):
+        self.user_pins.pop(user_id, None)
+
+    def invalidate(self, payload: Optional[str] = None):
+        """Drop the cached active model; signature matches a notification handler."""
+        self._generation += 1
+        self._expires_at = 0.0
+
+    def _in_experiment(self, user_id: int) -> bool:
+        # Stable bucketing so a user stays on the same arm across workers and restarts
+        bucket = int(hashlib.sha256(str(user_id).encode()).hexdigest(), 16) % 100
+        return bucket < self.experiment_percent
+
+    async def _load_active(self, db: AsyncSession) -> ActiveModel:
+        fine_tuned_model = await db.scalar(
+            select(FineTunedModel).filter(
+                FineTunedModel.status == 'succeeded',
+                FineTunedModel.model_id.isnot(None)
+            ).order_by(FineTunedModel.created_at.desc()).limit(1)
+        )
+        if fine_tuned_model is None:
+            return ActiveModel(model_id=self.base_model)
+        return ActiveModel(
+            model_id=fine_tuned_model.model_id,
+            fine_tune_id=fine_tuned_model.fine_tune_id,
+            reason="fine_tuned",
+        )
+
+    async def get_active(self, db: AsyncSession) -> ActiveModel:
+        if self._active is not None and time.monotonic() < self._expires_at:
+            return self._active
+        async with self._lock:
+            # Another request may have refreshed the cache while this one waited
+            if self._active is not None and time.monotonic() < self._expires_at:
+                return self._active
+            generation = self._generation
+            active = await self._load_active(db)
+            if active != self._active:
+                logger.info(f"Active model is now {active.model_id} ({active.reason}, fine-tune {active.fine_tune_id})")
+            self._active = active
+            # An invalidation that raced with the query means the result may already be stale
+            if generation == self._generation:
+                self._expires_at = time.monotonic() + self.ttl_seconds
+            return active
+
+    async def resolve(self, db: AsyncSession, user_id: Optional[int] = None) -> ActiveModel:
+        if user_id is not None:
+            if user_id in self.user_pins:
+                return ActiveModel(model_id=self.user_pins[user_id], reason="pinned")
+            if self.experiment_model and self._in_experiment(user_id):
+                return ActiveModel(model_id=self.experiment_model, reason="experiment")
+        return await self.get_active(db)
@@ -0,0 +1,316 @@
+import asyncio
+import contextlib
+import functools
+import logging
+import math
+import time
+from collections import deque
+from typing import AsyncIterator, Deque, Dict, List, Optional
+
+import anyio
+
+from ..core.config import Settings
+from ..core.metrics import (
+    MODEL_CIRCUIT_OPENED, MODEL_CIRCUIT_STATE, MODEL_ROUTER_ATTEMPTS, MODEL_ROUTER_HEDGES, MODEL_ROUTER_SERVED
+)
+from .llm import LLMClient, retryable_errors
+
+logger = logging.getLogger(__name__)
+
+@functools.lru_cache(maxsize=None)
+def failover_errors() -> tuple:
+    """Failures that move a turn on to the next candidate and count against the model's circuit.
+
+    Anything else (a bad request, an auth error) would fail the same way on every model.
+    """
+    import openai
+
+    return retryable_errors() + (
+        openai.NotFoundError,  # A fine-tuned model that was deleted or is not visible to this key
+        TimeoutError,
+        asyncio.TimeoutError,
+    )
+
+CIRCUIT_STATES = {"closed": 0, "half_open": 1, "open": 2}
+
+class ModelUnavailable(Exception):
+    """Every candidate model failed, timed out or has an open circuit."""
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker for one model.
+
+    Opens after ``failure_threshold`` failed attempts in a row. While open the
+    model is skipped; after ``open_seconds`` a single trial request is let
+    through (half-open), which closes the circuit on success and reopens it on
+    failure. A trial that never reports back frees its slot after another
+    ``open_seconds``.
+    """
+
+    def __init__(self, model: str, failure_threshold: int = 5, open_seconds: float = 30.0):
+        self.model = model
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.state = "closed"
+        self.failures = 0
+        self._opened_at = 0.0
+        self._trial_started: Optional[float] = None
+        MODEL_CIRCUIT_STATE.labels(model).set(CIRCUIT_STATES["closed"])
+
+    def _set_state(self, state: str):
+        if state != self.state:
+            logger.warning(f"Circuit for model {self.model} is now {state.replace('_', '-')}")
+        self.state = state
+        MODEL_CIRCUIT_STATE.labels(self.model).set(CIRCUIT_STATES[state])
+
+    def allow(self) -> bool:
+        now = time.monotonic()
+        if self.state == "open":
+            if now - self._opened_at < self.open_seconds:
+                return False
+            self._set_state("half_open")
+            self._trial_started = None
+        if self.state == "half_open":
+            if self._trial_started is not None and now - self._trial_started < self.open_seconds:
+                return False
+            self._trial_started = now
+        return True
+
+    def record_success(self):
+        self.failures = 0
+        if self.state != "closed":
+            self._set_state("closed")
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == "half_open" or (self.state == "closed" and self.failures >= self.failure_threshold):
+            self._opened_at = time.monotonic()
+            MODEL_CIRCUIT_OPENED.labels(self.model).inc()
+            self._set_state("open")
+
+def _percentile(values, p: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(p / 100 * len(ordered)) - 1))]
+
+def _unavailable_detail(last_error: Optional[BaseException]) -> str:
+    if last_error is None:
+        return "No model could answer: all circuits open"
+    return f"No model could answer: {type(last_error).__name__}: {last_error}"
+
+class ModelRouter:
+    """Sends chat completions to an ordered list of candidate models.
+
+    The model the registry routed a turn to is tried first, then
+    ``fallback_models``, then the base model. Each attempt is bounded by
+    ``attempt_timeout`` (time to the first content chunk for streams); an
+    attempt that errors or times out moves on to the next candidate, and a
+    model whose attempts keep failing has its circuit opened and is skipped.
+    Streams only fall back before any content has been forwarded.
+
+    With hedging on, a completion still running after the ``hedge_percentile``
+    of that model's recent latencies gets a second, identical request; the
+    first answer wins and the other is cancelled. At most ``hedge_max_percent``
+    of recent completions are hedged, so a provider-wide slowdown cannot double
+    the load on it. Streams are never hedged.
+
+    State is per worker process and meant for a single event loop.
+    """
+
+    def __init__(
+        self,
+        llm_client: LLMClient,
+        base_model: str,
+        fallback_models: Optional[List[str]] = None,
+        attempt_timeout: float = 30.0,
+        first_token_timeout: float = 15.0,
+        hedge_enabled: bool = False,
+        hedge_percentile: float = 95.0,
+        hedge_min_samples: int = 50,
+        hedge_max_percent: float = 10.0,
+        latency_window: int = 500,
+        circuit_failure_threshold: int = 5,
+        circuit_open_seconds: float = 30.0,
+    ):
+        self.llm_client = llm_client
+        self.base_model = base_model
+        self.fallback_models = list(fallback_models or [])
+        self.attempt_timeout = attempt_timeout
+        self.first_token_timeout = first_token_timeout
+        self.hedge_enabled = hedge_enabled
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.hedge_max_percent = hedge_max_percent
+        self.latency_window = latency_window
+        self.circuit_failure_threshold = circuit_failure_threshold
+        self.circuit_open_seconds = circuit_open_seconds
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._latencies: Dict[str, Deque[float]] = {}
+        self._hedged: Deque[bool] = deque(maxlen=latency_window)
+
+    @classmethod
+    def from_settings(cls, settings: Settings, llm_client: LLMClient) -> "ModelRouter":
+        return cls(
+            llm_client,
+            base_model=settings.BASE_MODEL,
+            fallback_models=settings.MODEL_FALLBACKS,
+            attempt_timeout=settings.MODEL_ATTEMPT_TIMEOUT_SECONDS,
+            first_token_timeout=settings.MODEL_FIRST_TOKEN_TIMEOUT_SECONDS,
+            hedge_enabled=settings.MODEL_HEDGE_ENABLED,
+            hedge_percentile=settings.MODEL_HEDGE_PERCENTILE,
+            hedge_min_samples=settings.MODEL_HEDGE_MIN_SAMPLES,
+            hedge_max_percent=settings.MODEL_HEDGE_MAX_PERCENT,
+            latency_window=settings.MODEL_LATENCY_WINDOW,
+            circuit_failure_threshold=settings.MODEL_CIRCUIT_FAILURE_THRESHOLD,
+            circuit_open_seconds=settings.MODEL_CIRCUIT_OPEN_SECONDS,
+        )
+
+    def candidates(self, model: str) -> List[str]:
+        """The routed model, then the fallbacks, then the base model, without repeats."""
+        return list(dict.fromkeys([model, *self.fallback_models, self.base_model]))
+
+    def breaker(self, model: str) -> CircuitBreaker:
+        if model not in self._breakers:
+            self._breakers[model] = CircuitBreaker(model, self.circuit_failure_threshold, self.circuit_open_seconds)
+        return self._breakers[model]
+
+    def _record_latency(self, model: str, seconds: float):
+        if model not in self._latencies:
+            self._latencies[model] = deque(maxlen=self.latency_window)
+        self._latencies[model].append(seconds)
+
+    def hedge_delay(self, model: str) -> Optional[float]:
+        """Seconds after which a completion on ``model`` is hedged, or None to not hedge it."""
+        if not self.hedge_enabled:
+            return None
+        latencies = self._latencies.get(model)
+        if latencies is None or len(latencies) < self.hedge_min_samples:
+            return None
+        if sum(self._hedged) >= self.hedge_max_percent / 100 * max(len(self._hedged), self.hedge_min_samples):
+            return None
+        return _percentile(latencies, self.hedge_percentile)
+
+    async def chat_completion(self, **kwargs):
+        """``LLMClient.chat_completion`` with fallback, hedging and circuit breaking; ``kwargs["model"]`` goes first."""
+        routed = kwargs["model"]
+        last_error: Optional[Exception] = None
+        for model in self.candidates(routed):
+            breaker = self.breaker(model)
+            if not breaker.allow():
+                MODEL_ROUTER_ATTEMPTS.labels(model, "circuit_open").inc()
+                continue
+            started = time.perf_counter()
+            try:
+                response = await self._attempt({**kwargs, "model": model})
+            except failover_errors() as e:
+                last_error = e
+                self._record_failure(breaker, e)
+                continue
+            except Exception:
+                # The provider answered, so the model is healthy; the request itself is at fault
+                breaker.record_success()
+                raise
+            breaker.record_success()
+            self._record_latency(model, time.perf_counter() - started)
+            MODEL_ROUTER_ATTEMPTS.labels(model, "success").inc()
+            MODEL_ROUTER_SERVED.labels(routed, model).inc()
+            return response
+        MODEL_ROUTER_SERVED.labels(routed, "none").inc()
+        raise ModelUnavailable(_unavailable_detail(last_error))
+
+    async def _attempt(self, request: dict):
+        """One candidate: the completion, plus a hedged duplicate if it runs past the model's hedge delay."""
+        model = request["model"]
+        deadline = time.monotonic() + self.attempt_timeout
+        delay = self.hedge_delay(model)
+        primary = asyncio.create_task(self.llm_client.chat_completion(**request))
+        pending = {primary}
+        hedge = None
+        error: Optional[BaseException] = None
+        try:
+            if delay is not None and delay < self.attempt_timeout:
+                done, _ = await asyncio.wait(pending, timeout=delay)
+                self._hedged.append(not done)
+                if not done:
+                    hedge = asyncio.create_task(self.llm_client.chat_completion(**request))
+                    pending.add(hedge)
+            elif self.hedge_enabled:
+                self._hedged.append(False)
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, timeout=max(0.0, deadline - time.monotonic()), return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    raise TimeoutError(f"{model} did not answer within {self.attempt_timeout:g}s")
+                # exception() on every finished task, so a losing failure is not reported as unretrieved
+                failed = [task for task in done if task.exception() is not None]
+                succeeded = [task for task in done if task not in failed]
+                if succeeded:
+                    if hedge is not None:
+                        MODEL_ROUTER_HEDGES.labels(model, "hedge" if succeeded[0] is hedge else "primary").inc()
+                        hedge = None
+                    return succeeded[0].result()
+                error = failed[0].exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+            if hedge is not None:
+                MODEL_ROUTER_HEDGES.labels(model, "none").inc()
+
+    @contextlib.asynccontextmanager
+    async def stream_chat_completion(self, **kwargs) -> AsyncIterator:
+        """``LLMClient.stream_chat_completion`` that falls back until a candidate produces its first content."""
+        routed = kwargs["model"]
+        last_error: Optional[Exception] = None
+        for model in self.candidates(routed):
+            breaker = self.breaker(model)
+            if not breaker.allow():
+                MODEL_ROUTER_ATTEMPTS.labels(model, "circuit_open").inc()
+                continue
+            async with contextlib.AsyncExitStack() as stack:
+                try:
+                    try:
+                        with anyio.fail_after(self.first_token_timeout):
+                            stream = await stack.enter_async_context(
+                                self.llm_client.stream_chat_completion(**{**kwargs, "model": model})
+                            )
+                            head = await self._read_until_content(stream)
+                    except TimeoutError:
+                        raise TimeoutError(f"{model} sent no content within {self.first_token_timeout:g}s") from None
+                except failover_errors() as e:
+                    last_error = e
+                    self._record_failure(breaker, e)
+                    continue
+                except Exception:
+                    breaker.record_success()
+                    raise
+                breaker.record_success()
+                MODEL_ROUTER_ATTEMPTS.labels(model, "success").inc()
+                MODEL_ROUTER_SERVED.labels(routed, model).inc()
+                yield self._replay(head, stream)
+                return
+        MODEL_ROUTER_SERVED.labels(routed, "none").inc()
+        raise ModelUnavailable(_unavailable_detail(last_error))
+
+    async def _read_until_content(self, stream) -> list:
+        # Buffers the chunks up to and including the first one with content (or the whole stream if it has none)
+        head = []
+        while True:
+            try:
+                chunk = await stream.__anext__()
+            except StopAsyncIteration:
+                return head
+            head.append(chunk)
+            if chunk.choices and chunk.choices[0].delta.content:
+                return head
+
+    async def _replay(self, head: list, stream):
+        for chunk in head:
+            yield chunk
+        async for chunk in stream:
+            yield chunk
+
+    def _record_failure(self, breaker: CircuitBreaker, error: BaseException):
+        outcome = "timeout" if isinstance(error, (TimeoutError, asyncio.TimeoutError)) else "error"
+        MODEL_ROUTER_ATTEMPTS.labels(breaker.model, outcome).inc()
+        breaker.record_failure()
+        logger.warning(f"Model {breaker.model} failed ({type(error).__name__}: {error}), trying the next candidate")
@@ -0,0 +1,88 @@
+import asyncio
+import logging
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+logger = logging.getLogger(__name__)
+
+# Handlers receive the NOTIFY payload, or None after a reconnect when messages may have been missed
+NotificationHandler = Callable[[Optional[str]], None]
+
+async def notify(db: AsyncSession, channel: str, payload: str = ""):
+    """Queue a Postgres NOTIFY on the session's transaction; it is delivered on commit.
+
+    A no-op on other databases, where there is only a single process to keep in sync.
+    """
+    if db.bind.dialect.name != "postgresql":
+        return
+    await db.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": channel, "payload": payload})
+
+class PostgresListener:
+    """Fans Postgres LISTEN/NOTIFY messages out to in-process handlers.
+
+    Keeps one dedicated connection per worker and reconnects if it drops. After a
+    reconnect every handler is called with ``None`` so caches that may have
+    missed an invalidation can reset themselves.
+    """
+
+    def __init__(self, engine: AsyncEngine, reconnect_delay: float = 5.0):
+        self.engine = engine
+        self.reconnect_delay = reconnect_delay
+        self._handlers: Dict[str, List[NotificationHandler]] = defaultdict(list)
+        self._task: Optional[asyncio.Task] = None
+
+    def subscribe(self, channel: str, handler: NotificationHandler):
+        self._handlers[channel].append(handler)
+
+    def _dispatch(self, channel: str, payload: Optional[str]):
+        for handler in self._handlers.get(channel, []):
+            try:
+                handler(payload)
+            except Exception as e:
+                logger.error(f"Notification handler for {channel} failed: {str(e)}")
+
+    async def _listen_once(self, first: bool):
+        async with self.engine.connect() as conn:
+            raw = await conn.get_raw_connection()
+            driver_connection = raw.driver_connection
+            closed = asyncio.Event()
+            driver_connection.add_termination_listener(lambda _: closed.set())
+            for channel in self._handlers:
+                await driver_connection.add_listener(
+                    channel, lambda _conn, _pid, channel, payload: self._dispatch(channel, payload)
+                )
+            logger.info(f"Listening for notifications on: {', '.join(self._handlers)}")
+            if not first:
+                for channel in self._handlers:
+                    self._dispatch(channel, None)
+            await closed.wait()
+
+    async def _run(self):
+        first = True
+        while True:
+            try:
+                await self._listen_once(first)
+                logger.warning("Notification connection closed, reconnecting")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Notification listener error: {str(e)}")
+            first = False
+            await asyncio.sleep(self.reconnect_delay)
+
+    def start(self):
+        if self.engine.dialect.name != "postgresql" or not self._handlers:
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
@@ -0,0 +1,47 @@
+import base64
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import Select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# Response header carrying the cursor for the next (older) page; absent on the last page
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    raw = f"{created_at.isoformat()}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, row_id = base64.urlsafe_b64decode(padded).decode().rsplit("|", 1)
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+async def keyset_page(
+    db: AsyncSession,
+    query: Select,
+    created_at_column,
+    id_column,
+    limit: int,
+    before: Optional[str] = None
+) -> Tuple[List, Optional[str]]:
+    """Fetch one newest-first page of ``query`` ordered by (created_at, id).
+
+    Seeks past the cursor instead of using OFFSET, so every page costs the same
+    index range scan however deep the client pages.
+    """
+    if before:
+        created_at, row_id = decode_cursor(before)
+        query = query.filter(tuple_(created_at_column, id_column) < tuple_(created_at, row_id))
+    rows = (await db.scalars(
+        query.order_by(created_at_column.desc(), id_column.desc()).limit(limit + 1)
+    )).all()
+    if len(rows) <= limit:
+        return list(rows), None
+    rows = rows[:limit]
+    last = rows[-1]
+    return list(rows), encode_cursor(getattr(last, created_at_column.key), getattr(last, id_column.key))
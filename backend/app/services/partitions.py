@@ -0,0 +1,332 @@
+import glob
+import logging
+import os
+import re
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from sqlalchemy import Engine, func, inspect, insert, select, text, update
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from ..core.config import Settings
+from ..models.models import Conversation, MessageArchive, MessageArchiveSegment
+from .message_archive import ARCHIVE_FIELDS, compact_archive, write_archive
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PARTITION = "messages_default"
+
+DETACH_LOCK_TIMEOUT_MS = 2000
+DETACH_ATTEMPTS = 5
+
+@dataclass
+class Partition:
+    name: str
+    start: Optional[datetime]  # None for MINVALUE (the pre-partitioning history)
+    end: Optional[datetime]  # None for the default partition
+
+    @property
+    def is_default(self) -> bool:
+        return self.end is None
+
+def month_start(moment: datetime, months: int = 0) -> datetime:
+    """First instant (UTC) of the month ``months`` after the one containing ``moment``."""
+    moment = moment.astimezone(timezone.utc)
+    month = moment.month - 1 + months
+    return datetime(moment.year + month // 12, month % 12 + 1, 1, tzinfo=timezone.utc)
+
+def _parse_bound(value: str) -> Optional[datetime]:
+    if value == "MINVALUE":
+        return None
+    # Rendered in the session time zone, which is set to UTC, e.g. '2026-11-01 00:00:00+00'
+    value = re.sub(r"([+-]\d\d)$", r"\1:00", value.strip("'"))
+    return datetime.fromisoformat(value)
+
+class MessagePartitions:
+    """Monthly range partitions of ``messages`` and their archival (Postgres only).
+
+    ``ensure`` creates partitions ahead of time, so inserts never land in the
+    default partition; rows that did are moved into the new partition. ``archive``
+    writes each partition entirely older than ``archive_after_months`` to a gzip
+    JSONL file, registers it with a per-conversation index, then detaches
+    and drops it. Every step can be re-run after a crash: a
+    registered archive is not written again, and a detached partition is only
+    dropped once its row count matches the archive. ``compact`` rewrites archive
+    files that still hold the messages of deleted conversations.
+    """
+
+    def __init__(
+        self,
+        engine: Engine,
+        archive_dir: str = "archive",
+        premake_months: int = 3,
+        archive_after_months: int = 12,
+        batch_size: int = 5000,
+    ):
+        self.engine = engine
+        self.archive_dir = archive_dir
+        self.premake_months = premake_months
+        self.archive_after_months = archive_after_months
+        self.batch_size = batch_size
+
+    @classmethod
+    def from_settings(cls, settings: Settings, engine: Engine) -> "MessagePartitions":
+        return cls(
+            engine,
+            archive_dir=settings.MESSAGE_ARCHIVE_DIR,
+            premake_months=settings.MESSAGE_PARTITION_PREMAKE_MONTHS,
+            archive_after_months=settings.MESSAGE_ARCHIVE_AFTER_MONTHS,
+            batch_size=settings.MESSAGE_ARCHIVE_BATCH_SIZE,
+        )
+
+    def partitions(self) -> List[Partition]:
+        with self.engine.connect() as conn:
+            conn.execute(text("SET TIME ZONE 'UTC'"))
+            rows = conn.execute(text(
+                "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) "
+                "FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+                "WHERE i.inhparent = 'messages'::regclass"
+            )).all()
+        partitions = []
+        for name, bound in rows:
+            match = re.fullmatch(r"FOR VALUES FROM \((.+)\) TO \((.+)\)", bound)
+            if match is None:
+                partitions.append(Partition(name, None, None))
+            else:
+                partitions.append(Partition(name, _parse_bound(match[1]), _parse_bound(match[2])))
+        return sorted(partitions, key=lambda p: (p.is_default, p.end or datetime.max.replace(tzinfo=timezone.utc)))
+
+    def ensure(self, now: Optional[datetime] = None, dry_run: bool = False) -> List[str]:
+        """Create the monthly partitions from ``now``'s month to ``premake_months`` ahead; returns the names created."""
+        now = now or datetime.now(timezone.utc)
+        ranges = [p for p in self.partitions() if not p.is_default]
+        created = []
+        for months in range(self.premake_months + 1):
+            start, end = month_start(now, months), month_start(now, months + 1)
+            overlapping = [p for p in ranges if (p.start is None or p.start < end) and p.end > start]
+            if overlapping:
+                if not any((p.start is None or p.start <= start) and p.end >= end for p in overlapping):
+                    logger.warning(f"{start:%Y-%m} is only partly covered by {overlapping[0].name}; not creating it")
+                continue
+            name = f"messages_p{start:%Y_%m}"
+            created.append(name)
+            if not dry_run:
+                self._create(name, start, end)
+        return created
+
+    def _create(self, name: str, start: datetime, end: datetime):
+        bounds = f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+        in_range = {"start": start, "end": end}
+        with self.engine.begin() as conn:
+            has_default = conn.scalar(text("SELECT to_regclass(:name) IS NOT NULL"), {"name": DEFAULT_PARTITION})
+            stray = has_default and conn.scalar(text(
+                f"SELECT count(*) FROM {DEFAULT_PARTITION} WHERE created_at >= :start AND created_at < :end"
+            ), in_range)
+            if not stray:
+                conn.execute(text(f"CREATE TABLE {name} PARTITION OF messages {bounds}"))
+                logger.info(f"Created partition {name}")
+                return
+            # Postgres refuses a partition whose rows already sit in the default one: move them over
+            conn.execute(text(f"ALTER TABLE messages DETACH PARTITION {DEFAULT_PARTITION}"))
+            conn.execute(text(f"CREATE TABLE {name} PARTITION OF messages {bounds}"))
+            conn.execute(text(
+                f"INSERT INTO messages SELECT * FROM {DEFAULT_PARTITION} WHERE created_at >= :start AND created_at < :end"
+            ), in_range)
+            conn.execute(text(
+                f"DELETE FROM {DEFAULT_PARTITION} WHERE created_at >= :start AND created_at < :end"
+            ), in_range)
+            conn.execute(text(f"ALTER TABLE messages ATTACH PARTITION {DEFAULT_PARTITION} DEFAULT"))
+        logger.warning(f"Created partition {name}, moving {stray} rows out of {DEFAULT_PARTITION}")
+
+    def archive(self, now: Optional[datetime] = None, dry_run: bool = False) -> List[str]:
+        """Archive and drop the partitions that ended ``archive_after_months`` or more before ``now``'s month."""
+        if self.archive_after_months <= 0:
+            return []
+        cutoff = month_start(now or datetime.now(timezone.utc), -self.archive_after_months)
+        attached = self.partitions()
+        due = [p for p in attached if not p.is_default and p.end <= cutoff]
+        if not dry_run:
+            for partition in due:
+                self._archive(partition)
+            # Left over from a run that stopped between detaching and dropping
+            for name in self._detached_archives({p.name for p in attached}):
+                self._drop(name)
+        return [p.name for p in due]
+
+    def compact(self, dry_run: bool = False) -> List[str]:
+        """Rewrite the archive files holding conversations that were deleted; returns their partitions.
+
+        Deleting a conversation cascades to its segment rows, so an archive whose
+        segments add up to fewer messages than its file holds has content left
+        to purge. The file is rewritten with only the remaining gzip members,
+        under a new name so readers never see offsets and file disagree, and
+        the old file is removed once the new offsets are committed.
+        """
+        with Session(self.engine) as db:
+            remaining = (
+                select(func.coalesce(func.sum(MessageArchiveSegment.messages), 0))
+                .filter(MessageArchiveSegment.archive_id == MessageArchive.id)
+                .scalar_subquery()
+            )
+            stale = db.execute(
+                select(MessageArchive.id, MessageArchive.partition).filter(MessageArchive.messages > remaining)
+            ).all()
+        # A partition still detached but not dropped is checked against the archive's message count
+        with self.engine.connect() as conn:
+            stale = [archive for archive in stale if not inspect(conn).has_table(archive.partition)]
+        if not dry_run:
+            for archive in stale:
+                self._compact(archive.id)
+        return [archive.partition for archive in stale]
+
+    def _compact(self, archive_id: int):
+        with Session(self.engine) as db:
+            partition, old_relative = db.execute(
+                select(MessageArchive.partition, MessageArchive.path).filter(MessageArchive.id == archive_id)
+            ).one()
+            segments = db.execute(
+                select(
+                    MessageArchiveSegment.conversation_id,
+                    MessageArchiveSegment.byte_offset,
+                    MessageArchiveSegment.byte_length,
+                    MessageArchiveSegment.messages,
+                )
+                .filter(MessageArchiveSegment.archive_id == archive_id)
+                .order_by(MessageArchiveSegment.byte_offset)
+            ).all()
+            source = os.path.join(self.archive_dir, old_relative)
+            # Rewrites left behind by a run that stopped before committing
+            for leftover in glob.glob(os.path.join(self.archive_dir, "messages", f"{partition}-*.jsonl.gz")):
+                if os.path.abspath(leftover) != os.path.abspath(source):
+                    os.remove(leftover)
+
+            relative = os.path.join("messages", f"{partition}-{uuid.uuid4().hex[:12]}.jsonl.gz")
+            written = compact_archive(
+                source,
+                os.path.join(self.archive_dir, relative),
+                [(segment.byte_offset, segment.byte_length) for segment in segments],
+            )
+            for segment, byte_offset in zip(segments, written.offsets):
+                # Matches no row if the conversation was deleted meanwhile
+                db.execute(
+                    update(MessageArchiveSegment)
+                    .filter(
+                        MessageArchiveSegment.archive_id == archive_id,
+                        MessageArchiveSegment.conversation_id == segment.conversation_id,
+                    )
+                    .values(byte_offset=byte_offset)
+                )
+            # Such a conversation is still counted here, so the next run purges it
+            db.execute(
+                update(MessageArchive)
+                .filter(MessageArchive.id == archive_id)
+                .values(
+                    path=relative,
+                    messages=sum(segment.messages for segment in segments),
+                    bytes=written.bytes,
+                    sha256=written.sha256,
+                )
+            )
+            db.commit()
+        os.remove(source)
+        logger.info(f"Compacted the archive of {partition}: {len(segments)} conversations kept ({written.bytes} bytes)")
+
+    def _archive(self, partition: Partition):
+        with Session(self.engine) as db:
+            registered = db.scalar(select(MessageArchive.id).filter(MessageArchive.partition == partition.name))
+        if registered is None:
+            self._write(partition)
+        self._detach(partition.name)
+        self._drop(partition.name)
+
+    def _detach(self, name: str):
+        # Not CONCURRENTLY, which Postgres refuses while a default partition exists. The plain
+        # detach is instant but needs an exclusive lock on messages: wait for it only briefly,
+        # so chat inserts queued behind it are not held up, and try again later
+        for attempt in range(1, DETACH_ATTEMPTS + 1):
+            try:
+                with self.engine.begin() as conn:
+                    conn.execute(text(f"SET LOCAL lock_timeout = '{DETACH_LOCK_TIMEOUT_MS}ms'"))
+                    conn.execute(text(f"ALTER TABLE messages DETACH PARTITION {name}"))
+                logger.info(f"Detached partition {name}")
+                return
+            except OperationalError as e:
+                if "lock timeout" not in str(e.orig) or attempt == DETACH_ATTEMPTS:
+                    raise
+                logger.warning(f"Detaching {name} timed out waiting for its lock (attempt {attempt}), retrying")
+                time.sleep(attempt)
+
+    def _write(self, partition: Partition):
+        relative = os.path.join("messages", f"{partition.name}.jsonl.gz")
+        path = os.path.join(self.archive_dir, relative)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        logger.info(f"Archiving partition {partition.name} to {path}")
+
+        with self.engine.connect() as conn:
+            conn = conn.execution_options(isolation_level="REPEATABLE READ", yield_per=self.batch_size)
+            rows = conn.execute(text(
+                f"SELECT {', '.join(ARCHIVE_FIELDS)} FROM {partition.name} ORDER BY conversation_id, created_at, id"
+            ))
+            written = write_archive(path, (tuple(row) for row in rows))
+
+        with Session(self.engine) as db:
+            archive = MessageArchive(
+                partition=partition.name,
+                range_start=partition.start,
+                range_end=partition.end,
+                path=relative,
+                messages=written.messages,
+                bytes=written.bytes,
+                sha256=written.sha256,
+            )
+            db.add(archive)
+            db.flush()
+            # Conversations deleted since the file was written lose their segment; KEY SHARE keeps the rest
+            live = set(db.scalars(
+                select(Conversation.id)
+                .filter(Conversation.id.in_({segment.conversation_id for segment in written.segments}))
+                .with_for_update(key_share=True)
+            ))
+            segments = [segment for segment in written.segments if segment.conversation_id in live]
+            if segments:
+                db.execute(insert(MessageArchiveSegment), [
+                    {**segment.__dict__, "archive_id": archive.id} for segment in segments
+                ])
+                db.execute(
+                    update(Conversation)
+                    .filter(Conversation.id == MessageArchiveSegment.conversation_id)
+                    .filter(MessageArchiveSegment.archive_id == archive.id)
+                    .values(archived_messages=Conversation.archived_messages + MessageArchiveSegment.messages)
+                )
+            db.commit()
+        logger.info(f"Archived {written.messages} messages of {partition.name} ({written.bytes} bytes)")
+
+    def _detached_archives(self, attached: set) -> List[str]:
+        with self.engine.connect() as conn:
+            names = conn.scalars(select(MessageArchive.partition)).all()
+            return [
+                name for name in names
+                if name not in attached and conn.scalar(text("SELECT to_regclass(:name) IS NOT NULL"), {"name": name})
+            ]
+
+    def _drop(self, name: str):
+        with self.engine.begin() as conn:
+            archive = conn.execute(
+                select(MessageArchive.messages, MessageArchive.bytes, MessageArchive.path)
+                .filter(MessageArchive.partition == name)
+            ).one()
+            path = os.path.join(self.archive_dir, archive.path)
+            if not os.path.exists(path) or os.path.getsize(path) != archive.bytes:
+                raise RuntimeError(f"Archive {path} of partition {name} is missing or truncated; not dropping it")
+            remaining = conn.scalar(text(f"SELECT count(*) FROM {name}"))
+            # Fewer rows is fine (conversations deleted meanwhile); more means rows the archive lacks
+            if remaining > archive.messages:
+                raise RuntimeError(
+                    f"Detached partition {name} has {remaining} rows but its archive only {archive.messages}; not dropping it"
+                )
+            conn.execute(text(f"DROP TABLE {name}"))
+        logger.info(f"Dropped partition {name}")
@@ -0,0 +1,104 @@
+import asyncio
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Optional, Tuple
+
+from ..core.config import Settings
+
+if TYPE_CHECKING:
+    from passlib.context import CryptContext
+
+logger = logging.getLogger(__name__)
+
+class PasswordHasherBusy(Exception):
+    """More password operations are queued than the pool accepts."""
+
+class PasswordHasher:
+    """bcrypt hashing and verification on a small dedicated thread pool.
+
+    bcrypt releases the GIL while it works, so threads give real parallelism
+    and the event loop keeps serving other requests during a login burst. The
+    pool is separate from the default executor so password work cannot starve
+    other offloaded calls, and at most ``max_queue`` operations wait for it;
+    beyond that callers get ``PasswordHasherBusy`` instead of queueing forever.
+
+    Hashes with a cost other than ``rounds`` are reported by ``verify_and_update``
+    so callers can rehash on a successful login.
+
+    Worker threads run at a lower scheduling priority (``niceness``, Linux only)
+    so that when cores are scarce the event loop thread wins the CPU and chat
+    latency holds while logins queue up.
+    """
+
+    def __init__(self, rounds: int = 12, workers: int = 2, max_queue: int = 64, niceness: int = 10):
+        self.rounds = rounds
+        self.workers = workers
+        self.max_queue = max_queue
+        self.niceness = niceness
+        self._context: Optional["CryptContext"] = None
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers,
+            thread_name_prefix="password-hasher",
+            initializer=self._lower_thread_priority
+        )
+        self._pending = 0
+
+    @classmethod
+    def from_settings(cls, settings: Settings) -> "PasswordHasher":
+        return cls(
+            rounds=settings.BCRYPT_ROUNDS,
+            workers=settings.PASSWORD_HASH_WORKERS,
+            max_queue=settings.PASSWORD_HASH_MAX_QUEUE,
+            niceness=settings.PASSWORD_HASH_NICENESS,
+        )
+
+    @property
+    def context(self) -> "CryptContext":
+        # passlib and its bcrypt backend load on the first login rather than at startup
+        if self._context is None:
+            from passlib.context import CryptContext
+
+            self._context = CryptContext(
+                schemes=["bcrypt"],
+                deprecated="auto",
+                bcrypt__default_rounds=self.rounds,
+                # Any other cost, higher or lower, is flagged for a rehash
+                bcrypt__min_rounds=self.rounds,
+                bcrypt__max_rounds=self.rounds,
+            )
+        return self._context
+
+    def _lower_thread_priority(self):
+        if self.niceness <= 0:
+            return
+        try:
+            # On Linux the nice value is per thread, addressed by its native id
+            thread_id = threading.get_native_id()
+            os.setpriority(os.PRIO_PROCESS, thread_id, os.getpriority(os.PRIO_PROCESS, thread_id) + self.niceness)
+        except (AttributeError, OSError) as e:
+            logger.debug(f"Could not lower password hasher thread priority: {str(e)}")
+
+    async def _run(self, fn, *args):
+        if self._pending >= self.workers + self.max_queue:
+            raise PasswordHasherBusy()
+        self._pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+        finally:
+            self._pending -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run(self.context.hash, password)
+
+    async def verify_and_update(self, password: str, hashed_password: Optional[str]) -> Tuple[bool, Optional[str]]:
+        """Returns whether ``password`` matches, plus a new hash if the stored one should be replaced."""
+        if hashed_password is None:
+            # Same cost as a real check, so response times do not reveal which emails exist
+            await self._run(self.context.dummy_verify)
+            return False, None
+        return await self._run(self.context.verify_and_update, password, hashed_password)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,38 @@
+import logging
+from typing import Optional
+
+from ..core.config import Settings
+from ..models.models import User
+from .cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# NOTIFY channel carrying the id of a user whose cached principal must be dropped
+PRINCIPAL_CHANNEL = "principal_changed"
+
+class PrincipalCache(TTLCache):
+    """Authenticated users keyed by id, so a valid token costs no database round-trip.
+
+    Entries are detached ``User`` instances and must be treated as read-only;
+    code that modifies a user loads it into its own session first.
+    """
+
+    @classmethod
+    def from_settings(cls, settings: Settings) -> "PrincipalCache":
+        return cls(
+            max_size=settings.PRINCIPAL_CACHE_MAX_SIZE,
+            ttl_seconds=settings.PRINCIPAL_CACHE_TTL_SECONDS,
+        )
+
+    def get_user(self, user_id: int) -> Optional[User]:
+        return self.get(user_id)
+
+    def set_user(self, user: User):
+        self.set(user.id, user)
+
+    def invalidate(self, payload: Optional[str] = None):
+        """Notification handler: drop one user, or everything if the payload is unknown."""
+        if payload and payload.isdigit():
+            self.pop(int(payload))
+        else:
+            self.clear()
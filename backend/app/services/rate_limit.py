@@ -0,0 +1,173 @@
+import logging
+import math
+import time
+from collections import OrderedDict
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from ..core.config import Settings
+from ..core.metrics import RATE_LIMITED
+from ..models.models import RateLimitBucket, TokenUsage
+
+logger = logging.getLogger(__name__)
+
+class RateLimited(Exception):
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+class MemoryRateLimitStore:
+    """Buckets and daily usage in this worker process; each worker enforces the limits on its own.
+
+    Not thread-safe; it is meant to be used from a single event loop. The
+    least recently seen users are forgotten past ``max_users``, which only
+    ever refills their bucket early.
+    """
+
+    def __init__(self, max_users: int = 100000):
+        self.max_users = max_users
+        self._buckets: "OrderedDict[int, Tuple[float, float]]" = OrderedDict()  # Tokens, monotonic update time
+        self._usage_day: Optional[date] = None
+        self._usage: Dict[int, int] = {}
+
+    async def acquire(self, user_id: int, day: date, rate: float, burst: int) -> Tuple[float, int]:
+        """Take one request from the user's bucket; returns (seconds until one is available, tokens used on ``day``)."""
+        retry_after = 0.0
+        if rate > 0:
+            now = time.monotonic()
+            tokens, updated = self._buckets.pop(user_id, (burst, now))
+            tokens = min(burst, tokens + (now - updated) * rate)
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                retry_after = (1 - tokens) / rate
+            self._buckets[user_id] = (tokens, now)
+            while len(self._buckets) > self.max_users:
+                self._buckets.popitem(last=False)
+        return retry_after, self._usage.get(user_id, 0) if day == self._usage_day else 0
+
+    async def charge(self, user_id: int, day: date, tokens: int):
+        if day != self._usage_day:
+            self._usage_day = day
+            self._usage = {}
+        self._usage[user_id] = self._usage.get(user_id, 0) + tokens
+
+class PostgresRateLimitStore:
+    """Buckets and daily usage in Postgres, shared by every worker.
+
+    A bucket is refilled and taken from in one conditional upsert, so
+    concurrent requests of the same user serialize on its row instead of
+    racing. Costs one short transaction per chat request.
+    """
+
+    def __init__(self, session_factory: async_sessionmaker):
+        self.session_factory = session_factory
+
+    async def acquire(self, user_id: int, day: date, rate: float, burst: int) -> Tuple[float, int]:
+        async with self.session_factory() as db:
+            retry_after = 0.0
+            if rate > 0:
+                # Database time, so workers with drifting clocks agree on the refill
+                elapsed = func.extract("epoch", func.clock_timestamp() - RateLimitBucket.updated_at)
+                refilled = func.least(burst, RateLimitBucket.tokens + elapsed * rate)
+                taken = await db.scalar(
+                    insert(RateLimitBucket)
+                    .values(user_id=user_id, tokens=burst - 1, updated_at=func.clock_timestamp())
+                    .on_conflict_do_update(
+                        index_elements=[RateLimitBucket.user_id],
+                        set_={"tokens": refilled - 1, "updated_at": func.clock_timestamp()},
+                        where=refilled >= 1,
+                    )
+                    .returning(RateLimitBucket.tokens)
+                )
+                if taken is None:
+                    # Left untouched, so the refill keeps accruing from the last accepted request
+                    tokens = await db.scalar(
+                        select(refilled).filter(RateLimitBucket.user_id == user_id)
+                    )
+                    retry_after = (1 - float(tokens)) / rate
+            used = await db.scalar(
+                select(TokenUsage.tokens).filter(TokenUsage.user_id == user_id, TokenUsage.day == day)
+            )
+            await db.commit()
+        return retry_after, used or 0
+
+    async def charge(self, user_id: int, day: date, tokens: int):
+        async with self.session_factory() as db:
+            await db.execute(
+                insert(TokenUsage)
+                .values(user_id=user_id, day=day, tokens=tokens)
+                .on_conflict_do_update(
+                    index_elements=[TokenUsage.user_id, TokenUsage.day],
+                    set_={"tokens": TokenUsage.tokens + tokens},
+                )
+            )
+            await db.commit()
+
+class RateLimiter:
+    """Per-user request rate (token bucket) and daily LLM token quota for the chat endpoints.
+
+    ``check`` runs before a turn and ``charge`` after it with the provider's
+    ``usage.total_tokens``. The quota is checked against what was already
+    charged, so the turn that crosses it still completes; the next one is
+    refused until the UTC day ends.
+    """
+
+    def __init__(
+        self,
+        store,
+        requests_per_minute: float = 20,
+        burst: int = 10,
+        daily_tokens: int = 200000,
+    ):
+        self.store = store
+        self.rate = requests_per_minute / 60
+        self.burst = burst
+        self.daily_tokens = daily_tokens
+
+    @classmethod
+    def from_settings(cls, settings: Settings, session_factory: async_sessionmaker) -> "RateLimiter":
+        if settings.RATE_LIMIT_STORE == "postgres":
+            store = PostgresRateLimitStore(session_factory)
+        elif settings.RATE_LIMIT_STORE == "memory":
+            store = MemoryRateLimitStore(max_users=settings.RATE_LIMIT_MAX_TRACKED_USERS)
+        else:
+            raise ValueError(f"Unknown RATE_LIMIT_STORE {settings.RATE_LIMIT_STORE!r}")
+        return cls(
+            store,
+            requests_per_minute=settings.RATE_LIMIT_REQUESTS_PER_MINUTE,
+            burst=settings.RATE_LIMIT_BURST,
+            daily_tokens=settings.DAILY_TOKEN_QUOTA,
+        )
+
+    def _today(self) -> date:
+        return datetime.now(timezone.utc).date()
+
+    async def check(self, user_id: int):
+        """Raise ``RateLimited`` if the user must wait before sending another message."""
+        today = self._today()
+        retry_after, used = await self.store.acquire(user_id, today, self.rate, self.burst)
+        if self.daily_tokens > 0 and used >= self.daily_tokens:
+            RATE_LIMITED.labels("quota").inc()
+            tomorrow = datetime.combine(today + timedelta(days=1), datetime.min.time(), timezone.utc)
+            raise RateLimited("Daily token quota exhausted", (tomorrow - datetime.now(timezone.utc)).total_seconds())
+        if retry_after > 0:
+            RATE_LIMITED.labels("rate").inc()
+            raise RateLimited("Too many messages, slow down", retry_after)
+
+    async def charge(self, user_id: int, tokens: int):
+        """Count a turn's tokens against the user's quota; failures are logged, never raised."""
+        if self.daily_tokens <= 0 or tokens <= 0:
+            return
+        try:
+            await self.store.charge(user_id, self._today(), tokens)
+        except Exception as e:
+            logger.error(f"Error charging {tokens} tokens to user {user_id}: {str(e)}")
+
+def retry_after_header(retry_after: float) -> Dict[str, str]:
+    return {"Retry-After": str(max(1, math.ceil(retry_after)))}
@@ -0,0 +1,126 @@
+import base64
+import html
+from typing import List, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import Float, Select, func, literal, literal_column, select, tuple_
+from sqlalchemy.dialects.postgresql import TSQUERY, TSVECTOR
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models.models import Conversation, Message
+
+# Text search configuration of messages.content_tsv (see the add_message_search migration)
+SEARCH_CONFIG = "english"
+
+# Kept out of the Message model so chat reads and writes never carry it; a trigger maintains it
+CONTENT_TSV = literal_column("messages.content_tsv", TSVECTOR)
+
+def owner_query(user_id: int):
+    # Matches the 'owner <user id>' lexeme the trigger adds to every message's content_tsv
+    return literal(f"'owner {int(user_id)}'").cast(TSQUERY)
+
+HEADLINE_OPTIONS = "StartSel=<mark>, StopSel=</mark>, MaxWords=35, MinWords=15, MaxFragments=2, FragmentDelimiter= … "
+
+def encode_search_cursor(rank: float, message_id: int) -> str:
+    raw = f"{rank!r}|{message_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_search_cursor(cursor: str) -> Tuple[float, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        rank, message_id = base64.urlsafe_b64decode(padded).decode().rsplit("|", 1)
+        return float(rank), int(message_id)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def _escape_html(content):
+    # Snippets are HTML with only the <mark> tags unescaped, so message text cannot inject markup
+    return func.replace(func.replace(func.replace(content, "&", "&amp;"), "<", "&lt;"), ">", "&gt;")
+
+async def search_messages(
+    db: AsyncSession,
+    user_id: int,
+    query: str,
+    limit: int,
+    before: Optional[str] = None
+) -> Tuple[List, Optional[str]]:
+    """One page of the user's messages matching ``query``, best match first.
+
+    ``query`` uses web search syntax (quoted phrases, ``or``, ``-excluded``).
+    Matches come from the GIN index on ``messages.content_tsv``, scoped to the
+    user through the owner lexeme in each vector, and are ranked with
+    ``ts_rank_cd``; highlighted snippets are only built for the rows on
+    the page. Pages continue from a (rank, id) cursor.
+
+    Without Postgres (SQLite in development) this falls back to a substring
+    match, newest first and without highlighting.
+    """
+    cursor = decode_search_cursor(before) if before else None
+    if db.bind.dialect.name != "postgresql":
+        return await _search_messages_like(db, user_id, query, limit, cursor)
+    rows = (await db.execute(search_query(user_id, query, limit + 1, cursor))).all()
+    return _page(rows, limit)
+
+def search_query(user_id: int, query: str, limit: int, cursor: Optional[Tuple[float, int]] = None) -> Select:
+    """Postgres statement for up to ``limit`` matches after ``cursor``, with rank and snippet."""
+    ts_query = func.websearch_to_tsquery(SEARCH_CONFIG, query)
+    rank = func.ts_rank_cd(CONTENT_TSV, ts_query)
+    matches = select(
+        Message.id,
+        Message.conversation_id,
+        Message.is_ai,
+        Message.created_at,
+        Message.content,
+        rank.label("rank")
+    ).filter(
+        # One GIN lookup intersects the user's messages with the query terms; user_id rechecks ownership
+        CONTENT_TSV.op("@@")(ts_query.op("&&")(owner_query(user_id))),
+        Message.user_id == user_id,
+        # Only stop words: an empty query ANDed with the owner would match everything
+        func.numnode(ts_query) > 0
+    )
+    if cursor is not None:
+        matches = matches.filter(tuple_(rank, Message.id) < tuple_(literal(cursor[0], Float), cursor[1]))
+    matches = matches.order_by(rank.desc(), Message.id.desc()).limit(limit).subquery()
+
+    return select(
+        matches.c.id,
+        matches.c.conversation_id,
+        matches.c.is_ai,
+        matches.c.created_at,
+        matches.c.rank,
+        func.ts_headline(SEARCH_CONFIG, _escape_html(matches.c.content), ts_query, HEADLINE_OPTIONS).label("snippet")
+    ).order_by(matches.c.rank.desc(), matches.c.id.desc())
+
+async def _search_messages_like(
+    db: AsyncSession,
+    user_id: int,
+    query: str,
+    limit: int,
+    cursor: Optional[Tuple[float, int]]
+) -> Tuple[List, Optional[str]]:
+    pattern = "%" + query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+    matches = select(
+        Message.id,
+        Message.conversation_id,
+        Message.is_ai,
+        Message.created_at,
+        literal(0.0, Float).label("rank"),
+        Message.content.label("snippet")
+    ).join(
+        Conversation, Conversation.id == Message.conversation_id
+    ).filter(
+        Conversation.user_id == user_id,
+        Message.content.ilike(pattern, escape="\\")
+    )
+    if cursor is not None:
+        matches = matches.filter(Message.id < cursor[1])
+    rows = (await db.execute(matches.order_by(Message.id.desc()).limit(limit + 1))).all()
+    rows, next_cursor = _page(rows, limit)
+    return [{**row._asdict(), "snippet": html.escape(row.snippet)} for row in rows], next_cursor
+
+def _page(rows, limit: int) -> Tuple[List, Optional[str]]:
+    if len(rows) <= limit:
+        return list(rows), None
+    rows = rows[:limit]
+    return list(rows), encode_search_cursor(rows[-1].rank, rows[-1].id)
@@ -0,0 +1,245 @@
+import importlib
+import json
+import logging
+import os
+import re
+import time
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, List, Optional
+
+import anyio
+import numpy as np
+
+from ..core.config import Settings
+
+logger = logging.getLogger(__name__)
+
+# Maps a batch of texts to a (len(texts), dimensions) float array
+Embedder = Callable[[List[str]], np.ndarray]
+
+WORD_PATTERN = re.compile(r"\w+")
+
+class HashingEmbedder:
+    """Feature-hashed bag of words and word bigrams.
+
+    Runs locally with nothing beyond NumPy and catches the near-verbatim repeats
+    ("Should I buy BTC now?" / "should i buy btc now") that make up most duplicate
+    traffic. Hashes are stable across processes, so persisted vectors stay valid.
+    """
+
+    def __init__(self, dimensions: int = 512):
+        self.dimensions = dimensions
+
+    def __call__(self, texts: List[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            words = WORD_PATTERN.findall(text.lower())
+            features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+            for feature in features:
+                digest = zlib.crc32(feature.encode())
+                vectors[row, digest % self.dimensions] += 1.0 if digest & 0x80000000 else -1.0
+        return vectors
+
+def load_embedder(spec: str, dimensions: int) -> Embedder:
+    """``hashing`` or an import path ``package.module:attribute`` naming an embedder callable."""
+    if spec == "hashing":
+        return HashingEmbedder(dimensions)
+    module_name, _, attribute = spec.partition(":")
+    if not attribute:
+        raise ValueError(f"Embedder must be 'hashing' or 'module:attribute', got {spec!r}")
+    return getattr(importlib.import_module(module_name), attribute)
+
+def standalone_prompt(messages: List[dict]) -> Optional[str]:
+    """The user's question if the prompt carries no conversation history, else None.
+
+    Answers that depend on earlier turns are never shared, so only the opening
+    message of a conversation is cacheable.
+    """
+    system = [m for m in messages if m["role"] == "system"]
+    turns = [m for m in messages if m["role"] != "system"]
+    if len(system) == 1 and len(turns) == 1 and turns[0]["role"] == "user":
+        return turns[0]["content"]
+    return None
+
+@dataclass
+class CacheEntry:
+    namespace: str
+    prompt: str
+    response: str
+    created_at: float
+
+@dataclass
+class CacheLookup:
+    """Result of a lookup; pass it back to ``SemanticCache.store`` on a miss."""
+    namespace: str
+    prompt: str
+    vector: np.ndarray
+    response: Optional[str] = None
+
+class SemanticCache:
+    """Completion cache matched on prompt similarity rather than exact text.
+
+    Prompt embeddings live in one preallocated, L2-normalized NumPy matrix, so a
+    lookup is a single matrix-vector product followed by a top-k partition. The
+    top-k candidates are checked in order of similarity for the namespace (the
+    model id, so base and fine-tuned answers never mix), expiry and the
+    similarity threshold. Full caches evict the least recently used entry.
+
+    Not thread-safe; lookups and stores run on the event loop, only embedding
+    is pushed to a worker thread.
+    """
+
+    def __init__(
+        self,
+        embedder: Embedder,
+        max_entries: int = 10000,
+        ttl_seconds: float = 86400,
+        similarity_threshold: float = 0.92,
+        top_k: int = 5,
+        path: Optional[str] = None,
+    ):
+        self.embedder = embedder
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.top_k = top_k
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._vectors: Optional[np.ndarray] = None  # Allocated once the embedding size is known
+        self._entries: List[Optional[CacheEntry]] = [None] * max_entries
+        self._free = list(range(max_entries - 1, -1, -1))
+        self._lru: "OrderedDict[int, None]" = OrderedDict()
+
+    @classmethod
+    def from_settings(cls, settings: Settings) -> "SemanticCache":
+        return cls(
+            embedder=load_embedder(settings.SEMANTIC_CACHE_EMBEDDER, settings.SEMANTIC_CACHE_DIMENSIONS),
+            max_entries=settings.SEMANTIC_CACHE_MAX_ENTRIES,
+            ttl_seconds=settings.SEMANTIC_CACHE_TTL_SECONDS,
+            similarity_threshold=settings.SEMANTIC_CACHE_SIMILARITY_THRESHOLD,
+            top_k=settings.SEMANTIC_CACHE_TOP_K,
+            path=settings.SEMANTIC_CACHE_PATH,
+        )
+
+    def __len__(self) -> int:
+        return len(self._lru)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+        }
+
+    def _normalize(self, vectors: np.ndarray) -> np.ndarray:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+    async def embed(self, text: str) -> np.ndarray:
+        vectors = await anyio.to_thread.run_sync(self.embedder, [text])
+        return self._normalize(vectors)[0]
+
+    async def lookup(self, namespace: str, messages: List[dict]) -> Optional[CacheLookup]:
+        """Find a cached reply for ``messages``; None if the prompt is not cacheable at all."""
+        prompt = standalone_prompt(messages)
+        if prompt is None:
+            return None
+        lookup = CacheLookup(namespace=namespace, prompt=prompt, vector=await self.embed(prompt))
+        slot = self._search(namespace, lookup.vector)
+        if slot is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self._lru.move_to_end(slot)
+            lookup.response = self._entries[slot].response
+        return lookup
+
+    def _search(self, namespace: str, vector: np.ndarray) -> Optional[int]:
+        if self._vectors is None or not self._lru:
+            return None
+        scores = self._vectors @ vector
+        k = min(self.top_k, len(scores))
+        candidates = np.argpartition(-scores, k - 1)[:k]
+        now = time.time()
+        for slot in candidates[np.argsort(-scores[candidates])]:
+            slot = int(slot)
+            if scores[slot] < self.similarity_threshold:
+                break
+            entry = self._entries[slot]
+            if entry is None or entry.namespace != namespace:
+                continue
+            if now - entry.created_at >= self.ttl_seconds:
+                self._remove(slot)
+                continue
+            return slot
+        return None
+
+    def store(self, lookup: CacheLookup, response: str):
+        self._insert(lookup.vector, CacheEntry(lookup.namespace, lookup.prompt, response, time.time()))
+
+    def _insert(self, vector: np.ndarray, entry: CacheEntry):
+        if self.max_entries <= 0:
+            return
+        if self._vectors is None:
+            self._vectors = np.zeros((self.max_entries, vector.shape[0]), dtype=np.float32)
+        if not self._free:
+            self._remove(next(iter(self._lru)))
+            self.evictions += 1
+        slot = self._free.pop()
+        self._vectors[slot] = vector
+        self._entries[slot] = entry
+        self._lru[slot] = None
+
+    def _remove(self, slot: int):
+        # Zeroed rows score 0 and can never pass the threshold
+        self._vectors[slot] = 0.0
+        self._entries[slot] = None
+        del self._lru[slot]
+        self._free.append(slot)
+
+    def save(self, path: Optional[str] = None):
+        """Write live entries, least recently used first, atomically to ``path``."""
+        path = path or self.path
+        if not path or self._vectors is None:
+            return
+        slots = list(self._lru)
+        entries = [
+            [self._entries[slot].namespace, self._entries[slot].prompt, self._entries[slot].response, self._entries[slot].created_at]
+            for slot in slots
+        ]
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez_compressed(f, vectors=self._vectors[slots], entries=np.array(json.dumps(entries)))
+        os.replace(tmp_path, path)
+        logger.info(f"Saved {len(slots)} semantic cache entries to {path}")
+
+    def load(self, path: Optional[str] = None):
+        path = path or self.path
+        if not path or not os.path.exists(path):
+            return
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                vectors = data["vectors"]
+                entries = json.loads(str(data["entries"]))
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable semantic cache file {path}: {str(e)}")
+            return
+        dimensions = self._vectors.shape[1] if self._vectors is not None else self.embedder(["dimensions"]).shape[1]
+        if vectors.ndim != 2 or vectors.shape[1] != dimensions:
+            logger.warning(f"Ignoring semantic cache file {path}: embedding size changed")
+            return
+        now = time.time()
+        loaded = 0
+        for vector, (namespace, prompt, response, created_at) in zip(vectors, entries):
+            if now - created_at < self.ttl_seconds:
+                self._insert(vector, CacheEntry(namespace, prompt, response, created_at))
+                loaded += 1
+        logger.info(f"Loaded {loaded} semantic cache entries from {path}")
@@ -0,0 +1,56 @@
+"""Background job worker, run separately from the API: ``python -m app.worker``.
+
+Any number of these can run side by side; they share the jobs table. One of
+them at a time also reconciles fine-tune statuses with the provider.
+"""
+import asyncio
+import functools
+import logging
+import signal
+
+import anyio
+
+from .core.config import settings
+from .core.logging_config import configure_logging
+from .models.database import AsyncSessionLocal, direct_async_engine, dispose_engines
+from .services.datasets import DatasetPreparer
+from .services.fine_tuning import FINE_TUNE_JOB, FineTuneReconciler, run_fine_tune_job
+from .services.jobs import JOBS_CHANNEL, JobQueue, JobWorker
+from .services.llm import LLMClient
+from .services.notifications import PostgresListener
+
+logger = logging.getLogger(__name__)
+
+async def main():
+    llm_client = LLMClient.from_settings(settings)
+    preparer = DatasetPreparer.from_settings(settings)
+    await anyio.to_thread.run_sync(preparer.tokenizer.load)
+    worker = JobWorker(
+        JobQueue.from_settings(settings, AsyncSessionLocal),
+        {FINE_TUNE_JOB: functools.partial(run_fine_tune_job, llm_client=llm_client, preparer=preparer)},
+        concurrency=settings.JOB_WORKER_CONCURRENCY,
+        poll_interval=settings.JOB_POLL_INTERVAL_SECONDS
+    )
+    reconciler = FineTuneReconciler.from_settings(settings, direct_async_engine, AsyncSessionLocal, llm_client)
+    listener = PostgresListener(direct_async_engine)
+    listener.subscribe(JOBS_CHANNEL, worker.wake)
+    listener.start()
+
+    def shutdown():
+        worker.stop()
+        reconciler.stop()
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, shutdown)
+
+    try:
+        await asyncio.gather(worker.run(), reconciler.run())
+    finally:
+        await listener.stop()
+        await llm_client.aclose()
+        await dispose_engines()
+
+if __name__ == "__main__":
+    configure_logging()
+    asyncio.run(main())
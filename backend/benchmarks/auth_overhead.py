@@ -0,0 +1,66 @@
+"""Per-request cost of authenticating a bearer token in ``get_current_user``.
+
+Compares the original email lookup (tokens without a ``uid`` claim), a primary
+key lookup with the principal cache disabled, and a warm principal cache. Each
+iteration opens a fresh session, as a request does.
+
+    python -m benchmarks.auth_overhead --iterations 2000
+"""
+import argparse
+import asyncio
+import os
+import time
+import uuid
+
+from benchmarks.common import percentile, prepare_database, sqlite_database_url
+
+async def run(iterations: int):
+    from app.dependencies import get_current_user
+    from app.models.database import AsyncSessionLocal, async_engine
+    from app.models.models import User
+    from app.routers.auth import create_access_token
+    from app.services.principals import PrincipalCache
+
+    email = f"bench-auth-{uuid.uuid4().hex[:8]}@example.com"
+    async with AsyncSessionLocal() as db:
+        user = User(email=email, hashed_password="x", full_name="Bench")
+        db.add(user)
+        await db.commit()
+        user_id = user.id
+
+    scenarios = [
+        ("email lookup (no uid claim)", create_access_token({"sub": email}), PrincipalCache(0, 0)),
+        ("id lookup, cache disabled", create_access_token({"sub": email, "uid": user_id}), PrincipalCache(0, 0)),
+        ("principal cache", create_access_token({"sub": email, "uid": user_id}), PrincipalCache(10000, 60)),
+    ]
+
+    results = []
+    for name, token, cache in scenarios:
+        timings = []
+        for i in range(iterations + 50):
+            started = time.perf_counter()
+            async with AsyncSessionLocal() as db:
+                await get_current_user(token=token, db=db, principal_cache=cache)
+            if i >= 50:  # Warm-up iterations are discarded
+                timings.append(time.perf_counter() - started)
+        results.append((name, timings))
+
+    await async_engine.dispose()
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", help="Sync SQLAlchemy URL; defaults to a temporary SQLite file")
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    database_url = args.database_url or sqlite_database_url()
+    os.environ["DATABASE_URL"] = database_url
+    prepare_database(database_url)
+
+    for name, timings in asyncio.run(run(args.iterations)):
+        mean_us = sum(timings) / len(timings) * 1e6
+        print(f"{name:>30}: mean {mean_us:8.1f} us  p50 {percentile(timings, 50) * 1e6:8.1f} us  p99 {percentile(timings, 99) * 1e6:8.1f} us")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""Concurrent chat throughput for a single API worker.
+
+Drives ``POST /api/chat/{id}/messages`` at increasing concurrency against one
+uvicorn worker backed by the stub LLM. With non-blocking LLM and database I/O,
+throughput should grow roughly linearly with concurrency until the database or
+CPU saturates; a blocking handler stays flat at about 1 / LLM latency. The mean
+wait for a database connection (from ``/metrics``) shows when the pool, rather
+than the LLM, is the limit.
+
+    python -m benchmarks.chat_concurrency --latency-ms 500 --levels 1 4 16 64
+"""
+import argparse
+import asyncio
+import json
+import time
+import uuid
+
+import httpx
+from prometheus_client.parser import text_string_to_metric_families
+
+from benchmarks.common import app_server, percentile, prepare_database, sqlite_database_url, stub_llm
+
+async def _login(client: httpx.AsyncClient) -> dict:
+    email = f"bench-{uuid.uuid4().hex[:8]}@example.com"
+    password = "benchmark-password"
+    response = await client.post("/api/auth/register", json={"email": email, "full_name": "Bench", "password": password})
+    response.raise_for_status()
+    response = await client.post("/api/auth/token", data={"username": email, "password": password})
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+async def _pool_checkouts(client: httpx.AsyncClient) -> dict:
+    """Cumulative primary pool checkout count, wait and timeouts reported by the API."""
+    totals = {"count": 0.0, "sum": 0.0, "timeouts": 0.0}
+    response = await client.get("/metrics")
+    response.raise_for_status()
+    for family in text_string_to_metric_families(response.text):
+        for sample in family.samples:
+            if sample.labels.get("pool") != "primary":
+                continue
+            if sample.name == "db_pool_checkout_seconds_count":
+                totals["count"] = sample.value
+            elif sample.name == "db_pool_checkout_seconds_sum":
+                totals["sum"] = sample.value
+            elif sample.name == "db_pool_checkout_timeouts_total":
+                totals["timeouts"] = sample.value
+    return totals
+
+async def run_level(client: httpx.AsyncClient, headers: dict, concurrency: int, requests_per_worker: int) -> dict:
+    conversation_ids = []
+    for _ in range(concurrency):
+        response = await client.post("/api/chat/conversations", headers=headers)
+        response.raise_for_status()
+        conversation_ids.append(response.json()["id"])
+
+    latencies = []
+    errors = 0
+
+    async def worker(conversation_id: int):
+        nonlocal errors
+        for i in range(requests_per_worker):
+            started = time.perf_counter()
+            response = await client.post(
+                f"/api/chat/{conversation_id}/messages",
+                json={"content": f"Should I rebalance my portfolio? ({i})"},
+                headers=headers,
+            )
+            if response.status_code == 200:
+                latencies.append(time.perf_counter() - started)
+            else:
+                errors += 1
+
+    pool_before = await _pool_checkouts(client)
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(conversation_id) for conversation_id in conversation_ids))
+    elapsed = time.perf_counter() - started
+    pool_after = await _pool_checkouts(client)
+    checkouts = pool_after["count"] - pool_before["count"]
+
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        "pool_wait_mean_ms": round((pool_after["sum"] - pool_before["sum"]) / checkouts * 1000, 2) if checkouts else 0.0,
+        "pool_timeouts": int(pool_after["timeouts"] - pool_before["timeouts"]),
+    }
+
+async def run(base_url: str, levels, requests_per_worker: int):
+    limits = httpx.Limits(max_connections=max(levels) + 8)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120.0, limits=limits) as client:
+        headers = await _login(client)
+        return [await run_level(client, headers, level, requests_per_worker) for level in levels]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", help="Sync SQLAlchemy URL; defaults to a temporary SQLite file")
+    parser.add_argument("--latency-ms", type=float, default=500, help="Stub LLM response latency")
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--requests-per-worker", type=int, default=5)
+    parser.add_argument("--pool-size", type=int, default=5, help="DB_POOL_SIZE of the API worker")
+    parser.add_argument("--max-overflow", type=int, default=10, help="DB_MAX_OVERFLOW of the API worker")
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    database_url = args.database_url or sqlite_database_url()
+    prepare_database(database_url)
+
+    env = {"DB_POOL_SIZE": str(args.pool_size), "DB_MAX_OVERFLOW": str(args.max_overflow)}
+    with stub_llm(latency_ms=args.latency_ms) as llm_url, app_server(database_url, llm_url, env) as base_url:
+        results = asyncio.run(run(base_url, args.levels, args.requests_per_worker))
+
+    baseline = results[0]["throughput_rps"] or 1.0
+    print(
+        f"{'concurrency':>11} {'req/s':>8} {'scaling':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>6} "
+        f"{'pool wait ms':>12} {'pool timeouts':>13}"
+    )
+    for row in results:
+        print(
+            f"{row['concurrency']:>11} {row['throughput_rps']:>8} {row['throughput_rps'] / baseline:>7.1f}x "
+            f"{row['p50_ms']:>8} {row['p95_ms']:>8} {row['p99_ms']:>8} {row['errors']:>6} "
+            f"{row['pool_wait_mean_ms']:>12} {row['pool_timeouts']:>13}"
+        )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "latency_ms": args.latency_ms,
+                "pool_size": args.pool_size,
+                "max_overflow": args.max_overflow,
+                "results": results
+            }, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""Shared helpers for the benchmark scripts: process management and statistics."""
+import contextlib
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Sequence
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def wait_for_http(url: str, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(url, timeout=1.0)
+            return
+        except httpx.TransportError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Server at {url} did not come up within {timeout}s")
+
+@contextlib.contextmanager
+def serve(args, port: int, health_path: str, env: dict = None):
+    """Run a server subprocess from the backend directory until the block exits."""
+    process = subprocess.Popen(
+        args,
+        cwd=BACKEND_DIR,
+        env={**os.environ, **(env or {})},
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        wait_for_http(base_url + health_path)
+        yield base_url
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+@contextlib.contextmanager
+def stub_llm(
+    latency_ms: float = 500,
+    token_delay_ms: float = 10,
+    error_rate: float = 0.0,
+    error_status: int = 503,
+    slow_rate: float = 0.0,
+    slow_ms: float = 5000,
+    failing_models: Sequence[str] = (),
+):
+    """Start the stub LLM server and yield its OpenAI-compatible base URL."""
+    port = free_port()
+    args = [
+        sys.executable, "-m", "benchmarks.stub_llm",
+        "--port", str(port),
+        "--latency-ms", str(latency_ms),
+        "--token-delay-ms", str(token_delay_ms),
+        "--error-rate", str(error_rate),
+        "--error-status", str(error_status),
+        "--slow-rate", str(slow_rate),
+        "--slow-ms", str(slow_ms),
+        "--failing-models", *failing_models,
+    ]
+    with serve(args, port, "/docs") as base_url:
+        yield base_url + "/v1"
+
+def sqlite_database_url() -> str:
+    handle, path = tempfile.mkstemp(prefix="ai-companion-bench-", suffix=".db")
+    os.close(handle)
+    return f"sqlite:///{path}"
+
+def prepare_database(database_url: str):
+    """Create the schema for SQLite runs; Postgres runs are expected to be migrated with alembic."""
+    if not database_url.startswith("sqlite"):
+        return
+    from sqlalchemy import create_engine
+
+    sys.path.insert(0, BACKEND_DIR)
+    from app.models.database import Base
+    import app.models.models  # noqa: F401  (registers the tables on Base)
+
+    engine = create_engine(database_url)
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    engine.dispose()
+
+@contextlib.contextmanager
+def app_server(database_url: str, llm_base_url: str, env: dict = None):
+    """Start ``app.main:app`` under uvicorn against the given database and LLM."""
+    port = free_port()
+    args = [
+        sys.executable, "-m", "uvicorn", "app.main:app",
+        "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning",
+    ]
+    app_env = {
+        "DATABASE_URL": database_url,
+        "OPENAI_BASE_URL": llm_base_url,
+        "OPENAI_API_KEY": "sk-benchmark",
+        "RATE_LIMIT_ENABLED": "false",  # A handful of users sends every request
+        **(env or {}),
+    }
+    with serve(args, port, "/api/health", app_env) as base_url:
+        yield base_url
+
+def percentile(values, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
@@ -0,0 +1,118 @@
+"""Throughput and peak memory of fine-tuning dataset validation.
+
+Writes a synthetic chat JSONL file of each size (with a share of duplicate and
+invalid lines), then validates, deduplicates and token-counts it with the
+dataset preparer in a fresh process, reporting lines per second and that
+process's peak RSS. Peak memory should stay roughly flat as the file grows;
+only the 8-byte digest per unique example accumulates.
+
+    python -m benchmarks.dataset_prepare --lines 100000 1000000
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import resource
+import tempfile
+import time
+
+QUESTIONS = [
+    "Should I pay off my mortgage early or invest the difference?",
+    "How much of my salary should go into my retirement account?",
+    "Is it worth keeping an emergency fund in a high yield savings account?",
+    "What is the difference between an index fund and an ETF?",
+    "How do I rebalance a portfolio that drifted towards stocks?",
+]
+ANSWERS = [
+    "It depends on your interest rate and risk tolerance. Compare the mortgage rate with expected returns after tax.",
+    "A common guideline is 15 percent including any employer match, adjusted for your age and goals.",
+    "Yes, as long as it stays liquid and insured; three to six months of expenses is a typical target.",
+    "Both can track an index. ETFs trade during the day like stocks, mutual index funds price once daily.",
+    "Sell some of the overweight asset or direct new contributions to the underweight one until targets match.",
+]
+
+def write_dataset(path: str, lines: int, duplicate_rate: float, invalid_rate: float, seed: int = 0):
+    rng = random.Random(seed)
+    recent = []
+    with open(path, "w") as f:
+        for i in range(lines):
+            roll = rng.random()
+            if roll < invalid_rate:
+                f.write('{"messages": [{"role": "user", "content": "truncated line\n')
+                continue
+            if roll < invalid_rate + duplicate_rate and recent:
+                f.write(rng.choice(recent))
+                continue
+            line = json.dumps({"messages": [
+                {"role": "system", "content": "You are a helpful financial advisor."},
+                {"role": "user", "content": f"{rng.choice(QUESTIONS)} (case {i})"},
+                {"role": "assistant", "content": rng.choice(ANSWERS)},
+            ]}) + "\n"
+            f.write(line)
+            recent.append(line)
+            if len(recent) > 1000:
+                recent.pop(0)
+
+def _prepare(source_path: str, output_path: str, encoding: str, results):
+    from app.services.context import Tokenizer
+    from app.services.datasets import DatasetPreparer
+
+    tokenizer = Tokenizer(encoding, cache_size=0)
+    tokenizer.load()
+    preparer = DatasetPreparer(tokenizer, max_invalid_examples=-1)
+    baseline_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    started = time.perf_counter()
+    report = preparer.prepare(source_path, output_path)
+    elapsed = time.perf_counter() - started
+    results.put({
+        "seconds": round(elapsed, 2),
+        "lines_per_s": round(report.lines / elapsed),
+        "baseline_rss_mb": round(baseline_kb / 1024, 1),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "report": {k: v for k, v in report.as_dict().items() if k != "errors"},
+    })
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lines", type=int, nargs="+", default=[100000, 1000000])
+    parser.add_argument("--duplicate-rate", type=float, default=0.05)
+    parser.add_argument("--invalid-rate", type=float, default=0.01)
+    parser.add_argument("--encoding", default="cl100k_base", help="tiktoken encoding used for token counts")
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    # A fresh interpreter per size, so each peak RSS reading is its own
+    context = multiprocessing.get_context("spawn")
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for lines in args.lines:
+            source_path = os.path.join(tmp, f"source-{lines}.jsonl")
+            write_dataset(source_path, lines, args.duplicate_rate, args.invalid_rate)
+            size_mb = os.path.getsize(source_path) / 1024 / 1024
+            queue = context.Queue()
+            process = context.Process(
+                target=_prepare,
+                args=(source_path, os.path.join(tmp, f"prepared-{lines}.jsonl"), args.encoding, queue)
+            )
+            process.start()
+            result = queue.get()
+            process.join()
+            os.remove(source_path)
+            results.append({"lines": lines, "source_mb": round(size_mb, 1), **result})
+
+    print(f"{'lines':>9} {'MB':>7} {'seconds':>8} {'lines/s':>9} {'base RSS':>9} {'peak RSS':>9} {'examples':>9} {'dupes':>7} {'invalid':>7}")
+    for row in results:
+        report = row["report"]
+        print(
+            f"{row['lines']:>9} {row['source_mb']:>7} {row['seconds']:>8} {row['lines_per_s']:>9} "
+            f"{row['baseline_rss_mb']:>8}M {row['peak_rss_mb']:>8}M {report['examples']:>9} "
+            f"{report['duplicates']:>7} {report['invalid']:>7}"
+        )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
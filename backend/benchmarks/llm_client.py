@@ -0,0 +1,96 @@
+"""Shared LLM client versus a client per request, against the stub LLM server.
+
+Issues the same number of concurrent completions two ways: constructing a new
+``AsyncOpenAI`` for every call (the old per-request pattern) and going through
+one pooled ``LLMClient``. A non-zero ``--error-rate`` makes the stub fail that
+fraction of calls so the retry/backoff path is exercised; the report shows how
+many calls still failed after retries.
+
+    python -m benchmarks.llm_client --requests 200 --concurrency 50 --error-rate 0.05
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+from openai import AsyncOpenAI
+
+from benchmarks.common import percentile, stub_llm
+from app.services.llm import LLMClient
+
+PROMPT = {
+    "model": "gpt-3.5-turbo",
+    "messages": [{"role": "user", "content": "Explain diversification in one paragraph."}],
+    "max_tokens": 100,
+}
+
+async def _drive(call, requests: int, concurrency: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    failures = 0
+
+    async def one():
+        nonlocal failures
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                await call()
+                latencies.append(time.perf_counter() - started)
+            except Exception:
+                failures += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    elapsed = time.perf_counter() - started
+    return {
+        "throughput_rps": round(len(latencies) / elapsed, 2),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        "failed": failures,
+    }
+
+async def run(base_url: str, args) -> dict:
+    async def per_request_client():
+        client = AsyncOpenAI(api_key="sk-benchmark", base_url=base_url, max_retries=0)
+        try:
+            await client.chat.completions.create(**PROMPT)
+        finally:
+            await client.close()
+
+    shared = LLMClient(
+        api_key="sk-benchmark",
+        base_url=base_url,
+        max_concurrency=args.concurrency,
+        backoff_base=0.05,
+    )
+
+    async def shared_client():
+        await shared.chat_completion(**PROMPT)
+
+    try:
+        return {
+            "per_request_client": await _drive(per_request_client, args.requests, args.concurrency),
+            "shared_client": await _drive(shared_client, args.requests, args.concurrency),
+        }
+    finally:
+        await shared.aclose()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=100)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=503)
+    args = parser.parse_args()
+
+    with stub_llm(latency_ms=args.latency_ms, error_rate=args.error_rate, error_status=args.error_status) as base_url:
+        results = asyncio.run(run(base_url, args))
+        stats = httpx.get(base_url.rsplit("/v1", 1)[0] + "/stats").json()
+
+    for name, row in results.items():
+        print(f"{name:>20}: {row['throughput_rps']} req/s  p50 {row['p50_ms']} ms  p99 {row['p99_ms']} ms  failed {row['failed']}")
+    print(f"{'stub':>20}: {stats['requests']} requests, {stats['errors']} injected errors")
+
+if __name__ == "__main__":
+    main()
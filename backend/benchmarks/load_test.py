@@ -0,0 +1,357 @@
+"""End-to-end load test: a weighted mix of API calls from concurrent virtual users.
+
+Starts ``app.main:app`` under uvicorn (against ``--database-url``, or a
+temporary SQLite file) and the stub LLM, then runs ``--users`` virtual users
+for ``--duration`` seconds. Each user registers, logs in and opens a
+conversation, then loops: it picks an operation by the weights of ``--mix``,
+runs it and waits ``--think-ms``. Requests made during setup and the first
+``--warmup`` seconds are not counted.
+
+Reports throughput, error counts and p50/p95/p99 per route template (plus the
+time to the first token of streamed replies). ``--output`` saves the run as a
+JSON baseline; ``--baseline`` compares against one and exits with status 1
+when a route's p95 or p99 grew, or its throughput fell, by more than
+``--tolerance``. Compare runs from the same machine, database and stub settings.
+
+    python -m benchmarks.load_test --users 32 --duration 60 --output baseline.json
+    python -m benchmarks.load_test --users 32 --duration 60 --baseline baseline.json
+    python -m benchmarks.load_test --mix send_message=1,get_messages=4 --latency-ms 800 --error-rate 0.02
+"""
+import argparse
+import asyncio
+import json
+import platform
+import random
+import subprocess
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import httpx
+
+from benchmarks.common import BACKEND_DIR, app_server, percentile, prepare_database, sqlite_database_url, stub_llm
+
+PASSWORD = "benchmark-password"
+
+QUESTIONS = [
+    "Should I rebalance my portfolio towards bonds?",
+    "How much of my savings should go into index funds?",
+    "Is bitcoin too volatile for a retirement account?",
+    "What does a rising interest rate mean for my mortgage?",
+    "How do dividend stocks compare to growth stocks?",
+]
+
+# Operation weights; a user repeats the operations in these proportions
+MIXES = {
+    "mixed": {
+        "register": 1, "login": 2, "create_conversation": 3, "list_conversations": 8,
+        "send_message": 10, "stream_message": 6, "get_messages": 20, "search": 2,
+    },
+    "chat": {"send_message": 6, "stream_message": 3, "get_messages": 1},
+    "read": {"list_conversations": 3, "get_messages": 6, "search": 1},
+    "auth": {"register": 1, "login": 4, "list_conversations": 1},
+}
+
+ROUTES = {
+    "register": "POST /api/auth/register",
+    "login": "POST /api/auth/token",
+    "create_conversation": "POST /api/chat/conversations",
+    "list_conversations": "GET /api/chat/conversations",
+    "send_message": "POST /api/chat/{conversation_id}/messages",
+    "stream_message": "POST /api/chat/{conversation_id}/messages/stream",
+    "stream_first_token": "POST /api/chat/{conversation_id}/messages/stream (first token)",
+    "get_messages": "GET /api/chat/{conversation_id}/messages",
+    "search": "GET /api/chat/search",
+}
+
+def parse_mix(value: str) -> Dict[str, float]:
+    if value in MIXES:
+        return MIXES[value]
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        if name not in ROUTES or name == "stream_first_token":
+            raise argparse.ArgumentTypeError(f"unknown operation {name!r}; choose from {', '.join(MIXES['mixed'])}")
+        mix[name] = float(weight or 1)
+    return mix
+
+class Recorder:
+    """Latencies and failures per route, counted only while ``recording`` is set."""
+
+    def __init__(self):
+        self.recording = False
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, Dict[str, int]] = {}
+
+    def observe(self, route: str, seconds: float):
+        if self.recording:
+            self.latencies.setdefault(route, []).append(seconds)
+
+    def fail(self, route: str, status):
+        if self.recording:
+            errors = self.errors.setdefault(route, {})
+            errors[str(status)] = errors.get(str(status), 0) + 1
+
+    def summary(self, elapsed: float) -> Dict[str, dict]:
+        routes = {}
+        for route in sorted(set(self.latencies) | set(self.errors)):
+            latencies = self.latencies.get(route, [])
+            routes[route] = {
+                "requests": len(latencies),
+                "errors": self.errors.get(route, {}),
+                "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+                "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+                "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+                "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+                "max_ms": round(max(latencies) * 1000, 1) if latencies else 0.0,
+            }
+        return routes
+
+class VirtualUser:
+    def __init__(self, client: httpx.AsyncClient, recorder: Recorder):
+        self.client = client
+        self.recorder = recorder
+        self.email = f"load-{uuid.uuid4().hex[:12]}@example.com"
+        self.headers: Dict[str, str] = {}
+        self.conversation_ids: List[int] = []
+
+    async def _request(self, operation: str, method: str, url: str, **kwargs) -> Optional[httpx.Response]:
+        route = ROUTES[operation]
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, **kwargs)
+        except httpx.HTTPError as e:
+            self.recorder.fail(route, type(e).__name__)
+            return None
+        if response.is_success:
+            self.recorder.observe(route, time.perf_counter() - started)
+            return response
+        self.recorder.fail(route, response.status_code)
+        return None
+
+    async def setup(self):
+        await self.register(self.email)
+        await self.login()
+        await self.create_conversation()
+        if not self.headers or not self.conversation_ids:
+            raise RuntimeError(f"Virtual user setup failed for {self.email}")
+
+    async def register(self, email: Optional[str] = None):
+        email = email or f"load-{uuid.uuid4().hex[:12]}@example.com"
+        await self._request(
+            "register", "POST", "/api/auth/register", json={"email": email, "full_name": "Load", "password": PASSWORD}
+        )
+
+    async def login(self):
+        response = await self._request(
+            "login", "POST", "/api/auth/token", data={"username": self.email, "password": PASSWORD}
+        )
+        if response is not None:
+            self.headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    async def create_conversation(self):
+        response = await self._request("create_conversation", "POST", "/api/chat/conversations", headers=self.headers)
+        if response is not None:
+            self.conversation_ids.append(response.json()["id"])
+
+    async def list_conversations(self):
+        await self._request("list_conversations", "GET", "/api/chat/conversations", headers=self.headers)
+
+    async def send_message(self):
+        await self._request(
+            "send_message", "POST", f"/api/chat/{random.choice(self.conversation_ids)}/messages",
+            json={"content": random.choice(QUESTIONS)}, headers=self.headers,
+        )
+
+    async def stream_message(self):
+        route = ROUTES["stream_message"]
+        url = f"/api/chat/{random.choice(self.conversation_ids)}/messages/stream"
+        started = time.perf_counter()
+        first_token = None
+        try:
+            async with self.client.stream(
+                "POST", url, json={"content": random.choice(QUESTIONS)}, headers=self.headers
+            ) as response:
+                if not response.is_success:
+                    self.recorder.fail(route, response.status_code)
+                    return
+                event = None
+                async for line in response.aiter_lines():
+                    if line.startswith("event: "):
+                        event = line[len("event: "):]
+                        if event == "token" and first_token is None:
+                            first_token = time.perf_counter() - started
+                if event != "done":
+                    self.recorder.fail(route, f"stream_{event or 'empty'}")
+                    return
+        except httpx.HTTPError as e:
+            self.recorder.fail(route, type(e).__name__)
+            return
+        self.recorder.observe(route, time.perf_counter() - started)
+        if first_token is not None:
+            self.recorder.observe(ROUTES["stream_first_token"], first_token)
+
+    async def get_messages(self):
+        await self._request(
+            "get_messages", "GET", f"/api/chat/{random.choice(self.conversation_ids)}/messages",
+            params={"limit": 50}, headers=self.headers,
+        )
+
+    async def search(self):
+        await self._request(
+            "search", "GET", "/api/chat/search", params={"q": random.choice(["portfolio", "bonds", "index funds"])},
+            headers=self.headers,
+        )
+
+async def run(base_url: str, args) -> dict:
+    operations = list(args.mix)
+    weights = [args.mix[name] for name in operations]
+    recorder = Recorder()
+    limits = httpx.Limits(max_connections=args.users + 8, max_keepalive_connections=args.users + 8)
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+        users = [VirtualUser(client, recorder) for _ in range(args.users)]
+        # Setup is not measured; registering is bcrypt-bound, so it runs a few users at a time
+        setup_slots = asyncio.Semaphore(8)
+
+        async def setup(user: VirtualUser):
+            async with setup_slots:
+                await user.setup()
+
+        await asyncio.gather(*(setup(user) for user in users))
+
+        stop_at = time.monotonic() + args.warmup + args.duration
+
+        async def loop(user: VirtualUser):
+            # Staggered so the users do not move in lockstep
+            await asyncio.sleep(random.uniform(0, args.think_ms / 1000))
+            while time.monotonic() < stop_at:
+                operation = random.choices(operations, weights)[0]
+                await getattr(user, operation)()
+                if args.think_ms:
+                    await asyncio.sleep(random.expovariate(1000 / args.think_ms))
+
+        async def measure():
+            await asyncio.sleep(args.warmup)
+            recorder.recording = True
+            started = time.perf_counter()
+            await asyncio.sleep(args.duration)
+            recorder.recording = False
+            return time.perf_counter() - started
+
+        *_, elapsed = await asyncio.gather(*(loop(user) for user in users), measure())
+
+    routes = recorder.summary(elapsed)
+    total = sum(route["requests"] for key, route in routes.items() if not key.endswith("(first token)"))
+    return {
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(total / elapsed, 2) if elapsed else 0.0,
+        "routes": routes,
+    }
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(current: dict, baseline: dict, tolerance: float, min_delta_ms: float) -> List[str]:
+    """Routes that got slower (p95/p99) or slower to serve (throughput) than the baseline, as messages."""
+    regressions = []
+    for route, base in baseline["routes"].items():
+        now = current["routes"].get(route)
+        if now is None or not base["requests"]:
+            continue
+        for key in ("p95_ms", "p99_ms"):
+            if now[key] > base[key] * (1 + tolerance) and now[key] - base[key] >= min_delta_ms:
+                regressions.append(f"{route}: {key} {base[key]} -> {now[key]}")
+        if now["throughput_rps"] < base["throughput_rps"] * (1 - tolerance):
+            regressions.append(f"{route}: throughput_rps {base['throughput_rps']} -> {now['throughput_rps']}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", help="Sync SQLAlchemy URL of a migrated database; defaults to a temporary SQLite file")
+    parser.add_argument("--mix", type=parse_mix, default="mixed", help=f"{', '.join(MIXES)}, or weights like send_message=3,get_messages=5")
+    parser.add_argument("--users", type=int, default=16, help="Concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=60, help="Measured seconds")
+    parser.add_argument("--warmup", type=float, default=5, help="Seconds of load before measuring")
+    parser.add_argument("--think-ms", type=float, default=100, help="Mean pause between a user's requests (exponential)")
+    parser.add_argument("--timeout", type=float, default=120, help="Client timeout per request")
+    parser.add_argument("--latency-ms", type=float, default=500, help="Stub LLM response latency")
+    parser.add_argument("--token-delay-ms", type=float, default=10, help="Stub LLM delay between streamed tokens")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of stub LLM calls that fail")
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="Fraction of stub LLM calls slowed to --slow-ms")
+    parser.add_argument("--slow-ms", type=float, default=5000)
+    parser.add_argument("--env", nargs="*", default=[], metavar="NAME=VALUE", help="Extra settings for the API worker")
+    parser.add_argument("--output", help="Save the run as a JSON baseline at this path")
+    parser.add_argument("--baseline", help="Compare against a saved run; exit 1 on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative change against the baseline")
+    parser.add_argument("--min-delta-ms", type=float, default=5, help="Ignore latency changes smaller than this")
+    args = parser.parse_args()
+
+    database_url = args.database_url or sqlite_database_url()
+    prepare_database(database_url)
+    env = dict(item.split("=", 1) for item in args.env)
+
+    with stub_llm(
+        latency_ms=args.latency_ms,
+        token_delay_ms=args.token_delay_ms,
+        error_rate=args.error_rate,
+        slow_rate=args.slow_rate,
+        slow_ms=args.slow_ms,
+    ) as llm_url, app_server(database_url, llm_url, env) as base_url:
+        result = asyncio.run(run(base_url, args))
+
+    report = {
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "revision": _git_revision(),
+        "python": platform.python_version(),
+        "database": database_url.split(":", 1)[0],
+        "config": {
+            "mix": args.mix,
+            "users": args.users,
+            "duration_s": args.duration,
+            "think_ms": args.think_ms,
+            "latency_ms": args.latency_ms,
+            "token_delay_ms": args.token_delay_ms,
+            "error_rate": args.error_rate,
+            "slow_rate": args.slow_rate,
+            "slow_ms": args.slow_ms,
+            "env": env,
+        },
+        **result,
+    }
+
+    print(f"{report['throughput_rps']} req/s over {report['elapsed_s']} s with {args.users} users")
+    print(f"{'route':<64} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}  errors")
+    for route, row in report["routes"].items():
+        errors = ", ".join(f"{status}: {count}" for status, count in row["errors"].items()) or "-"
+        print(
+            f"{route:<64} {row['throughput_rps']:>8} {row['p50_ms']:>8} {row['p95_ms']:>8} "
+            f"{row['p99_ms']:>8} {row['max_ms']:>8}  {errors}"
+        )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("config") != report["config"]:
+            print("Warning: the baseline was recorded with a different configuration", file=sys.stderr)
+        regressions = compare(report, baseline, args.tolerance, args.min_delta_ms)
+        print(f"Against baseline {baseline.get('revision') or args.baseline}: ", end="")
+        if regressions:
+            print(f"{len(regressions)} regressions")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print("no regressions")
+
+if __name__ == "__main__":
+    main()
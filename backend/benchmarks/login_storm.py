@@ -0,0 +1,129 @@
+"""Login throughput and chat latency on one worker during a login storm.
+
+Runs a steady chat load against one uvicorn worker twice: alone, then while
+``--login-concurrency`` clients log in back to back. With bcrypt on the event
+loop every login stalls all chat requests on the worker; with the password
+hasher pool the chat p99 should barely move. Run it on the commit before the
+pool was introduced for the comparison.
+
+    python -m benchmarks.login_storm --bcrypt-rounds 12 --login-concurrency 32
+"""
+import argparse
+import asyncio
+import json
+import time
+import uuid
+
+import httpx
+
+from benchmarks.common import app_server, percentile, prepare_database, sqlite_database_url, stub_llm
+
+PASSWORD = "benchmark-password"
+
+async def _register(client: httpx.AsyncClient) -> str:
+    email = f"bench-{uuid.uuid4().hex[:8]}@example.com"
+    response = await client.post("/api/auth/register", json={"email": email, "full_name": "Bench", "password": PASSWORD})
+    response.raise_for_status()
+    return email
+
+async def _chat_load(client: httpx.AsyncClient, headers: dict, conversation_ids, stop: asyncio.Event) -> dict:
+    latencies = []
+    errors = 0
+
+    async def worker(conversation_id: int):
+        nonlocal errors
+        while not stop.is_set():
+            started = time.perf_counter()
+            response = await client.post(
+                f"/api/chat/{conversation_id}/messages",
+                json={"content": "How should I rebalance my portfolio?"},
+                headers=headers,
+            )
+            if response.status_code == 200:
+                latencies.append(time.perf_counter() - started)
+            else:
+                errors += 1
+
+    await asyncio.gather(*(worker(conversation_id) for conversation_id in conversation_ids))
+    return {"latencies": latencies, "errors": errors}
+
+async def _login_storm(client: httpx.AsyncClient, emails, stop: asyncio.Event) -> dict:
+    counts = {"ok": 0, "busy": 0}
+
+    async def worker(email: str):
+        while not stop.is_set():
+            response = await client.post("/api/auth/token", data={"username": email, "password": PASSWORD})
+            if response.status_code == 503:
+                counts["busy"] += 1
+            else:
+                response.raise_for_status()
+                counts["ok"] += 1
+
+    await asyncio.gather(*(worker(email) for email in emails))
+    return counts
+
+async def run(base_url: str, duration: float, chat_concurrency: int, login_concurrency: int) -> list:
+    limits = httpx.Limits(max_connections=chat_concurrency + login_concurrency + 8)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120.0, limits=limits) as client:
+        emails = [await _register(client) for _ in range(login_concurrency)]
+        response = await client.post("/api/auth/token", data={"username": emails[0], "password": PASSWORD})
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        conversation_ids = []
+        for _ in range(chat_concurrency):
+            response = await client.post("/api/chat/conversations", headers=headers)
+            conversation_ids.append(response.json()["id"])
+
+        results = []
+        for storm in (False, True):
+            stop = asyncio.Event()
+            tasks = [_chat_load(client, headers, conversation_ids, stop)]
+            if storm:
+                tasks.append(_login_storm(client, emails, stop))
+            gathered = asyncio.gather(*tasks)
+            await asyncio.sleep(duration)
+            stop.set()
+            outcome = await gathered
+            latencies = outcome[0]["latencies"]
+            logins = outcome[1] if storm else {"ok": 0, "busy": 0}
+            results.append({
+                "login_storm": storm,
+                "chat_requests": len(latencies),
+                "chat_errors": outcome[0]["errors"],
+                "chat_p50_ms": round(percentile(latencies, 50) * 1000, 1),
+                "chat_p99_ms": round(percentile(latencies, 99) * 1000, 1),
+                "logins_per_s": round(logins["ok"] / duration, 1),
+                "logins_rejected": logins["busy"],
+            })
+        return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", help="Sync SQLAlchemy URL; defaults to a temporary SQLite file")
+    parser.add_argument("--latency-ms", type=float, default=200, help="Stub LLM response latency")
+    parser.add_argument("--bcrypt-rounds", type=int, default=12)
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per phase")
+    parser.add_argument("--chat-concurrency", type=int, default=8)
+    parser.add_argument("--login-concurrency", type=int, default=32)
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    database_url = args.database_url or sqlite_database_url()
+    prepare_database(database_url)
+
+    env = {"BCRYPT_ROUNDS": str(args.bcrypt_rounds)}
+    with stub_llm(latency_ms=args.latency_ms) as llm_url, app_server(database_url, llm_url, env) as base_url:
+        results = asyncio.run(run(base_url, args.duration, args.chat_concurrency, args.login_concurrency))
+
+    print(f"{'phase':>12} {'chat req':>8} {'errors':>6} {'p50 ms':>8} {'p99 ms':>8} {'logins/s':>9} {'rejected':>8}")
+    for row in results:
+        print(
+            f"{'login storm' if row['login_storm'] else 'chat only':>12} {row['chat_requests']:>8} {row['chat_errors']:>6} "
+            f"{row['chat_p50_ms']:>8} {row['chat_p99_ms']:>8} {row['logins_per_s']:>9} {row['logins_rejected']:>8}"
+        )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"bcrypt_rounds": args.bcrypt_rounds, "results": results}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
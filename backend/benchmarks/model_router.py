@@ -0,0 +1,149 @@
+"""Chat completion tail latency through the model router, against the stub LLM server.
+
+The stub answers most completions after ``--latency-ms`` but a ``--slow-rate``
+fraction only after ``--slow-ms``, the long tail a real provider shows under
+load. The same workload is driven four ways: straight through ``LLMClient``,
+through ``ModelRouter`` without hedging, with hedging at ``--hedge-percentile``,
+and with a routed (fine-tuned) model that always fails, so every turn falls
+back to the base model once its circuit opens. Each reports p50/p95/p99 and
+the router's decisions (which model served, hedges sent and won).
+
+    python -m benchmarks.model_router --requests 2000 --concurrency 20 --slow-rate 0.05 --slow-ms 3000
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from benchmarks.common import percentile, stub_llm
+from app.services.llm import LLMClient
+from app.services.model_router import ModelRouter
+
+BASE_MODEL = "gpt-3.5-turbo"
+FINE_TUNED_MODEL = "ft:gpt-3.5-turbo:advisor"
+BROKEN_MODEL = "ft:gpt-3.5-turbo:deleted"
+
+PROMPT = {
+    "messages": [{"role": "user", "content": "Explain diversification in one paragraph."}],
+    "max_tokens": 100,
+}
+
+async def _drive(call, requests: int, concurrency: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    served = {}
+    failures = 0
+
+    async def one():
+        nonlocal failures
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                response = await call()
+            except Exception:
+                failures += 1
+                return
+            latencies.append(time.perf_counter() - started)
+            served[response.model] = served.get(response.model, 0) + 1
+
+    await asyncio.gather(*(one() for _ in range(requests)))
+    return {
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        "max_ms": round(max(latencies) * 1000, 1) if latencies else 0.0,
+        "failed": failures,
+        "served": served,
+    }
+
+def _hedges() -> dict:
+    from app.core.metrics import MODEL_ROUTER_HEDGES
+
+    counts = {}
+    for metric in MODEL_ROUTER_HEDGES.collect():
+        for sample in metric.samples:
+            if sample.name.endswith("_total"):
+                counts[sample.labels["winner"]] = counts.get(sample.labels["winner"], 0) + int(sample.value)
+    return counts
+
+async def run(base_url: str, args) -> dict:
+    client = LLMClient(
+        api_key="sk-benchmark",
+        base_url=base_url,
+        max_concurrency=args.concurrency * 2,
+        backoff_base=0.05,
+    )
+
+    def router(**kwargs) -> ModelRouter:
+        return ModelRouter(
+            client,
+            base_model=BASE_MODEL,
+            attempt_timeout=args.attempt_timeout,
+            hedge_percentile=args.hedge_percentile,
+            hedge_min_samples=args.hedge_min_samples,
+            hedge_max_percent=args.hedge_max_percent,
+            **kwargs,
+        )
+
+    results = {}
+    try:
+        results["direct"] = await _drive(
+            lambda: client.chat_completion(model=FINE_TUNED_MODEL, **PROMPT), args.requests, args.concurrency
+        )
+        plain = router()
+        results["router"] = await _drive(
+            lambda: plain.chat_completion(model=FINE_TUNED_MODEL, **PROMPT), args.requests, args.concurrency
+        )
+        hedged = router(hedge_enabled=True)
+        before = _hedges()
+        results["router_hedged"] = await _drive(
+            lambda: hedged.chat_completion(model=FINE_TUNED_MODEL, **PROMPT), args.requests, args.concurrency
+        )
+        results["router_hedged"]["hedges"] = {
+            winner: count - before.get(winner, 0) for winner, count in _hedges().items()
+        }
+        fallback = router()
+        results["fallback"] = await _drive(
+            lambda: fallback.chat_completion(model=BROKEN_MODEL, **PROMPT), args.requests, args.concurrency
+        )
+        results["fallback"]["circuit"] = fallback.breaker(BROKEN_MODEL).state
+    finally:
+        await client.aclose()
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--latency-ms", type=float, default=200)
+    parser.add_argument("--slow-rate", type=float, default=0.05, help="Fraction of completions the stub slows down")
+    parser.add_argument("--slow-ms", type=float, default=3000)
+    parser.add_argument("--attempt-timeout", type=float, default=30)
+    parser.add_argument("--hedge-percentile", type=float, default=95)
+    parser.add_argument("--hedge-min-samples", type=int, default=50)
+    parser.add_argument("--hedge-max-percent", type=float, default=10)
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    with stub_llm(
+        latency_ms=args.latency_ms, slow_rate=args.slow_rate, slow_ms=args.slow_ms, failing_models=[BROKEN_MODEL]
+    ) as base_url:
+        results = asyncio.run(run(base_url, args))
+
+    for name, row in results.items():
+        extra = ""
+        if "hedges" in row:
+            extra = f"  hedges {row['hedges']}"
+        if "circuit" in row:
+            extra = f"  circuit {row['circuit']}"
+        print(
+            f"{name:>14}: p50 {row['p50_ms']:>7} ms  p95 {row['p95_ms']:>7} ms  p99 {row['p99_ms']:>7} ms  "
+            f"max {row['max_ms']:>7} ms  failed {row['failed']}  served {row['served']}{extra}"
+        )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Lookup latency and hit rate of the semantic response cache.
+
+Fills the index with synthetic questions at each size, then times lookups for
+repeated questions with small edits (should hit) and unseen questions (should
+miss; any hit is a false positive).
+Embedding time is included, as it is on the request path.
+
+    python -m benchmarks.semantic_cache --sizes 1000 10000 100000
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from benchmarks.common import percentile
+
+TICKERS = ["BTC", "ETH", "SOL", "AAPL", "MSFT", "NVDA", "TSLA", "AMZN"]
+# Only asked in the unseen questions, which should all miss
+UNSEEN_TICKERS = ["XRP", "ADA", "GOOG", "META"]
+WORDS = "retirement savings income growth bonds dividends tax horizon budget emergency fund debt".split()
+TEMPLATES = [
+    "should I buy {t} now",
+    "is {t} a good long term investment",
+    "what is the outlook for {t} this year",
+    "how risky is {t} compared to an index fund",
+    "explain the valuation of {t}",
+    "should I sell my {t} position after the last rally",
+]
+# Edits that keep the meaning; the cache should still answer these
+VARIANTS = [str.upper, lambda q: q + "?", lambda q: q.capitalize() + "?", lambda q: q.replace("I ", "i ")]
+
+def question(rng: random.Random, tickers) -> str:
+    return rng.choice(TEMPLATES).format(t=rng.choice(tickers)) + " " + " ".join(rng.sample(WORDS, 3))
+
+async def run(sizes, lookups: int, threshold: float):
+    from app.services.semantic_cache import CacheLookup, HashingEmbedder, SemanticCache
+
+    system = {"role": "system", "content": "system prompt"}
+    results = []
+    for size in sizes:
+        rng = random.Random(size)
+        cache = SemanticCache(HashingEmbedder(), max_entries=size, similarity_threshold=threshold)
+        questions = [question(rng, TICKERS) for _ in range(size)]
+        # Filled in one batch; the fill itself is not what is being measured
+        for q, vector in zip(questions, cache._normalize(cache.embedder(questions))):
+            cache.store(CacheLookup("gpt-3.5-turbo", q, vector), "answer")
+
+        timings = {"repeat": [], "unseen": []}
+        repeat_hits = false_positives = 0
+        for i in range(lookups):
+            repeat = i % 2 == 0
+            q = rng.choice(VARIANTS)(rng.choice(questions)) if repeat else question(rng, UNSEEN_TICKERS)
+            started = time.perf_counter()
+            lookup = await cache.lookup("gpt-3.5-turbo", [system, {"role": "user", "content": q}])
+            timings["repeat" if repeat else "unseen"].append(time.perf_counter() - started)
+            if lookup.response is not None:
+                if repeat:
+                    repeat_hits += 1
+                else:
+                    false_positives += 1
+        results.append((size, timings, repeat_hits, false_positives))
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--lookups", type=int, default=2000)
+    parser.add_argument("--threshold", type=float, default=0.92)
+    args = parser.parse_args()
+
+    for size, timings, repeat_hits, false_positives in asyncio.run(run(args.sizes, args.lookups, args.threshold)):
+        print(
+            f"{size:>7} entries: repeat hit rate {repeat_hits / len(timings['repeat']):6.1%}  "
+            f"false positives {false_positives}/{len(timings['unseen'])}"
+        )
+        for kind in ("repeat", "unseen"):
+            samples = timings[kind]
+            print(f"{'':>17}{kind:>7} p50 {percentile(samples, 50) * 1e3:7.3f} ms  p99 {percentile(samples, 99) * 1e3:7.3f} ms")
+
+if __name__ == "__main__":
+    main()
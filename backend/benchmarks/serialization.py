@@ -0,0 +1,216 @@
+"""Serialization time and bytes on the wire for long conversation histories.
+
+In process, a ``List[MessageResponse]`` route returning ``--messages`` rows is
+rendered with the stdlib ``JSONResponse`` and with ``ORJSONResponse``, then
+compressed with gzip and brotli through ``CompressionMiddleware``. End to end,
+the API is started against a database holding one conversation of that many
+messages; its whole history is paged through ``GET /messages`` per encoding,
+then revalidated with ``If-None-Match``, which the API answers 304 without
+loading rows.
+
+    python -m benchmarks.serialization --messages 1000 --iterations 200
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import List
+
+import httpx
+
+from benchmarks.common import app_server, percentile, prepare_database, sqlite_database_url
+
+WORDS = (
+    "a the of and to in is for that on with as it be are this you your can by or an at from which will not "
+    "have more their if its may over when should also long term short higher lower than most into about "
+    "portfolio diversification index fund bond yield equity risk return dividend volatility allocation "
+    "rebalance inflation interest rate market sector growth value earnings cash stock shares price trend "
+    "analysis crypto bitcoin ethereum exposure hedge position buy sell hold strategy investor retirement "
+    "account tax capital gains loss fees expense ratio emerging markets treasury savings liquidity budget "
+    "monthly annual percent performance history past guarantee research advisor recommendation consider"
+).split()
+
+def synthetic_messages(count: int, conversation_id: int = 1) -> List[dict]:
+    """Alternating user questions and longer advisor replies, oldest first."""
+    rng = random.Random(42)
+    started = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    messages = []
+    for i in range(count):
+        is_ai = i % 2 == 1
+        words = rng.randint(80, 250) if is_ai else rng.randint(8, 40)
+        messages.append({
+            "id": i + 1,
+            "conversation_id": conversation_id,
+            "content": " ".join(rng.choice(WORDS) for _ in range(words)),
+            "is_ai": is_ai,
+            "created_at": started + timedelta(minutes=i),
+        })
+    return messages
+
+async def asgi_get(app, path: str, headers: dict = None):
+    """One GET straight through the ASGI app, without a server or HTTP client in the way."""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": b"", "root_path": "",
+        "headers": [(name.lower().encode(), value.encode()) for name, value in (headers or {}).items()],
+        "client": ("127.0.0.1", 1), "server": ("127.0.0.1", 80),
+    }
+    chunks = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return b"".join(chunks)
+
+def _summary(timings: List[float], size: int) -> dict:
+    return {
+        "mean_ms": round(sum(timings) / len(timings) * 1000, 3),
+        "p50_ms": round(percentile(timings, 50) * 1000, 3),
+        "p95_ms": round(percentile(timings, 95) * 1000, 3),
+        "bytes": size,
+    }
+
+async def in_process(messages: int, iterations: int) -> dict:
+    from fastapi import FastAPI
+    from fastapi.responses import JSONResponse, ORJSONResponse
+
+    from app.core import compression
+    from app.core.compression import CompressionMiddleware
+    from app.models.models import Message
+    from app.schemas.chat import MessageResponse
+
+    rows = [Message(**message) for message in synthetic_messages(messages)]
+    app = FastAPI()
+
+    @app.get("/json", response_model=List[MessageResponse], response_class=JSONResponse)
+    async def stdlib_json():
+        return rows
+
+    @app.get("/orjson", response_model=List[MessageResponse], response_class=ORJSONResponse)
+    async def orjson():
+        return rows
+
+    compressed = CompressionMiddleware(app)
+
+    variants = {
+        "json": (app, "/json", {}),
+        "orjson": (app, "/orjson", {}),
+        "orjson+gzip": (compressed, "/orjson", {"Accept-Encoding": "gzip"}),
+    }
+    if compression.brotli is not None:
+        variants["orjson+br"] = (compressed, "/orjson", {"Accept-Encoding": "br"})
+
+    results = {}
+    for name, (target, path, headers) in variants.items():
+        for _ in range(min(10, iterations)):
+            await asgi_get(target, path, headers)
+        timings = []
+        for _ in range(iterations):
+            started = time.perf_counter()
+            body = await asgi_get(target, path, headers)
+            timings.append(time.perf_counter() - started)
+        results[name] = _summary(timings, len(body))
+    return results
+
+def seed_conversation(database_url: str, user_id: int, conversation_id: int, messages: int):
+    from sqlalchemy import create_engine, insert
+
+    from app.models.models import Message
+
+    engine = create_engine(database_url)
+    rows = synthetic_messages(messages, conversation_id)
+    for row in rows:
+        del row["id"]
+        row["user_id"] = user_id
+    with engine.begin() as conn:
+        conn.execute(insert(Message), rows)
+    engine.dispose()
+
+def end_to_end(database_url: str, messages: int, iterations: int, page_size: int) -> dict:
+    results = {}
+    with app_server(database_url, "http://127.0.0.1:9/v1", {"BCRYPT_ROUNDS": "4"}) as base_url:
+        client = httpx.Client(base_url=base_url, timeout=60)
+        email = f"bench-{uuid.uuid4().hex[:8]}@example.com"
+        client.post("/api/auth/register", json={"email": email, "full_name": "Bench", "password": "benchmark"})
+        token = client.post("/api/auth/token", data={"username": email, "password": "benchmark"}).json()["access_token"]
+        client.headers["Authorization"] = f"Bearer {token}"
+        user_id = client.get("/api/users/me").json()["id"]
+        conversation_id = client.post("/api/chat/conversations").json()["id"]
+        seed_conversation(database_url, user_id, conversation_id, messages)
+
+        def history(encoding: str, cached: dict = None):
+            # Every page of the conversation, newest first, revalidating the ``cached`` pages like a browser would.
+            # Returns (seconds, bytes on the wire, {cursor: (ETag, next cursor)}, 304s)
+            started = time.perf_counter()
+            wire, cursor, pages, not_modified = 0, None, {}, 0
+            while True:
+                params = {"limit": page_size, **({"before": cursor} if cursor else {})}
+                headers = {"Accept-Encoding": encoding}
+                if cached is not None:
+                    headers["If-None-Match"] = cached[cursor][0]
+                with client.stream("GET", f"/api/chat/{conversation_id}/messages", params=params, headers=headers) as r:
+                    wire += sum(len(chunk) for chunk in r.iter_raw())
+                if r.status_code == 304:
+                    # The cached page still holds, next-page cursor included
+                    not_modified += 1
+                    pages[cursor] = cached[cursor]
+                else:
+                    pages[cursor] = (r.headers.get("etag"), r.headers.get("x-next-cursor"))
+                cursor = pages[cursor][1]
+                if not cursor:
+                    return time.perf_counter() - started, wire, pages, not_modified
+
+        for encoding in ("identity", "gzip", "br"):
+            timings = []
+            for _ in range(iterations):
+                seconds, wire, cached, _ = history(encoding)
+                timings.append(seconds)
+            results[f"history_{encoding}"] = _summary(timings, wire)
+
+        # An unchanged history answers every page with a 304
+        timings = []
+        for _ in range(iterations):
+            seconds, wire, _, not_modified = history("gzip", cached)
+            timings.append(seconds)
+        results["history_revalidated"] = {**_summary(timings, wire), "not_modified_pages": not_modified}
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=1000, help="Messages in the conversation")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--page-size", type=int, default=200, help="limit of each GET /messages (at most 200)")
+    parser.add_argument("--database-url", help="Migrated Postgres for the end-to-end part; defaults to a temporary SQLite file")
+    parser.add_argument("--skip-end-to-end", action="store_true")
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    results = {"in_process": asyncio.run(in_process(args.messages, args.iterations))}
+    if not args.skip_end_to_end:
+        database_url = args.database_url or sqlite_database_url()
+        prepare_database(database_url)
+        results["end_to_end"] = end_to_end(database_url, args.messages, max(1, args.iterations // 10), args.page_size)
+
+    for part, rows in results.items():
+        print(part)
+        for name, row in rows.items():
+            extra = f"  304s {row['not_modified_pages']}" if "not_modified_pages" in row else ""
+            print(
+                f"  {name:>20}: mean {row['mean_ms']:>9} ms  p50 {row['p50_ms']:>9} ms  "
+                f"p95 {row['p95_ms']:>9} ms  {row['bytes']:>9} bytes{extra}"
+            )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""Startup time, memory and first-request latency of the API's process models.
+
+Each mode starts the API with ``--workers`` workers against a fresh SQLite
+database and the stub LLM: ``uvicorn --workers`` (every worker imports the
+app on its own), ``gunicorn`` with ``SERVER_PRELOAD`` (the master imports the
+app and the lazily loaded libraries once, then forks) and ``gunicorn`` without
+it. Reported per mode: seconds from spawn to the first ``/api/health`` 200,
+the latency of the first login and the first chat turn, and RSS/PSS/USS of
+the master and its workers from ``/proc/<pid>/smaps_rollup`` (Linux only).
+PSS splits pages shared after the fork between the processes sharing them,
+so its total is the memory the server really holds.
+
+    python -m benchmarks.startup --workers 4 --repeat 3
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import uuid
+from typing import Dict, List
+
+import httpx
+
+from benchmarks.common import BACKEND_DIR, free_port, prepare_database, sqlite_database_url, stub_llm
+
+MODES = ("uvicorn", "gunicorn_preload", "gunicorn")
+
+def command(mode: str, port: int, workers: int) -> List[str]:
+    if mode == "uvicorn":
+        return [
+            sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+            "--workers", str(workers), "--log-level", "warning",
+        ]
+    return [
+        sys.executable, "-m", "gunicorn", "app.main:app", "--bind", f"127.0.0.1:{port}",
+        "--workers", str(workers), "--log-level", "warning",
+    ]
+
+def descendants(pid: int) -> List[int]:
+    """``pid`` and every process below it, from the parent pids in ``/proc``."""
+    children: Dict[int, List[int]] = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # The command name may hold spaces, the fields after its closing parenthesis do not
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+    found, pending = [], [pid]
+    while pending:
+        current = pending.pop()
+        found.append(current)
+        pending.extend(children.get(current, []))
+    return found
+
+def memory_mb(pid: int) -> Dict[str, float]:
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            name, _, value = line.partition(":")
+            if value.strip().endswith("kB"):
+                fields[name] = int(value.split()[0])
+    uss = fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0)
+    return {
+        "rss": round(fields.get("Rss", 0) / 1024, 1),
+        "pss": round(fields.get("Pss", 0) / 1024, 1),
+        "uss": round(uss / 1024, 1),
+    }
+
+def run_mode(mode: str, workers: int, llm_base_url: str) -> dict:
+    database_url = sqlite_database_url()
+    prepare_database(database_url)
+    port = free_port()
+    env = {
+        **os.environ,
+        "DATABASE_URL": database_url,
+        "OPENAI_BASE_URL": llm_base_url,
+        "OPENAI_API_KEY": "sk-benchmark",
+        "RATE_LIMIT_ENABLED": "false",
+        "BCRYPT_ROUNDS": "4",  # Keeps the hash itself from hiding what the first login pays for imports
+        "SERVER_PRELOAD": "false" if mode == "gunicorn" else "true",
+    }
+    started = time.perf_counter()
+    process = subprocess.Popen(command(mode, port, workers), cwd=BACKEND_DIR, env=env)
+    client = httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=60)
+    try:
+        while True:
+            if process.poll() is not None:
+                raise RuntimeError(f"{mode} exited with status {process.returncode} before serving")
+            try:
+                if client.get("/api/health").status_code == 200:
+                    break
+            except httpx.TransportError:
+                pass
+            time.sleep(0.01)
+        ready = time.perf_counter() - started
+        # Let the other workers finish booting before measuring them
+        time.sleep(2)
+
+        email = f"bench-{uuid.uuid4().hex[:8]}@example.com"
+        client.post("/api/auth/register", json={"email": email, "full_name": "Bench", "password": "benchmark"})
+        request_started = time.perf_counter()
+        token = client.post("/api/auth/token", data={"username": email, "password": "benchmark"}).json()["access_token"]
+        first_login = time.perf_counter() - request_started
+        client.headers["Authorization"] = f"Bearer {token}"
+        conversation_id = client.post("/api/chat/conversations").json()["id"]
+        request_started = time.perf_counter()
+        response = client.post(f"/api/chat/{conversation_id}/messages", json={"content": "How should I start investing?"})
+        first_chat = time.perf_counter() - request_started
+        response.raise_for_status()
+
+        processes = {pid: memory_mb(pid) for pid in descendants(process.pid)}
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        os.unlink(database_url[len("sqlite:///"):])
+
+    master = processes.pop(process.pid)
+    return {
+        "ready_s": round(ready, 3),
+        "first_login_ms": round(first_login * 1000, 1),
+        "first_chat_ms": round(first_chat * 1000, 1),
+        "processes": len(processes) + 1,
+        "master_mb": master,
+        "worker_mb": list(processes.values()),
+        "total_mb": {key: round(master[key] + sum(p[key] for p in processes.values()), 1) for key in master},
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per mode; the median by ready time is reported")
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    results = {}
+    with stub_llm(latency_ms=50, token_delay_ms=1) as llm_base_url:
+        for mode in args.modes:
+            runs = sorted((run_mode(mode, args.workers, llm_base_url) for _ in range(args.repeat)), key=lambda r: r["ready_s"])
+            results[mode] = runs[len(runs) // 2]
+
+    for mode, row in results.items():
+        total = row["total_mb"]
+        print(
+            f"{mode:>17}: ready {row['ready_s']:>6} s  first login {row['first_login_ms']:>7} ms  "
+            f"first chat {row['first_chat_ms']:>7} ms  {row['processes']} processes  "
+            f"RSS {total['rss']:>7} MB  PSS {total['pss']:>7} MB  USS {total['uss']:>7} MB"
+        )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+"""Minimal OpenAI-compatible chat completions server for benchmarks.
+
+Serves ``POST /v1/chat/completions`` with a fixed reply after a configurable
+delay, optionally as a token stream, so the API can be load-tested without
+calling (or paying for) the real provider. A fraction of requests can be
+failed with 429/5xx to exercise client retries, a fraction can be slowed down
+to give the latency distribution a tail, and ``--failing-models`` always fail
+(as a deleted or overloaded model would). File uploads (plain and
+multipart) and fine-tuning jobs are accepted too; a job reports ``running`` until ``--fine-tune-seconds``
+have passed, then ``succeeded``.
+
+    python -m benchmarks.stub_llm --port 9100 --latency-ms 500 --error-rate 0.1
+    python -m benchmarks.stub_llm --slow-rate 0.05 --slow-ms 5000 --failing-models ft:broken
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+import uuid
+from typing import Optional
+
+from fastapi import FastAPI, File, Form, HTTPException, Request, UploadFile
+from fastapi.responses import JSONResponse, StreamingResponse
+
+REPLY = (
+    "Diversification spreads risk across asset classes. Consider a mix of broad "
+    "index funds and bonds that matches your time horizon, and remember this is "
+    "general information rather than personalised financial advice."
+)
+
+app = FastAPI(title="Stub LLM")
+app.state.latency_ms = float(os.getenv("STUB_LLM_LATENCY_MS", "500"))
+app.state.token_delay_ms = float(os.getenv("STUB_LLM_TOKEN_DELAY_MS", "10"))
+app.state.error_rate = float(os.getenv("STUB_LLM_ERROR_RATE", "0"))
+app.state.error_status = int(os.getenv("STUB_LLM_ERROR_STATUS", "503"))
+app.state.slow_rate = float(os.getenv("STUB_LLM_SLOW_RATE", "0"))
+app.state.slow_ms = float(os.getenv("STUB_LLM_SLOW_MS", "5000"))
+app.state.failing_models = set(filter(None, os.getenv("STUB_LLM_FAILING_MODELS", "").split(",")))
+app.state.fine_tune_seconds = float(os.getenv("STUB_LLM_FINE_TUNE_SECONDS", "5"))
+app.state.requests = 0
+app.state.errors = 0
+app.state.fine_tuning_jobs = {}
+app.state.files = {}
+app.state.uploads = {}
+
+def _completion_id() -> str:
+    return f"chatcmpl-stub-{uuid.uuid4().hex[:12]}"
+
+def _usage(body: dict) -> dict:
+    prompt_tokens = sum(len(str(m.get("content", "")).split()) for m in body.get("messages", []))
+    completion_tokens = len(REPLY.split())
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+    }
+
+def _injected_failure(model: Optional[str] = None):
+    app.state.requests += 1
+    if model not in app.state.failing_models and random.random() >= app.state.error_rate:
+        return None
+    app.state.errors += 1
+    return JSONResponse(
+        status_code=app.state.error_status,
+        content={"error": {"message": "stub failure", "type": "server_error"}},
+        headers={"retry-after": "0"} if app.state.error_status == 429 else None,
+    )
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    model = body.get("model", "stub")
+    created = int(time.time())
+    completion_id = _completion_id()
+
+    failure = _injected_failure(model)
+    if failure is not None:
+        return failure
+
+    slow = random.random() < app.state.slow_rate
+    await asyncio.sleep((app.state.slow_ms if slow else app.state.latency_ms) / 1000)
+
+    if body.get("stream"):
+        async def token_stream():
+            for i, word in enumerate(REPLY.split(" ")):
+                chunk = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": [{"index": 0, "delta": {"content": word if i == 0 else " " + word}, "finish_reason": None}],
+                }
+                yield f"data: {json.dumps(chunk)}\n\n"
+                await asyncio.sleep(app.state.token_delay_ms / 1000)
+            if (body.get("stream_options") or {}).get("include_usage"):
+                usage_chunk = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": [],
+                    "usage": _usage(body),
+                }
+                yield f"data: {json.dumps(usage_chunk)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(token_stream(), media_type="text/event-stream")
+
+    return {
+        "id": completion_id,
+        "object": "chat.completion",
+        "created": created,
+        "model": model,
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": REPLY}, "finish_reason": "stop"}],
+        "usage": _usage(body),
+    }
+
+def _file_object(size: int, filename: str, purpose: str) -> dict:
+    file = {
+        "id": f"file-stub-{uuid.uuid4().hex[:12]}",
+        "object": "file",
+        "bytes": size,
+        "created_at": int(time.time()),
+        "filename": filename,
+        "purpose": purpose,
+        "status": "processed",
+    }
+    app.state.files[file["id"]] = file
+    return file
+
+@app.post("/v1/files")
+async def upload_file(file: UploadFile = File(...), purpose: str = Form(...)):
+    failure = _injected_failure()
+    if failure is not None:
+        return failure
+    content = await file.read()
+    return _file_object(len(content), file.filename, purpose)
+
+@app.get("/v1/files/{file_id}")
+async def retrieve_file(file_id: str):
+    file = app.state.files.get(file_id)
+    if file is None:
+        raise HTTPException(status_code=404, detail="No such file")
+    return file
+
+@app.post("/v1/uploads")
+async def create_upload(request: Request):
+    body = await request.json()
+    failure = _injected_failure()
+    if failure is not None:
+        return failure
+    upload = {
+        "id": f"upload-stub-{uuid.uuid4().hex[:12]}",
+        "object": "upload",
+        "bytes": body["bytes"],
+        "created_at": int(time.time()),
+        "expires_at": int(time.time()) + 3600,
+        "filename": body["filename"],
+        "purpose": body["purpose"],
+        "status": "pending",
+        "file": None,
+        "parts": {},
+    }
+    app.state.uploads[upload["id"]] = upload
+    return {k: v for k, v in upload.items() if k != "parts"}
+
+@app.post("/v1/uploads/{upload_id}/parts")
+async def add_upload_part(upload_id: str, data: UploadFile = File(...)):
+    failure = _injected_failure()
+    if failure is not None:
+        return failure
+    upload = app.state.uploads.get(upload_id)
+    if upload is None:
+        raise HTTPException(status_code=404, detail="No such upload")
+    part_id = f"part-stub-{uuid.uuid4().hex[:12]}"
+    upload["parts"][part_id] = len(await data.read())
+    return {"id": part_id, "object": "upload.part", "created_at": int(time.time()), "upload_id": upload_id}
+
+@app.post("/v1/uploads/{upload_id}/complete")
+async def complete_upload(upload_id: str, request: Request):
+    body = await request.json()
+    failure = _injected_failure()
+    if failure is not None:
+        return failure
+    upload = app.state.uploads.get(upload_id)
+    if upload is None:
+        raise HTTPException(status_code=404, detail="No such upload")
+    size = sum(upload["parts"][part_id] for part_id in body["part_ids"])
+    if size != upload["bytes"]:
+        raise HTTPException(status_code=400, detail=f"Parts add up to {size} bytes, expected {upload['bytes']}")
+    upload.update(status="completed", file=_file_object(size, upload["filename"], upload["purpose"]))
+    return {k: v for k, v in upload.items() if k != "parts"}
+
+def _fine_tuning_job(job: dict) -> dict:
+    elapsed = time.time() - job["created_at"]
+    done = elapsed >= app.state.fine_tune_seconds
+    return {
+        **job,
+        "status": "succeeded" if done else "running",
+        "fine_tuned_model": f"ft:{job['model']}:stub:{job['id'][-8:]}" if done else None,
+        "finished_at": int(job["created_at"] + app.state.fine_tune_seconds) if done else None,
+    }
+
+@app.post("/v1/fine_tuning/jobs")
+async def create_fine_tuning_job(request: Request):
+    body = await request.json()
+    failure = _injected_failure()
+    if failure is not None:
+        return failure
+    job = {
+        "id": f"ftjob-stub-{uuid.uuid4().hex[:12]}",
+        "object": "fine_tuning.job",
+        "created_at": int(time.time()),
+        "model": body.get("model", "stub"),
+        "training_file": body.get("training_file"),
+        "validation_file": body.get("validation_file"),
+        "organization_id": "org-stub",
+        "hyperparameters": {"n_epochs": "auto"},
+        "result_files": [],
+        "trained_tokens": None,
+        "error": None,
+        "seed": 0,
+    }
+    app.state.fine_tuning_jobs[job["id"]] = job
+    return {**_fine_tuning_job(job), "status": "validating_files"}
+
+@app.get("/v1/fine_tuning/jobs/{job_id}")
+async def retrieve_fine_tuning_job(job_id: str):
+    failure = _injected_failure()
+    if failure is not None:
+        return failure
+    job = app.state.fine_tuning_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="No such job")
+    return _fine_tuning_job(job)
+
+@app.get("/stats")
+async def stats():
+    return {"requests": app.state.requests, "errors": app.state.errors}
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency-ms", type=float, default=app.state.latency_ms)
+    parser.add_argument("--token-delay-ms", type=float, default=app.state.token_delay_ms)
+    parser.add_argument("--error-rate", type=float, default=app.state.error_rate, help="Fraction of requests to fail")
+    parser.add_argument("--error-status", type=int, default=app.state.error_status, help="HTTP status for failures")
+    parser.add_argument("--slow-rate", type=float, default=app.state.slow_rate, help="Fraction of completions to slow down")
+    parser.add_argument("--slow-ms", type=float, default=app.state.slow_ms, help="Latency of slowed-down completions")
+    parser.add_argument("--failing-models", nargs="*", default=sorted(app.state.failing_models), help="Models whose completions always fail")
+    parser.add_argument("--fine-tune-seconds", type=float, default=app.state.fine_tune_seconds, help="Time until fine-tuning jobs succeed")
+    args = parser.parse_args()
+
+    app.state.latency_ms = args.latency_ms
+    app.state.token_delay_ms = args.token_delay_ms
+    app.state.error_rate = args.error_rate
+    app.state.error_status = args.error_status
+    app.state.slow_rate = args.slow_rate
+    app.state.slow_ms = args.slow_ms
+    app.state.failing_models = set(args.failing_models)
+    app.state.fine_tune_seconds = args.fine_tune_seconds
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
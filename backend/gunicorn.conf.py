@@ -0,0 +1,48 @@
+# gunicorn settings for the API, read by ``gunicorn app.main:app`` run from backend/.
+# Tuned through the SERVER_* settings (environment or .env); command-line flags still win.
+import glob
+import multiprocessing
+import os
+import tempfile
+
+from app.core.config import settings
+
+# Set before the app imports prometheus_client: workers write their metrics to files here and
+# GET /metrics merges them. Kept in os.environ, so a reload (SIGHUP) reuses the same directory.
+if "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = tempfile.mkdtemp(prefix="ai-companion-metrics-")
+os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+
+bind = settings.SERVER_BIND
+workers = settings.SERVER_WORKERS or multiprocessing.cpu_count()
+worker_class = "app.server.ChatWorker"
+preload_app = settings.SERVER_PRELOAD
+graceful_timeout = settings.SERVER_GRACEFUL_TIMEOUT_SECONDS
+keepalive = settings.SERVER_KEEPALIVE_SECONDS
+max_requests = settings.SERVER_MAX_REQUESTS
+max_requests_jitter = settings.SERVER_MAX_REQUESTS // 10
+
+def on_starting(server):
+    # server.cfg has the command-line flags applied, so this is the worker count that will run
+    if server.cfg.workers > 1 and settings.RATE_LIMIT_ENABLED and settings.RATE_LIMIT_STORE == "memory":
+        # Each worker would keep its own buckets and quotas, multiplying the limits by the worker count
+        raise RuntimeError(
+            f"RATE_LIMIT_STORE=memory cannot enforce the rate limits across {server.cfg.workers} workers; "
+            "use RATE_LIMIT_STORE=postgres, SERVER_WORKERS=1 or RATE_LIMIT_ENABLED=false"
+        )
+    # Files left by an earlier run of the server would be added to this one's counters
+    for path in glob.glob(os.path.join(os.environ["PROMETHEUS_MULTIPROC_DIR"], "*.db")):
+        os.remove(path)
+
+def when_ready(server):
+    # Runs in the master once the app is loaded and before any worker is forked
+    if settings.SERVER_PRELOAD:
+        from app.server import preload
+
+        preload()
+
+def child_exit(server, worker):
+    # Drops the exited worker from the livesum/livemax gauges; its counters and histograms still count
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,43 @@
+"""Incremental training exports must not skip messages committed after a run took its upper bound.
+
+Run from ``backend/``: ``python -m pytest tests``.
+"""
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from app.models.database import Base
+from app.models.models import Conversation, Message, User
+from app.services.exports import TrainingExporter
+
+def turn(question_id: int, created_at: datetime) -> list:
+    return [
+        {"id": question_id, "conversation_id": 1, "content": f"question {question_id}", "is_ai": False, "created_at": created_at},
+        {"id": question_id + 1, "conversation_id": 1, "content": f"answer {question_id}", "is_ai": True, "created_at": created_at},
+    ]
+
+def test_lower_id_committed_after_the_bound_is_exported_by_the_next_run(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'export.db'}")
+    Base.metadata.create_all(engine)
+    session_factory = sessionmaker(bind=engine)
+    now = datetime.now(timezone.utc)
+    with engine.begin() as conn:
+        conn.execute(insert(User), [{"id": 1, "email": "export@example.com", "full_name": "E", "hashed_password": "x"}])
+        conn.execute(insert(Conversation), [{"id": 1, "user_id": 1}])
+        conn.execute(insert(Message), turn(1, now - timedelta(hours=1)) + turn(5, now - timedelta(seconds=30)))
+
+    exporter = TrainingExporter(session_factory, export_dir=str(tmp_path / "exports"), shards=1, settle_seconds=60)
+    first = exporter.export("advisor")
+    # Messages 5 and 6 are too recent to bound the run
+    assert (first.until_message_id, first.examples) == (2, 1)
+
+    # Ids 3 and 4 were drawn before 5 and 6, but their transaction commits only after the first run
+    with engine.begin() as conn:
+        conn.execute(insert(Message), turn(3, now - timedelta(seconds=40)))
+
+    # The next run, once both turns have settled
+    later = TrainingExporter(session_factory, export_dir=str(tmp_path / "exports"), shards=1, settle_seconds=10)
+    second = later.export("advisor")
+    assert (second.since_message_id, second.until_message_id, second.examples) == (2, 6, 2)
+    engine.dispose()
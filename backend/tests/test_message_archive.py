@@ -0,0 +1,70 @@
+"""Deleting a conversation must purge its messages from the archive files once the partitions job compacts them.
+
+Run from ``backend/``: ``python -m pytest tests``.
+"""
+import gzip
+import os
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import create_engine, event, insert, select, text
+from sqlalchemy.orm import Session
+
+from app.models.database import Base
+from app.models.models import Conversation, MessageArchive, MessageArchiveSegment, User
+from app.services.message_archive import read_segment, write_archive
+from app.services.partitions import MessagePartitions
+
+PARTITION = "messages_p2025_01"
+
+def archived_rows(start: datetime) -> list:
+    # ARCHIVE_FIELDS tuples ordered by conversation, created_at, id
+    return [
+        (1, 1, "question kept", False, start, 1),
+        (2, 1, "answer kept", True, start + timedelta(seconds=1), 1),
+        (3, 2, "secret plan", False, start, 1),
+        (4, 2, "secret answer", True, start + timedelta(seconds=1), 1),
+    ]
+
+def test_deleted_conversation_is_purged_from_its_archive_file(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'archive.db'}")
+    # Conversation deletes cascade to their segment rows, as on Postgres
+    event.listen(engine, "connect", lambda conn, _: conn.execute("PRAGMA foreign_keys = ON"))
+    Base.metadata.create_all(engine)
+    start = datetime(2025, 1, 10, tzinfo=timezone.utc)
+    relative = os.path.join("messages", f"{PARTITION}.jsonl.gz")
+    os.makedirs(tmp_path / "messages")
+    written = write_archive(str(tmp_path / relative), archived_rows(start))
+
+    with Session(engine) as db:
+        db.execute(insert(User), [{"id": 1, "email": "archive@example.com", "full_name": "A", "hashed_password": "x"}])
+        db.execute(insert(Conversation), [{"id": 1, "user_id": 1}, {"id": 2, "user_id": 1}])
+        db.add(MessageArchive(
+            id=1, partition=PARTITION, range_start=start, range_end=start + timedelta(days=31), path=relative,
+            messages=written.messages, bytes=written.bytes, sha256=written.sha256
+        ))
+        db.flush()
+        db.execute(insert(MessageArchiveSegment), [{**segment.__dict__, "archive_id": 1} for segment in written.segments])
+        db.commit()
+
+    partitions = MessagePartitions(engine, archive_dir=str(tmp_path))
+    assert partitions.compact() == []
+
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM conversations WHERE id = 2"))
+    assert partitions.compact() == [PARTITION]
+
+    with Session(engine) as db:
+        archive = db.get(MessageArchive, 1)
+        segment = db.scalars(select(MessageArchiveSegment)).one()
+    assert not os.path.exists(tmp_path / relative)
+    path = os.path.join(str(tmp_path), archive.path)
+    with gzip.open(path) as f:
+        content = f.read()
+    assert b"secret" not in content and b"question kept" in content
+    assert (archive.messages, archive.bytes) == (2, os.path.getsize(path))
+    # The kept conversation is still readable through its updated segment
+    assert [r["content"] for r in read_segment(path, segment.byte_offset, segment.byte_length)] == [
+        "question kept", "answer kept"
+    ]
+    assert partitions.compact() == []
+    engine.dispose()
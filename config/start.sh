@@ -28,6 +28,9 @@ alembic upgrade head
 # Start the backend server in the background
 uvicorn app.main:app --reload --port 8000 &
 
+# Start the background job worker (fine-tuning uploads)
+python -m app.worker &
+
 # Install frontend dependencies and start the frontend server
 cd ../frontend
 npm install
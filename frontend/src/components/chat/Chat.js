@@ -24,10 +24,10 @@ const Chat = () => {
 
   const loadConversations = async () => {
     try {
-      const data = await chat.getConversations();
-      setConversations(data);
-      if (data.length > 0 && !selectedConversation) {
-        setSelectedConversation(data[0]);
+      const { items } = await chat.getConversations();
+      setConversations(items);
+      if (items.length > 0 && !selectedConversation) {
+        setSelectedConversation(items[0]);
       }
     } catch (error) {
       console.error('Error loading conversations:', error);
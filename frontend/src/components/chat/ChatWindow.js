@@ -28,9 +28,12 @@ const Message = ({ content, isAi }) => (
 
 const ChatWindow = ({ conversationId }) => {
   const [messages, setMessages] = useState([]);
+  const [olderCursor, setOlderCursor] = useState(null);
   const [newMessage, setNewMessage] = useState('');
   const [isLoading, setIsLoading] = useState(false);
   const messagesEndRef = useRef(null);
+  // Set while older messages are prepended, so the view stays where the user is reading
+  const keepScrollRef = useRef(false);
 
   const scrollToBottom = () => {
     messagesEndRef.current?.scrollIntoView({ behavior: 'smooth' });
@@ -39,14 +42,26 @@ const ChatWindow = ({ conversationId }) => {
   const loadMessages = async () => {
     if (!conversationId) return;
     try {
-      const data = await chat.getMessages(conversationId);
-      setMessages(data);
+      const { items, nextCursor } = await chat.getMessages(conversationId);
+      setMessages(items);
+      setOlderCursor(nextCursor);
       scrollToBottom();
     } catch (error) {
       console.error('Error loading messages:', error);
     }
   };
 
+  const loadOlderMessages = async () => {
+    try {
+      const { items, nextCursor } = await chat.getMessages(conversationId, olderCursor);
+      keepScrollRef.current = true;
+      setMessages(prevMessages => [...items, ...prevMessages]);
+      setOlderCursor(nextCursor);
+    } catch (error) {
+      console.error('Error loading older messages:', error);
+    }
+  };
+
   const handleSendMessage = async (e) => {
     e.preventDefault();
     if (!newMessage.trim() || !conversationId || isLoading) return;
@@ -82,12 +97,23 @@ const ChatWindow = ({ conversationId }) => {
   }, [conversationId]);
 
   useEffect(() => {
+    if (keepScrollRef.current) {
+      keepScrollRef.current = false;
+      return;
+    }
     scrollToBottom();
   }, [messages]);
 
   return (
     <Box sx={{ height: '100%', display: 'flex', flexDirection: 'column' }}>
       <Box sx={{ flexGrow: 1, overflow: 'auto', p: 3 }}>
+        {olderCursor && (
+          <Box sx={{ display: 'flex', justifyContent: 'center', mb: 2 }}>
+            <Button size="small" onClick={loadOlderMessages}>
+              Load older messages
+            </Button>
+          </Box>
+        )}
         {messages.map((message) => (
           <Message
             key={message.id}
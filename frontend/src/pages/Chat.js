@@ -28,6 +28,7 @@ const drawerWidth = 280;
 const Chat = () => {
   const [mobileOpen, setMobileOpen] = useState(false);
   const [conversations, setConversations] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
   const [selectedConversation, setSelectedConversation] = useState(null);
   const [editingId, setEditingId] = useState(null);
   const [editingName, setEditingName] = useState('');
@@ -40,16 +41,27 @@ const Chat = () => {
 
   const loadConversations = async () => {
     try {
-      const data = await chat.getConversations();
-      setConversations(data);
-      if (data.length > 0 && !selectedConversation) {
-        setSelectedConversation(data[0].id);
+      const { items, nextCursor } = await chat.getConversations();
+      setConversations(items);
+      setNextCursor(nextCursor);
+      if (items.length > 0 && !selectedConversation) {
+        setSelectedConversation(items[0].id);
       }
     } catch (error) {
       console.error('Error loading conversations:', error);
     }
   };
 
+  const loadMoreConversations = async () => {
+    try {
+      const { items, nextCursor: cursor } = await chat.getConversations(nextCursor);
+      setConversations(prev => [...prev, ...items]);
+      setNextCursor(cursor);
+    } catch (error) {
+      console.error('Error loading conversations:', error);
+    }
+  };
+
   const handleDrawerToggle = () => {
     setMobileOpen(!mobileOpen);
   };
@@ -188,6 +200,13 @@ const Chat = () => {
             </ListItemButton>
           </ListItem>
         ))}
+        {nextCursor && (
+          <ListItem disablePadding>
+            <ListItemButton onClick={loadMoreConversations}>
+              <ListItemText primary="Load more" sx={{ textAlign: 'center' }} />
+            </ListItemButton>
+          </ListItem>
+        )}
       </List>
       <Divider />
       <Button
@@ -17,6 +17,11 @@ api.interceptors.request.use((config) => {
   return config;
 });
 
+const page = (response) => ({
+  items: response.data,
+  nextCursor: response.headers['x-next-cursor'] || null,
+});
+
 export const auth = {
   login: async (email, password) => {
     const formData = new URLSearchParams();
@@ -44,13 +49,14 @@ export const chat = {
     const response = await api.post('/chat/conversations');
     return response.data;
   },
-  getConversations: async () => {
-    const response = await api.get('/chat/conversations');
-    return response.data;
+  // Both listings are paginated: pass back nextCursor as `before` for the next (older) page
+  getConversations: async (before = null) => {
+    const response = await api.get('/chat/conversations', { params: before ? { before } : {} });
+    return page(response);
   },
-  getMessages: async (conversationId) => {
-    const response = await api.get(`/chat/${conversationId}/messages`);
-    return response.data;
+  getMessages: async (conversationId, before = null) => {
+    const response = await api.get(`/chat/${conversationId}/messages`, { params: before ? { before } : {} });
+    return page(response);
   },
   sendMessage: async (conversationId, content) => {
     const response = await api.post(`/chat/${conversationId}/messages`, { content });